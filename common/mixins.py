@@ -0,0 +1,289 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import ManyRelatedField
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer
+
+from common.serializers import parse_field_names
+from config.db_router import use_replica_for_reads
+
+
+class BulkCreateUpdateMixin:
+    """
+    Массовое создание и изменение объектов списком в одном запросе.
+    Все элементы проверяются сериализатором с many=True, запись - в одной транзакции,
+    при ошибках возвращается список ошибок с номерами элементов
+    """
+
+    def get_bulk_update_queryset(self):
+        """ Объекты, которые пользователь может изменять массово """
+        return self.get_queryset()
+
+    def after_bulk_write(self, objects):
+        """ Действия после массовой записи (bulk_create / bulk_update не отправляют сигналы save) """
+
+    def bulk_errors_response(self, errors):
+        """ Ответ с ошибками по элементам списка: [{"index": 0, "errors": {...}}, ...] """
+        if isinstance(errors, list):
+            errors = dict(enumerate(errors))
+        if not all(isinstance(index, int) for index in errors):  # ошибка всего запроса (например, не список)
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        item_errors = [{'index': index, 'errors': detail} for index, detail in errors.items() if detail]
+        return Response({'errors': item_errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    def check_bulk_size(self, data):
+        """ Ответ 400 на список больше BULK_MAX_ITEMS - до запросов к БД (загрузки объектов и связей) """
+        if isinstance(data, list) and len(data) > settings.BULK_MAX_ITEMS:
+            return Response(
+                {'non_field_errors': [f'Не более {settings.BULK_MAX_ITEMS} элементов в одном запросе']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return None
+
+    def bulk_create(self, request):
+        """ Создание объектов; владелец устанавливается до вставки в БД """
+        too_large = self.check_bulk_size(request.data)
+        if too_large is not None:
+            return too_large
+        serializer = self.get_serializer(data=request.data, many=True, max_length=settings.BULK_MAX_ITEMS)
+        if not serializer.is_valid():
+            return self.bulk_errors_response(serializer.errors)
+        with transaction.atomic():
+            serializer.save(owner=request.user)
+        self.after_bulk_write(serializer.instance)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def bulk_update(self, request):
+        """ Частичное изменение объектов; каждый элемент списка должен содержать id объекта (без повторов) """
+        too_large = self.check_bulk_size(request.data)
+        if too_large is not None:
+            return too_large
+        data = request.data if isinstance(request.data, list) else []
+        ids = [item.get('id') for item in data if isinstance(item, dict) and isinstance(item.get('id'), int)]
+        if len(set(ids)) < len(ids):  # иначе повторы получат один объект, и останутся изменения последнего элемента
+            seen = set()
+            duplicates = {}
+            for index, item in enumerate(data):
+                pk = item.get('id') if isinstance(item, dict) else None
+                if isinstance(pk, int) and pk in seen:
+                    duplicates[index] = {'id': ['Объект повторяется в запросе']}
+                elif isinstance(pk, int):
+                    seen.add(pk)
+            return self.bulk_errors_response(duplicates)
+        objects = self.get_bulk_update_queryset().in_bulk(ids)
+        instances = [objects.get(item.get('id')) if isinstance(item, dict) else None for item in data]
+
+        serializer = self.get_serializer(
+            instances, data=request.data, many=True, partial=True, max_length=settings.BULK_MAX_ITEMS
+        )
+        if not serializer.is_valid():
+            return self.bulk_errors_response(serializer.errors)
+        with transaction.atomic():
+            serializer.save()
+        self.after_bulk_write(serializer.instance)
+        return Response(serializer.data)
+
+
+class ConditionalGetMixin:
+    """
+    Заголовки ETag и Last-Modified для списка и детального просмотра объектов с полем updated_at.
+    На условный запрос (If-None-Match / If-Modified-Since) с неизменившимися данными возвращается 304
+    без сериализации - валидаторы считаются по MAX(updated_at) и количеству записей.
+    У списка только ETag: удаление записи не меняет MAX(updated_at), и Last-Modified отдал бы устаревший список.
+    Раскрытые связи (?expand=, см. SparseFieldsMixin) входят в версию по своему updated_at, Last-Modified
+    с ними не отправляется; если у связанной модели нет updated_at - ответ без валидаторов
+    """
+
+    def get_version_queryset(self):
+        """ Выборка для расчета версии списка (без аннотаций и prefetch, нужных только для сериализации) """
+        return self.filter_queryset(self.get_queryset())
+
+    def get_list_version(self, queryset):
+        """ Дата последнего изменения и версия выборки для списка """
+        stats = queryset.order_by().aggregate(last_modified=Max('updated_at'), total=Count('pk'))
+        return stats['last_modified'], (stats['total'],)
+
+    def get_object_version(self, instance):
+        """ Дата последнего изменения и версия объекта для детального просмотра """
+        return instance.updated_at, (instance.pk,)
+
+    def get_expanded_fields(self):
+        """ Поля модели, раскрытые в ответе (?expand=) """
+        expand = self.get_serializer_context().get('expand')
+        if not expand:
+            return []
+        self.get_output_fields()  # неизвестная связь - ошибка 400 до расчета версии
+        return [self.queryset.model._meta.get_field(name) for name in sorted(expand)]
+
+    def get_expanded_version(self, queryset=None, instance=None):
+        """
+        Версия раскрытых связей списка (queryset) или объекта (instance): () - связей нет,
+        None - изменения связанных объектов не отследить (нет updated_at)
+        """
+        fields = self.get_expanded_fields()
+        if any(not hasattr(field.related_model, 'updated_at') for field in fields):
+            return None
+        if instance is not None:
+            related = [getattr(instance, field.name) for field in fields]
+            return tuple((obj.pk, obj.updated_at) if obj is not None else None for obj in related)
+        if not fields:
+            return ()
+        aggregates = {field.name: Max(f'{field.name}__updated_at') for field in fields}
+        return tuple(queryset.order_by().aggregate(**aggregates).values())
+
+    def object_has_last_modified(self):
+        """ Меняется ли updated_at объекта при любом изменении ответа (иначе - только ETag) """
+        return True
+
+    def get_validators(self, request, last_modified, version, with_last_modified=True):
+        """ Значения заголовков ETag и Last-Modified (None - заголовок не отправляется) """
+        etag_source = ':'.join(
+            str(part) for part in (last_modified, *version, request.get_full_path(), request.accepted_renderer.format)
+        )
+        etag = quote_etag(md5(etag_source.encode()).hexdigest())
+        if not with_last_modified or not last_modified:
+            return etag, None
+        return etag, int(last_modified.timestamp())
+
+    def get_not_modified_response(self, request, validators):
+        """ Ответ 304, если у клиента актуальная версия данных, иначе None """
+        etag, last_modified = validators
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        return self.set_validators(response, validators) if response is not None else None
+
+    def set_validators(self, response, validators):
+        etag, last_modified = validators
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)  # кэши (CDN, браузер) должны перепроверять ответ
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_version_queryset()
+        expanded = self.get_expanded_version(queryset=queryset)
+        if expanded is None:
+            return super().list(request, *args, **kwargs)
+        last_modified, version = self.get_list_version(queryset)
+        validators = self.get_validators(request, last_modified, (*version, *expanded), with_last_modified=False)
+        not_modified = self.get_not_modified_response(request, validators)
+        if not_modified is not None:
+            return not_modified
+        return self.set_validators(super().list(request, *args, **kwargs), validators)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        expanded = self.get_expanded_version(instance=instance)
+        if expanded is None:
+            return Response(self.get_serializer(instance).data)
+        last_modified, version = self.get_object_version(instance)
+        validators = self.get_validators(
+            request, last_modified, (*version, *expanded),
+            with_last_modified=not expanded and self.object_has_last_modified(),
+        )
+        not_modified = self.get_not_modified_response(request, validators)
+        if not_modified is not None:
+            return not_modified
+        return self.set_validators(Response(self.get_serializer(instance).data), validators)
+
+
+class ReplicaReadMixin:
+    """
+    Чтение с реплик БД для безопасных действий из replica_actions (у generic-view без action - 'list').
+    Записи и чтения после записи в том же запросе идут в основную БД (config.db_router)
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)  # аутентификация и проверка прав - по основной БД
+        if request.method in SAFE_METHODS and getattr(self, 'action', 'list') in self.replica_actions:
+            use_replica_for_reads(request.user)
+
+
+class SparseFieldsMixin:
+    """
+    Выбор полей ответа (?fields=id,name) и раскрытие связей (?expand=course) для читающих действий
+    из sparse_actions (сериализатор - с common.serializers.SparseFieldsSerializerMixin).
+    Из БД загружаются только колонки выбранных полей (only), раскрытые связи - одним JOIN (select_related),
+    связи многие-ко-многим - отдельным запросом на список (prefetch_related). Колонки, нужные вне сериализатора
+    (проверка прав, ETag), перечисляются в sparse_always_load, поля сортировки добавляются автоматически
+    """
+    sparse_actions = ('list', 'retrieve')
+    sparse_always_load = ()
+
+    def is_sparse_action(self):
+        return self.request.method in SAFE_METHODS and getattr(self, 'action', 'list') in self.sparse_actions
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.is_sparse_action():
+            context['sparse_fields'] = parse_field_names(self.request.query_params.get('fields'))
+            context['expand'] = parse_field_names(self.request.query_params.get('expand')) or set()
+        return context
+
+    def get_output_fields(self):
+        """ Поля ответа с учетом ?fields= и ?expand= (неизвестные поля - ошибка 400) """
+        if not hasattr(self, '_output_fields'):
+            self._output_fields = self.get_serializer().fields
+        return self._output_fields
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.is_sparse_action():
+            queryset = self.trim_queryset(queryset)
+        return queryset
+
+    def get_sparse_ordering_fields(self):
+        """ Поля сортировки (курсорная пагинация читает их значения у последнего объекта страницы) """
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        return {name.lstrip('-') for name in (*ordering, *getattr(self, 'ordering_fields', ()))}
+
+    def trim_queryset(self, queryset):
+        """ Загрузка из БД только данных выбранных полей ответа """
+        model = queryset.model
+        load = {model._meta.pk.name, *self.sparse_always_load, *self.get_sparse_ordering_fields()}
+        related, prefetch = set(), set()
+        for field in self.get_output_fields().values():
+            name = field.source.split('.')[0]
+            try:
+                model_field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue  # SerializerMethodField (source='*'), аннотации, свойства модели
+            if model_field.many_to_many and not model_field.auto_created:
+                if isinstance(field, ManyRelatedField):
+                    prefetch.add(name)
+            elif model_field.concrete:
+                load.add(name)
+                if model_field.is_relation and isinstance(field, BaseSerializer):  # раскрытая связь (?expand=)
+                    related.add(name)
+                    related_model = model_field.related_model
+                    load.update(
+                        f'{name}__{nested.source}' for nested in field.fields.values()
+                        if self.is_concrete_field(related_model, nested.source)
+                    )
+                    if self.is_concrete_field(related_model, 'updated_at'):  # версия ответа для ETag
+                        load.add(f'{name}__updated_at')
+
+        queryset = queryset.only(*load)
+        if related:
+            queryset = queryset.select_related(*related)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+    @staticmethod
+    def is_concrete_field(model, name):
+        try:
+            return model._meta.get_field(name).concrete
+        except FieldDoesNotExist:
+            return False
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.http import urlencode
+
+
+def _ordering_fields(model, ordering):
+    """ Поля модели для сортировки ('-payment_date', 'id' -> поля payment_date и id) """
+    names = [name.lstrip('-') for name in ordering]
+    return [model._meta.pk if name == 'pk' else model._meta.get_field(name) for name in names]
+
+
+def _encode_cursor(obj, fields):
+    """ Ключ ?after= - значения полей сортировки последнего объекта страницы через запятую """
+    values = (field.value_from_object(obj) for field in fields)
+    return ','.join(value.isoformat() if hasattr(value, 'isoformat') else str(value) for value in values)
+
+
+def _decode_cursor(value, fields):
+    """ Значения полей сортировки из ключа ?after= (None - ключ некорректный, выдается первая страница) """
+    parts = value.split(',')
+    if len(parts) != len(fields):
+        return None
+    try:
+        return [field.to_python(part) for field, part in zip(fields, parts)]
+    except ValidationError:
+        return None
+
+
+def _after_cursor(ordering, fields, values):
+    """ Объекты после ключа при сортировке по нескольким полям: (a > x) OR (a = x AND b > y) ... """
+    condition, equal = Q(), {}
+    for name, field, value in zip(ordering, fields, values):
+        lookup = 'lt' if name.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{field.attname}__{lookup}': value})
+        equal[field.attname] = value
+    return condition
+
+
+async def keyset_page(request, queryset, serializer_class, ordering=('pk',)):
+    """
+    Страница списка для асинхронных view: объекты после ключа ?after= в порядке ordering
+    (как ordering курсорной пагинации DRF; последнее поле - уникальное, поля - без NULL),
+    размер страницы - ?page_size= (не больше API_MAX_PAGE_SIZE). Возвращает данные ответа
+    со ссылкой на следующую страницу и объектами страницы (без общего количества - лишнего COUNT на каждой странице)
+    """
+    try:
+        page_size = int(request.GET.get('page_size', settings.REST_FRAMEWORK['PAGE_SIZE']))
+    except ValueError:
+        page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    page_size = max(1, min(page_size, settings.API_MAX_PAGE_SIZE))
+
+    fields = _ordering_fields(queryset.model, ordering)
+    after = _decode_cursor(request.GET['after'], fields) if request.GET.get('after') else None
+    if after is not None:
+        queryset = queryset.filter(_after_cursor(ordering, fields, after))
+    page = queryset.order_by(*ordering)[:page_size + 1]  # лишний объект - признак next
+    objects = [obj async for obj in page.aiterator(chunk_size=page_size + 1)]
+
+    next_url = None
+    if len(objects) > page_size:
+        objects = objects[:page_size]
+        params = {**request.GET.dict(), 'after': _encode_cursor(objects[-1], fields), 'page_size': page_size}
+        next_url = request.build_absolute_uri(f'{request.path}?{urlencode(params)}')
+    data = serializer_class(objects, many=True, context={'request': request}).data
+    return {'next': next_url, 'results': data}
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.serializers import ListSerializer, PrimaryKeyRelatedField, ValidationError
+
+
+class PreloadedPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    """ Связь по первичному ключу, которая при массовой валидации берет объекты из заранее загруженных """
+    preloaded = None  # {str(pk): объект}, заполняется в BulkListSerializer.preload_related
+
+    def to_internal_value(self, data):
+        if self.preloaded is not None and not isinstance(data, bool):
+            related_object = self.preloaded.get(str(data))
+            if related_object is not None:
+                return related_object
+        return super().to_internal_value(data)  # не найден среди загруженных - обычная проверка с ошибкой
+
+
+class BulkListSerializer(ListSerializer):
+    """
+    Сериализатор списка объектов для массового создания и изменения.
+    Связанные объекты загружаются одним запросом на поле, запись выполняется через bulk_create / bulk_update
+    (сигналы save и поля many-to-many при этом не обрабатываются)
+    """
+
+    def preload_related(self, data):
+        """ Загрузка связанных объектов всех элементов списка (по одному запросу на поле) """
+        for field_name, field in self.child.fields.items():
+            if not isinstance(field, PreloadedPrimaryKeyRelatedField) or field.read_only:
+                continue
+            pks = {item[field_name] for item in data if isinstance(item, dict) and item.get(field_name) is not None}
+            try:
+                field.preloaded = {str(obj.pk): obj for obj in field.get_queryset().filter(pk__in=pks)}
+            except (TypeError, ValueError):
+                field.preloaded = None  # некорректные значения - ошибки покажет проверка каждого элемента
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            if self.max_length is not None and len(data) > self.max_length:
+                return super().to_internal_value(data)  # ошибка max_length без загрузки связей
+            self.preload_related(data)
+            # при изменении self.instance - список объектов в порядке элементов data (None - объект не найден)
+            self.child_instances = iter(self.instance) if self.instance is not None else None
+        return super().to_internal_value(data)
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            self.child.instance = next(self.child_instances)
+            if self.child.instance is None:
+                raise ValidationError({'id': ['Объект не найден или недоступен для изменения']})
+            self.child.initial_data = data
+        return super().run_child_validation(data)
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        return model.objects.bulk_create(
+            [model(**attrs) for attrs in validated_data], batch_size=settings.BULK_BATCH_SIZE
+        )
+
+    def update(self, instances, validated_data):
+        model = self.child.Meta.model
+        # bulk_update не вызывает save(), поэтому поля с auto_now (updated_at) обновляются явно
+        auto_now_fields = [field for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)]
+        updated_fields = {field.name for field in auto_now_fields}
+        for instance, attrs in zip(instances, validated_data):
+            for field_name, value in attrs.items():
+                setattr(instance, field_name, value)
+            for field in auto_now_fields:
+                field.pre_save(instance, add=False)
+            updated_fields.update(attrs)
+        if updated_fields:
+            model.objects.bulk_update(instances, updated_fields, batch_size=settings.BULK_BATCH_SIZE)
+        return instances
+
+
+def parse_field_names(value):
+    """ Имена полей из параметра запроса (?fields=id,name): множество или None, если параметр не передан """
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsSerializerMixin:
+    """
+    Выбор полей ответа параметрами запроса: ?fields=id,name - только перечисленные поля,
+    ?expand=course - связанный объект вместо его id (Meta.expandable_fields: поле -> путь к сериализатору).
+    Параметры передает view в контексте (sparse_fields, expand, см. common.mixins.SparseFieldsMixin),
+    действуют они только на корневой сериализатор, а не на вложенные
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.is_sparse_root():
+            return fields
+
+        expand = self.context.get('expand') or set()
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        unknown = expand - set(expandable)
+        if unknown:
+            raise ValidationError({'expand': [
+                f'Нельзя раскрыть поля: {", ".join(sorted(unknown))}. Доступны: {", ".join(expandable) or "нет"}'
+            ]})
+        for name in expand:
+            fields[name] = import_string(expandable[name])(read_only=True)
+
+        requested = self.context.get('sparse_fields')
+        if requested is not None:
+            unknown = requested - set(fields)
+            if unknown:
+                raise ValidationError({'fields': [
+                    f'Неизвестные поля: {", ".join(sorted(unknown))}. Доступны: {", ".join(fields)}'
+                ]})
+            fields = {name: field for name, field in fields.items() if name in requested}
+        return fields
+
+    def is_sparse_root(self):
+        """ Корневой сериализатор ответа (или элемент корневого списка) """
+        return self.parent is None or (isinstance(self.parent, ListSerializer) and self.parent.parent is None)
@@ -0,0 +1,119 @@
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Состояние маршрутизации текущего запроса (устанавливается ReplicaRoutingMiddleware)
+routing_state = ContextVar('db_routing_state', default=None)
+
+
+class RoutingState:
+    """ Можно ли читать с реплики в текущем запросе и была ли в нем запись в основную БД """
+
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+def _pin_cache_key(user_id):
+    return f'db:pin-primary:{user_id}'
+
+
+def use_replica_for_reads(user):
+    """
+    Разрешить чтение с реплик до конца запроса (для безопасных читающих действий view).
+    Пользователь, недавно записывавший данные, читает из основной БД (реплика может отставать)
+    """
+    state = routing_state.get()
+    if state is None:
+        return
+    if user.is_authenticated and cache.get(_pin_cache_key(user.pk)):
+        return
+    state.use_replica = True
+
+
+class ReplicaRouter:
+    """
+    Чтение с реплик (DATABASE_REPLICA_ALIASES) только в запросах, разрешенных use_replica_for_reads,
+    до первой записи в запросе и вне транзакций основной БД (atomic); запись и миграции - в основную БД
+    """
+
+    def get_replica(self):
+        return random.choice(settings.DATABASE_REPLICA_ALIASES)
+
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if state is None or not state.use_replica or state.wrote:
+            return None  # основная БД
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None  # чтения в транзакции видят ее данные и блокировки (select_for_update)
+        return self.get_replica()
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None:
+            state.wrote = True  # дальнейшие чтения в этом запросе - из основной БД (read-after-write)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.DATABASE_REPLICA_ALIASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True  # реплики содержат те же данные, что и основная БД
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Состояние маршрутизации запросов к БД на время обработки запроса.
+    После записи пользователь на REPLICA_PIN_SECONDS закрепляется за основной БД, чтобы видеть свои изменения.
+    Без настроенных реплик middleware отключается. Поддерживает синхронную и асинхронную обработку
+    (состояние в ContextVar передается и в потоки sync_to_async асинхронного ORM)
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICA_ALIASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState()
+        token = routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+
+        user_id = self.get_pinned_user_id(request, state)
+        if user_id is not None:
+            cache.set(_pin_cache_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        state = RoutingState()
+        token = routing_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routing_state.reset(token)
+
+        user_id = self.get_pinned_user_id(request, state)
+        if user_id is not None:
+            await cache.aset(_pin_cache_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    def get_pinned_user_id(self, request, state):
+        """ Пользователь, записывавший данные в запросе (закрепляется за основной БД), или None """
+        user = getattr(request, 'user', None)  # пользователь, аутентифицированный DRF во view
+        if state.wrote and user is not None and user.is_authenticated:
+            return user.pk
+        return None
@@ -36,9 +36,14 @@ INSTALLED_APPS = [
     "users",
     "materials",
     "payments",
+    "monitoring",
+    "mediafiles",
 ]
 
 MIDDLEWARE = [
+    "monitoring.middleware.RequestMetricsMiddleware",  # первым, чтобы учитывать время всех остальных middleware
+    "monitoring.middleware.QueryInspectorMiddleware",
+    "config.db_router.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -74,18 +79,47 @@ REST_FRAMEWORK = {
     ),
     # Настройки JWT-токенов
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.RoleClaimsJWTAuthentication',
     ),
     # Настройки глобальных разрешений по умолчанию. Доступ для всех API-views только для авторизованных пользователей
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Размер страницы по умолчанию для курсорной пагинации списков (классы пагинации в paginators.py приложений)
+    'PAGE_SIZE': int(os.getenv("API_PAGE_SIZE", default="20")),
 }
+# Максимальный размер страницы, который клиент может запросить параметром ?page_size=
+API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", default="100"))
+# PAGE_SIZE задан глобально, а класс пагинации - в каждом view (у каждого списка своя сортировка для курсора)
+SILENCED_SYSTEM_CHECKS = ["rest_framework.W001"]
+# Размер порции id подписчиков в потоковой выдаче /materials/course/<pk>/subscribers/
+SUBSCRIBERS_CHUNK_SIZE = int(os.getenv("SUBSCRIBERS_CHUNK_SIZE", default="1000"))
+# Количество строк, читаемых из БД за раз при потоковой выгрузке платежей (/payments/payments/export/)
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", default="2000"))
+# Массовые операции (lesson/bulk/, payments/bulk/): максимум элементов в запросе и размер пачки записи в БД
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", default="5000"))
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", default="1000"))
+
+# Метрики запросов (количество и время SQL-запросов, сериализация, полное время) по каждому view:
+# заголовок Server-Timing и гистограммы в формате Prometheus (/monitoring/metrics/, при заданном токене - по нему)
+REQUEST_METRICS_ENABLED = True if os.getenv("REQUEST_METRICS_ENABLED") == "True" else False
+REQUEST_METRICS_SERVER_TIMING = False if os.getenv("REQUEST_METRICS_SERVER_TIMING") == "False" else True
+REQUEST_METRICS_TOKEN = os.getenv("REQUEST_METRICS_TOKEN")
+# Поиск N+1 и медленных запросов (для отладки и тестовых стендов): запрос одной формы, повторенный в одном
+# HTTP-запросе не менее QUERY_INSPECTOR_N_PLUS_ONE_THRESHOLD раз, или дольше QUERY_INSPECTOR_SLOW_MS миллисекунд
+# записывается в журнал QUERY_INSPECTOR_LOG (отчет: python manage.py query_report)
+QUERY_INSPECTOR_ENABLED = True if os.getenv("QUERY_INSPECTOR_ENABLED") == "True" else False
+QUERY_INSPECTOR_N_PLUS_ONE_THRESHOLD = int(os.getenv("QUERY_INSPECTOR_N_PLUS_ONE_THRESHOLD", default="5"))
+QUERY_INSPECTOR_SLOW_MS = int(os.getenv("QUERY_INSPECTOR_SLOW_MS", default="100"))
+QUERY_INSPECTOR_LOG = os.getenv("QUERY_INSPECTOR_LOG", default=BASE_DIR / "query_inspector.jsonl")
+
 # Настройка JWT-токенов (для авторизации в приложении users)
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30), # Время жизни токена доступа
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1), # Время жизни токена обновления
 }
+# Для читающих запросов пользователь строится из claims токена (роли, версия ролей) без запроса к БД
+JWT_STATELESS_READS = False if os.getenv("JWT_STATELESS_READS") == "False" else True
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -98,8 +132,46 @@ DATABASES = {
         "PASSWORD": os.getenv("DATABASE_PASSWORD"),
         "HOST": os.getenv("DATABASE_HOST", default="localhost"),
         "PORT": os.getenv("DATABASE_PORT", default="5432"),
+        # Постоянные соединения: соединение переиспользуется запросами DATABASE_CONN_MAX_AGE секунд
+        # (0 - новое соединение на каждый запрос) и перед повторным использованием проверяется
+        "CONN_MAX_AGE": int(os.getenv("DATABASE_CONN_MAX_AGE", default="60")),
+        "CONN_HEALTH_CHECKS": False if os.getenv("DATABASE_CONN_HEALTH_CHECKS") == "False" else True,
     }
 }
+# SQLite вместо PostgreSQL (путь к файлу БД) - для локального запуска и тестов без сервера БД
+DATABASE_SQLITE = os.getenv("DATABASE_SQLITE")
+if DATABASE_SQLITE:
+    DATABASES["default"] = {"ENGINE": "django.db.backends.sqlite3", "NAME": DATABASE_SQLITE}
+# Пул соединений psycopg 3 (установка: poetry add "psycopg[binary,pool]") - вместо постоянных соединений.
+# Размер пула задается на процесс: DATABASE_POOL_MAX_SIZE x количество воркеров <= max_connections PostgreSQL
+elif os.getenv("DATABASE_POOL") == "True":
+    DATABASES["default"]["CONN_MAX_AGE"] = 0  # пул не совместим с постоянными соединениями
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv("DATABASE_POOL_MIN_SIZE", default="2")),
+            "max_size": int(os.getenv("DATABASE_POOL_MAX_SIZE", default="10")),
+            "timeout": int(os.getenv("DATABASE_POOL_TIMEOUT", default="10")),  # ожидание свободного соединения, сек
+        },
+    }
+
+# Реплики только для чтения (через запятую host или host:port, остальные параметры - как у основной БД;
+# с DATABASE_SQLITE - пути к копиям файла БД). Списки и детальный просмотр курсов, уроков и платежей, отчеты
+# и выгрузки читаются с реплик (config.db_router), запись и чтение после записи или внутри транзакции -
+# из основной БД. В тестах реплики указывают на тестовую основную БД (MIRROR)
+DATABASE_REPLICAS = [
+    replica.strip() for replica in os.getenv("DATABASE_REPLICAS", default="").split(",") if replica.strip()
+]
+for number, replica in enumerate(DATABASE_REPLICAS, start=1):
+    if DATABASE_SQLITE:
+        replica_location = {"NAME": replica}
+    else:
+        replica_host, _, replica_port = replica.partition(":")
+        replica_location = {"HOST": replica_host, "PORT": replica_port or DATABASES["default"]["PORT"]}
+    DATABASES[f"replica{number}"] = {**DATABASES["default"], **replica_location, "TEST": {"MIRROR": "default"}}
+DATABASE_REPLICA_ALIASES = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["config.db_router.ReplicaRouter"]
+# Сколько секунд после записи пользователь читает из основной БД (допустимое отставание реплик)
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", default="5"))
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -151,6 +223,31 @@ MEDIA_ROOT = os.path.join(
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5 * 1024 * 1024  # 5MB
 
+# Уменьшенные копии загруженных изображений (очередь в БД, воркер: python manage.py process_image_variants).
+# Копии хранятся в MEDIA_ROOT/IMAGE_VARIANTS_DIR в форматах WebP и JPEG, размеры - максимальные ширина и высота
+IMAGE_VARIANTS = {
+    "thumb": (160, 160),  # списки курсов и уроков, аватары
+    "medium": (640, 640),  # карточка курса или урока
+}
+IMAGE_VARIANTS_DIR = "variants"
+IMAGE_VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", default="80"))
+# Время кэширования копий в браузере и CDN (путь копии не меняется, новое изображение загружается под новым именем)
+IMAGE_VARIANT_CACHE_SECONDS = int(os.getenv("IMAGE_VARIANT_CACHE_SECONDS", default="2592000"))
+IMAGE_TASK_LOCK_TIMEOUT = int(os.getenv("IMAGE_TASK_LOCK_TIMEOUT", default="600"))
+
+# Загрузка изображений частями (/mediafiles/uploads/): недозагруженные файлы хранятся в MEDIA_ROOT/UPLOAD_PARTIAL_DIR
+# и удаляются командой clear_stale_uploads через UPLOAD_EXPIRE_HOURS часов
+UPLOAD_PARTIAL_DIR = "uploads"
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", default=str(50 * 1024 * 1024)))
+UPLOAD_EXPIRE_HOURS = int(os.getenv("UPLOAD_EXPIRE_HOURS", default="24"))
+
+# Отдача загруженных файлов (MEDIA_URL) после проверки доступа: django - файл читает Django (разработка),
+# x-accel-redirect - передает nginx (internal location MEDIA_ACCEL_REDIRECT_PREFIX с alias на MEDIA_ROOT),
+# x-sendfile - передает Apache (mod_xsendfile). Веб-сервер сам обрабатывает заголовки Range
+MEDIA_SERVE_MODE = os.getenv("MEDIA_SERVE_MODE", default="django")
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX", default="/protected-media/")
+MEDIA_CACHE_SECONDS = int(os.getenv("MEDIA_CACHE_SECONDS", default="86400"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -159,6 +256,17 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"  # По умолчанию
 # Авторизация в приложении users (для использования собственного класса пользователя)
 AUTH_USER_MODEL = "users.User"  # Для аутентификации используется собственный класс User
 
+# Почтовый бэкенд (по умолчанию письма выводятся в консоль, для отправки через SMTP - настройки ниже)
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", default="django.core.mail.backends.console.EmailBackend")
+
+# Уведомления подписчикам об изменении курсов (очередь в БД, воркер: python manage.py send_course_notifications)
+# Изменения курса в течение NOTIFICATION_DEBOUNCE_SECONDS отправляются одним письмом, письма отправляются пачками
+# по NOTIFICATION_EMAIL_BATCH_SIZE, задание в обработке дольше NOTIFICATION_LOCK_TIMEOUT секунд берется повторно
+NOTIFICATION_DEBOUNCE_SECONDS = int(os.getenv("NOTIFICATION_DEBOUNCE_SECONDS", default="300"))
+NOTIFICATION_EMAIL_BATCH_SIZE = int(os.getenv("NOTIFICATION_EMAIL_BATCH_SIZE", default="100"))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", default="3"))
+NOTIFICATION_LOCK_TIMEOUT = int(os.getenv("NOTIFICATION_LOCK_TIMEOUT", default="600"))
+
 # Настройка отправки почты через сервер Яндекса
 # EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 # EMAIL_HOST = 'smtp.yandex.ru'
@@ -169,12 +277,32 @@ AUTH_USER_MODEL = "users.User"  # Для аутентификации испол
 # EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')  # Пароль от сервиса яндекса для отправки почты
 # DEFAULT_FROM_EMAIL = EMAIL_HOST_USER  # По умолчанию отправляем письма с этого адреса
 
-# Кэширование в Redis (для ускорения работы приложения). Установка: poetry add redis
-# CACHE_ENABLED = True  # Включаем кэширование в приложении (можно вынести в .env)
-# if CACHE_ENABLED:
-#     CACHES = {
-#         'default': {
-#             'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-#             'LOCATION': 'redis://127.0.0.1:6379/1',  # или 'redis://localhost:6379/1'
-#         }
-#     }
+# Кэширование (роли пользователей, ответы каталога курсов и т.п.). В .env задается CACHE_LOCATION:
+# redis://127.0.0.1:6379/1 - Redis (установка: poetry add redis), путь к папке - файловый кэш,
+# без значения - кэш в памяти процесса
+CACHE_LOCATION = os.getenv("CACHE_LOCATION")
+if CACHE_LOCATION and CACHE_LOCATION.startswith(("redis://", "rediss://")):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_LOCATION,
+        }
+    }
+elif CACHE_LOCATION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_LOCATION,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Время хранения в кэше признака модератора (сбрасывается сигналом при изменении групп пользователя)
+ROLE_CACHE_TIMEOUT = int(os.getenv("ROLE_CACHE_TIMEOUT", default="300"))
+# Время хранения в кэше ответа списка курсов для анонимных пользователей (сбрасывается при изменении каталога)
+COURSE_LIST_CACHE_TIMEOUT = int(os.getenv("COURSE_LIST_CACHE_TIMEOUT", default="600"))
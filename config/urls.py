@@ -1,15 +1,16 @@
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
 from config import settings
+from mediafiles.views import MediaFileApiView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("materials/", include("materials.urls", namespace="materials")),
     path("payments/", include("payments.urls", namespace="payments")),
     path("users/", include("users.urls", namespace="users")),
+    path("monitoring/", include("monitoring.urls", namespace="monitoring")),
+    path("mediafiles/", include("mediafiles.urls", namespace="mediafiles")),
+    # Загруженные файлы с проверкой доступа; передача файла - веб-сервером (MEDIA_SERVE_MODE) или Django
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", MediaFileApiView.as_view(), name="media"),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,58 @@
+import time
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+
+CATALOG_VERSION_KEY = 'materials:catalog:version'
+CATALOG_HITS_KEY = 'materials:catalog:hits'
+CATALOG_MISSES_KEY = 'materials:catalog:misses'
+
+
+def get_catalog_version():
+    """
+    Текущая версия каталога курсов (часть ключа кэша ответов).
+    Начальное значение - время в мс, чтобы после вытеснения ключа версии не вернуться к старым ответам
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """ Новая версия каталога: все закэшированные ответы становятся недоступными """
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:  # ключа версии нет в кэше
+        get_catalog_version()
+
+
+def course_list_cache_key(request):
+    """ Ключ кэша списка курсов: версия каталога + параметры запроса + формат ответа """
+    params = '&'.join(f'{key}={value}' for key, value in sorted(request.query_params.lists()))
+    params_hash = md5(f'{params}:{request.accepted_renderer.format}'.encode()).hexdigest()
+    return f'materials:course_list:{get_catalog_version()}:{params_hash}'
+
+
+def record_catalog_cache(hit):
+    """ Учет попаданий и промахов кэша каталога """
+    key = CATALOG_HITS_KEY if hit else CATALOG_MISSES_KEY
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def get_catalog_cache_stats():
+    """ Статистика кэша каталога: попадания, промахи и доля попаданий """
+    hits, misses = cache.get(CATALOG_HITS_KEY, 0), cache.get(CATALOG_MISSES_KEY, 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+        'version': get_catalog_version(),
+        'timeout': settings.COURSE_LIST_CACHE_TIMEOUT,
+    }
@@ -0,0 +1,86 @@
+import random
+import re
+import string
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from materials.validators import parse_youtube_video_id
+
+# Шаблон прежнего валидатора: строка, которую re ищет в своем кэше шаблонов при каждом вызове
+LEGACY_YOUTUBE_REGEX = r'^(https?\:\/\/)?(www\.)?(youtube\.com|youtu\.be)\/.+'
+URL_FORMS = (
+    'https://www.youtube.com/watch?v={video_id}',
+    'https://youtube.com/watch?feature=share&v={video_id}&t=42',
+    'https://youtu.be/{video_id}?si=abc',
+    'youtube.com/embed/{video_id}',
+    'https://m.youtube.com/shorts/{video_id}',
+    'https://vimeo.com/{video_id}',  # не YouTube
+)
+
+
+class Command(BaseCommand):
+    """
+    Микробенчмарк проверки ссылок на видео при массовом импорте уроков (с дублями ссылок): прежний валидатор
+    (шаблон-строка), скомпилированный шаблон, разбор с кэшем и двойной разбор (валидатор и сериализатор):
+        python manage.py benchmark_video_urls --count 10000 --duplicates 0.3
+    """
+    help = 'Скорость проверки и разбора ссылок на видео YouTube'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000, help='Количество ссылок')
+        parser.add_argument('--duplicates', type=float, default=0.3, help='Доля повторяющихся ссылок (0..1)')
+        parser.add_argument('--repeat', type=int, default=5, help='Количество замеров (берется лучший)')
+        parser.add_argument('--seed', type=int, default=1, help='Начальное значение генератора ссылок')
+
+    def handle(self, *args, **options):
+        if options['count'] < 1 or options['repeat'] < 1 or not 0 <= options['duplicates'] < 1:
+            raise CommandError('Нужны положительные --count и --repeat и --duplicates от 0 до 1')
+        urls = self.generate_urls(options['count'], options['duplicates'], random.Random(options['seed']))
+
+        def parse_compiled(items):
+            parse = parse_youtube_video_id.__wrapped__  # без кэша
+            for url in items:
+                parse(url)
+
+        def parse_cached(items):
+            parse_youtube_video_id.cache_clear()
+            for url in items:
+                parse_youtube_video_id(url)
+
+        def parse_validated(items):
+            """ Валидатор и сериализатор разбирают каждую ссылку (второй разбор - из кэша) """
+            parse_youtube_video_id.cache_clear()
+            for url in items:
+                parse_youtube_video_id(url)
+                parse_youtube_video_id(url)
+
+        benchmarks = {
+            'legacy': lambda items: [re.match(LEGACY_YOUTUBE_REGEX, url) for url in items],
+            'compiled': parse_compiled,
+            'cached': parse_cached,
+            'validated_twice': parse_validated,
+        }
+        for name, function in benchmarks.items():
+            best = min(self.measure(function, urls) for _ in range(options['repeat']))
+            self.stdout.write(
+                f'{name}: {best * 1000:.2f} мс, {best / len(urls) * 1e6:.3f} мкс на ссылку, '
+                f'{len(urls) / best:.0f} ссылок/с'
+            )
+
+    def generate_urls(self, count, duplicates, rng):
+        """ Ссылки разных форм; доля duplicates - повторы уже сгенерированных ссылок """
+        alphabet = string.ascii_letters + string.digits + '_-'
+        urls = []
+        for _ in range(count):
+            if urls and rng.random() < duplicates:
+                urls.append(rng.choice(urls))
+            else:
+                video_id = ''.join(rng.choices(alphabet, k=11))
+                urls.append(rng.choice(URL_FORMS).format(video_id=video_id))
+        return urls
+
+    def measure(self, function, urls):
+        started = time.perf_counter()
+        function(urls)
+        return time.perf_counter() - started
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from materials.services import process_due_notifications
+
+
+class Command(BaseCommand):
+    """ Воркер очереди уведомлений подписчикам об изменении курсов """
+    help = 'Отправка подписчикам уведомлений об изменении курсов (воркер очереди в БД)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Обработать очередь один раз и завершиться')
+        parser.add_argument('--interval', type=float, default=10, help='Пауза между проверками очереди, сек')
+        parser.add_argument('--limit', type=int, default=100, help='Количество заданий за одну проверку')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_due_notifications(limit=options['limit'])
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f'Обработано заданий: {processed}'))
+            if options['once']:
+                break
+            if processed < options['limit']:  # очередь разобрана - ждем новые задания
+                time.sleep(options['interval'])
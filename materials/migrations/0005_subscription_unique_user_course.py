@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:39
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_subscriptions(apps, schema_editor):
+    """Удаление повторных подписок (остается самая ранняя) перед созданием уникального ограничения"""
+    Subscription = apps.get_model("materials", "Subscription")
+    duplicates = (
+        Subscription.objects.values("user", "course")
+        .annotate(first_id=Min("id"), total=Count("id"))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates:
+        Subscription.objects.filter(
+            user=duplicate["user"], course=duplicate["course"]
+        ).exclude(id=duplicate["first_id"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0004_subscription"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_subscriptions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="subscription",
+            constraint=models.UniqueConstraint(
+                fields=("user", "course"), name="unique_user_course_subscription"
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0007_coursenotification"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="lesson",
+            name="image",
+            field=models.ImageField(
+                blank=True,
+                db_index=True,
+                help_text="Загрузите изображение в формате JPEG или PNG (макс. 5 МБ)",
+                null=True,
+                upload_to="materials/photo",
+                verbose_name="Превью урока",
+            ),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:10
+
+import re
+
+from django.db import migrations, models
+
+BACKFILL_BATCH_SIZE = 2000
+# Копия materials.validators.YOUTUBE_URL_RE на момент миграции: изменение кода приложения не меняет заполнение
+YOUTUBE_URL_RE = re.compile(
+    r"^(?:https?://)?(?:(?:www|m|music)\.)?"
+    r"(?:youtube\.com/(?:watch\?(?:[^#]*&)?v=|embed/|shorts/|live/|v/)|youtube-nocookie\.com/embed/|youtu\.be/)"
+    r"(?P<video_id>[A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])",
+    re.IGNORECASE,
+)
+
+
+def parse_youtube_video_id(url):
+    match = YOUTUBE_URL_RE.match(url.strip())
+    return match["video_id"] if match else None
+
+
+def backfill_video_ids(apps, schema_editor):
+    """Заполнение ID видео для существующих уроков (ссылки не изменяются) пачками по BACKFILL_BATCH_SIZE"""
+    Lesson = apps.get_model("materials", "Lesson")
+    lessons = (
+        Lesson.objects.exclude(video__isnull=True).exclude(video="").only("id", "video")
+    )
+    batch = []
+    for lesson in lessons.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        lesson.video_id = parse_youtube_video_id(lesson.video)
+        if lesson.video_id:
+            batch.append(lesson)
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            Lesson.objects.bulk_update(batch, ["video_id"])
+            batch = []
+    if batch:
+        Lesson.objects.bulk_update(batch, ["video_id"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0008_alter_lesson_image"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lesson",
+            name="video_id",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                help_text="Заполняется из ссылки на видео",
+                max_length=11,
+                null=True,
+                verbose_name="ID видео YouTube",
+            ),
+        ),
+        migrations.RunPython(backfill_video_ids, migrations.RunPython.noop),
+    ]
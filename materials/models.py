@@ -31,6 +31,11 @@ class Course(models.Model):
         null=True,
         blank=True
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,  # MAX(updated_at) для заголовков ETag/Last-Modified читается по индексу
+        verbose_name="Дата изменения",
+    )
 
 
     class Meta:
@@ -57,6 +62,7 @@ class Lesson(models.Model):
         upload_to="materials/photo",
         blank=True,
         null=True,
+        db_index=True,  # проверка доступа к файлу урока (mediafiles.serving) ищет урок по пути изображения
         verbose_name="Превью урока",
         help_text="Загрузите изображение в формате JPEG или PNG (макс. 5 МБ)",
     )
@@ -66,6 +72,15 @@ class Lesson(models.Model):
         verbose_name="Ссылка на видео",
         help_text="Введите ссылку на видео",
     )
+    video_id = models.CharField(
+        max_length=11,
+        blank=True,
+        null=True,
+        db_index=True,  # поиск уроков с тем же видео (дубли при импорте)
+        editable=False,
+        verbose_name="ID видео YouTube",
+        help_text="Заполняется из ссылки на видео",
+    )
     course = models.ForeignKey(
         Course,
         on_delete=models.CASCADE,
@@ -82,6 +97,11 @@ class Lesson(models.Model):
         null=True,
         blank=True
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,  # MAX(updated_at) для заголовков ETag/Last-Modified читается по индексу
+        verbose_name="Дата изменения",
+    )
 
     class Meta:
         verbose_name = "Урок"
@@ -112,6 +132,61 @@ class Subscription(models.Model):
     class Meta:
         verbose_name = "Подписка"
         verbose_name_plural = "Подписки"
+        constraints = [
+            # пользователь может быть подписан на курс только один раз
+            models.UniqueConstraint(fields=['user', 'course'], name='unique_user_course_subscription'),
+        ]
 
     def __str__(self):
         return f"Пользователь {self.user.email} подписан на {self.course.name}"
+
+
+class CourseNotification(models.Model):
+    """Задание на рассылку подписчикам уведомления об изменении курса (очередь в БД)"""
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSING = "processing"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Ожидает отправки"),
+        (STATUS_PROCESSING, "Отправляется"),
+        (STATUS_DONE, "Отправлено"),
+        (STATUS_FAILED, "Ошибка"),
+    ]
+
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name="Курс"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name="Статус",
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    run_after = models.DateTimeField(verbose_name="Отправить после")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Взято в обработку")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Количество попыток")
+    sent_count = models.PositiveIntegerField(default=0, verbose_name="Отправлено писем")
+    last_error = models.TextField(blank=True, default="", verbose_name="Последняя ошибка")
+
+    class Meta:
+        verbose_name = "Уведомление об изменении курса"
+        verbose_name_plural = "Уведомления об изменении курсов"
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='notification_status_run_idx'),
+        ]
+        constraints = [
+            # не больше одного ожидающего задания на курс - повторные изменения объединяются в него
+            models.UniqueConstraint(
+                fields=['course'],
+                condition=models.Q(status="pending"),
+                name='unique_pending_course_notification',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Уведомление об изменении курса {self.course_id} ({self.get_status_display()})"
@@ -1,28 +1,78 @@
 from rest_framework.serializers import ModelSerializer, SerializerMethodField
 
+from common.serializers import BulkListSerializer, PreloadedPrimaryKeyRelatedField, SparseFieldsSerializerMixin
 from materials.models import Course, Lesson
-from materials.validators import LessonVideoUrlValidator
+from materials.validators import LessonVideoUrlValidator, canonical_youtube_url, parse_youtube_video_id
+from mediafiles.fields import ImageVariantsField
 
 
-class LessonSerializer(ModelSerializer):
+class CourseBriefSerializer(ModelSerializer):
+    """ Краткие данные курса для раскрытия связей (?expand=course) """
+
+    class Meta:
+        model = Course
+        fields = ("id", "name",)
+
+
+class LessonBriefSerializer(ModelSerializer):
+    """ Краткие данные урока для раскрытия связей (?expand=paid_lesson) """
+
+    class Meta:
+        model = Lesson
+        fields = ("id", "name",)
+
+
+class LessonSerializer(SparseFieldsSerializerMixin, ModelSerializer):
     """ Сериализатор для урока """
+    serializer_related_field = PreloadedPrimaryKeyRelatedField  # для массовой валидации (BulkListSerializer)
+    image_variants = ImageVariantsField(source='image')  # Ссылки на уменьшенные копии изображения
+
+    def validate(self, attrs):
+        """ Ссылка на видео приводится к канонической, ID видео сохраняется для поиска дублей по индексу """
+        if 'video' in attrs:
+            # повторный разбор ссылки после LessonVideoUrlValidator берется из кэша
+            video_id = parse_youtube_video_id(attrs['video']) if attrs['video'] else None
+            attrs['video_id'] = video_id
+            if video_id:
+                attrs['video'] = canonical_youtube_url(video_id)
+        return attrs
 
     class Meta:
         model = Lesson
         fields = "__all__"
         validators = [LessonVideoUrlValidator()] # Валидатор для видео урока
+        list_serializer_class = BulkListSerializer
+        expandable_fields = {
+            "course": "materials.serializers.CourseBriefSerializer",
+            "owner": "users.serializers.UserBriefSerializer",
+        }
 
-class CourseSerializer(ModelSerializer):
+class CourseSerializer(SparseFieldsSerializerMixin, ModelSerializer):
     """ Сериализатор для курса """
     lessons_count = SerializerMethodField()  # Поле для количества уроков
     lessons_in_course = LessonSerializer(source='lessons', many=True, read_only=True) # Поле для уроков в курсе
+    is_subscribed = SerializerMethodField()  # Подписан ли текущий пользователь на курс
+    image_variants = ImageVariantsField(source='image')  # Ссылки на уменьшенные копии изображения
 
     def get_lessons_count(self, course):
         """ Подсчет количества уроков в курсе """
-        return Lesson.objects.filter(course=course).count()
+        if hasattr(course, 'lessons_count'):  # значение уже посчитано аннотацией в CourseViewSet.get_queryset
+            return course.lessons_count
+        return course.lessons.count()
+
+    def get_is_subscribed(self, course):
+        """ Подписан ли текущий пользователь на курс """
+        if hasattr(course, 'is_subscribed'):  # значение уже посчитано подзапросом EXISTS в CourseViewSet.get_queryset
+            return course.is_subscribed
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return False
+        return course.subscriptions.filter(user_id=request.user.pk).exists()
 
 
     class Meta:
         model = Course
-        fields = ("id", "name", "description", "lessons_count", "lessons_in_course",)
+        fields = (
+            "id", "name", "description", "lessons_count", "lessons_in_course", "is_subscribed", "image_variants",
+        )
 
@@ -0,0 +1,144 @@
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Count, Exists, F, OuterRef, Prefetch, Q, Value
+from django.utils import timezone
+
+from materials.models import CourseNotification, Lesson, Subscription
+
+
+def annotate_course_catalog(queryset, user, fields=None):
+    """
+    Данные каталога курсов для CourseSerializer: количество уроков считается в БД одним запросом,
+    признак подписки пользователя - подзапросом EXISTS, а уроки подгружаются одним prefetch-запросом,
+    поэтому число запросов не зависит от количества курсов.
+    fields - поля ответа (?fields=): для невыбранных полей подсчет, подзапрос и prefetch не выполняются
+    """
+    if fields is None or 'lessons_count' in fields:
+        queryset = queryset.annotate(lessons_count=Count('lessons'))
+    if fields is None or 'is_subscribed' in fields:
+        if user.is_authenticated:
+            is_subscribed = Exists(Subscription.objects.filter(course=OuterRef('pk'), user_id=user.pk))
+        else:
+            is_subscribed = Value(False, output_field=BooleanField())
+        queryset = queryset.annotate(is_subscribed=is_subscribed)
+    if fields is None or 'lessons_in_course' in fields:
+        queryset = queryset.prefetch_related(Prefetch('lessons', queryset=Lesson.objects.order_by('id')))
+    return queryset
+
+
+def iter_subscriber_id_chunks(course_id, chunk_size):
+    """
+    id подписчиков курса порциями по chunk_size.
+    Строки читаются курсором БД (iterator), поэтому память не зависит от количества подписчиков
+    """
+    subscriber_ids = (
+        Subscription.objects.filter(course_id=course_id)
+        .order_by('user_id')
+        .values_list('user_id', flat=True)
+        .iterator(chunk_size=chunk_size)
+    )
+    while chunk := list(islice(subscriber_ids, chunk_size)):
+        yield chunk
+
+
+def enqueue_course_notification(course_id):
+    """
+    Постановка в очередь уведомления подписчиков об изменении курса.
+    Если для курса уже есть ожидающее задание, изменение объединяется с ним: уведомление уйдет один раз
+    через NOTIFICATION_DEBOUNCE_SECONDS после первого изменения
+    """
+    if CourseNotification.objects.filter(course_id=course_id, status=CourseNotification.STATUS_PENDING).exists():
+        return
+    try:
+        with transaction.atomic():
+            CourseNotification.objects.create(
+                course_id=course_id,
+                run_after=timezone.now() + timedelta(seconds=settings.NOTIFICATION_DEBOUNCE_SECONDS),
+            )
+    except IntegrityError:  # задание создано параллельным запросом или курс уже удален
+        pass
+
+
+def claim_due_notifications(limit):
+    """
+    Выбор заданий, которые пора отправлять, и пометка их как отправляемых.
+    Задания, зависшие в обработке (воркер остановлен), берутся повторно через NOTIFICATION_LOCK_TIMEOUT секунд
+    """
+    now = timezone.now()
+    stale_lock = now - timedelta(seconds=settings.NOTIFICATION_LOCK_TIMEOUT)
+    pending = Q(status=CourseNotification.STATUS_PENDING, run_after__lte=now)
+    stale = Q(status=CourseNotification.STATUS_PROCESSING, locked_at__lt=stale_lock)
+    with transaction.atomic():
+        notifications = list(
+            CourseNotification.objects.select_for_update(skip_locked=True)
+            .filter(pending | stale)
+            .select_related('course')
+            .order_by('run_after')[:limit]
+        )
+        CourseNotification.objects.filter(pk__in=[notification.pk for notification in notifications]).update(
+            status=CourseNotification.STATUS_PROCESSING, locked_at=now, attempts=F('attempts') + 1
+        )
+    return notifications
+
+
+def send_course_notification(notification):
+    """
+    Отправка уведомления всем подписчикам курса.
+    Письма отправляются пачками по NOTIFICATION_EMAIL_BATCH_SIZE через одно соединение с почтовым сервером.
+    Возвращает количество отправленных писем
+    """
+    course = notification.course
+    emails = (
+        Subscription.objects.filter(course_id=course.pk)
+        .exclude(user__email='')
+        .order_by('user_id')
+        .values_list('user__email', flat=True)
+        .iterator(chunk_size=settings.NOTIFICATION_EMAIL_BATCH_SIZE)
+    )
+    subject = f'Обновление курса «{course.name}»'
+    body = f'В курсе «{course.name}», на который вы подписаны, появились изменения.'
+
+    sent = 0
+    with get_connection() as connection:
+        while batch := list(islice(emails, settings.NOTIFICATION_EMAIL_BATCH_SIZE)):
+            messages = [EmailMessage(subject, body, to=[email], connection=connection) for email in batch]
+            sent += connection.send_messages(messages) or 0
+    return sent
+
+
+def process_due_notifications(limit=100):
+    """
+    Отправка всех уведомлений, которые пора отправлять (вызывается воркером send_course_notifications).
+    При ошибке задание возвращается в очередь, после NOTIFICATION_MAX_ATTEMPTS попыток помечается ошибочным.
+    Возвращает количество обработанных заданий
+    """
+    notifications = claim_due_notifications(limit)
+    for notification in notifications:
+        try:
+            sent = send_course_notification(notification)
+        except Exception as error:
+            retry = notification.attempts + 1 < settings.NOTIFICATION_MAX_ATTEMPTS  # attempts до взятия в обработку
+            failure = {
+                'run_after': timezone.now() + timedelta(seconds=settings.NOTIFICATION_DEBOUNCE_SECONDS),
+                'locked_at': None,
+                'last_error': str(error),
+            }
+            try:
+                with transaction.atomic():
+                    CourseNotification.objects.filter(pk=notification.pk).update(
+                        status=CourseNotification.STATUS_PENDING if retry else CourseNotification.STATUS_FAILED,
+                        **failure,
+                    )
+            except IntegrityError:  # по курсу уже есть новое ожидающее задание - оно заменит повтор
+                CourseNotification.objects.filter(pk=notification.pk).update(
+                    status=CourseNotification.STATUS_FAILED, **failure
+                )
+        else:
+            CourseNotification.objects.filter(pk=notification.pk).update(
+                status=CourseNotification.STATUS_DONE, sent_count=sent, locked_at=None, last_error=''
+            )
+    return len(notifications)
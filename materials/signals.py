@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from materials.caching import bump_catalog_version
+from materials.models import Course, Lesson
+from materials.services import enqueue_course_notification
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def reset_catalog_cache(sender, **kwargs):
+    """ Сброс кэша ответов каталога курсов при изменении курсов и уроков """
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Course)
+def notify_course_subscribers(sender, instance, created, **kwargs):
+    """ Уведомление подписчиков об изменении курса (у нового курса подписчиков еще нет) """
+    if not created:
+        transaction.on_commit(lambda: enqueue_course_notification(instance.pk))
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def notify_lesson_course_subscribers(sender, instance, **kwargs):
+    """ Уведомление подписчиков курса о добавлении, изменении или удалении урока """
+    transaction.on_commit(lambda: enqueue_course_notification(instance.course_id))
@@ -1,3 +1,585 @@
-# from django.test import TestCase
+import json
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from config.db_router import ReplicaRouter, ReplicaRoutingMiddleware, RoutingState, routing_state
+from materials.models import Course, CourseNotification, Lesson, Subscription
+from materials.services import process_due_notifications
+from materials.validators import parse_youtube_video_id
+from users.models import User
+from users.serializers import RoleTokenObtainPairSerializer
+
+
+class CourseQueryCountTestCase(APITestCase):
+    """ Тесты количества запросов к БД при получении курсов """
+
+    def create_courses(self, count):
+        """ Создание курсов с двумя уроками в каждом """
+        for number in range(count):
+            course = Course.objects.create(name=f"Курс {number}")
+            Lesson.objects.create(name=f"Урок {number}.1", course=course)
+            Lesson.objects.create(name=f"Урок {number}.2", course=course)
+
+    def count_list_queries(self):
+        """ Количество запросов к БД при запросе списка курсов """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("materials:courses-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_course_list_query_count_is_constant(self):
+        """ Число запросов не зависит от количества курсов """
+        self.create_courses(1)
+        queries_for_one_course = self.count_list_queries()
+
+        self.create_courses(10)
+        self.assertEqual(self.count_list_queries(), queries_for_one_course)
+
+    def test_course_list_lessons_count(self):
+        """ Количество уроков берется из аннотации и совпадает с фактическим """
+        self.create_courses(3)
+        response = self.client.get(reverse("materials:courses-list"))
+
+        for course in response.json()["results"]:
+            self.assertEqual(course["lessons_count"], 2)
+            self.assertEqual(len(course["lessons_in_course"]), 2)
+
+
+class SparseFieldsTestCase(APITestCase):
+    """ Тесты выбора полей (?fields=) и раскрытия связей (?expand=) """
+
+    def setUp(self):
+        self.user = User.objects.create(email="owner@example.com")
+        self.client.force_authenticate(user=self.user)
+        course = Course.objects.create(name="Курс", description="Длинное описание", owner=self.user)
+        Lesson.objects.create(name="Урок", description="Длинное описание", course=course, owner=self.user)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        return response, [query["sql"] for query in context.captured_queries]
+
+    def test_course_list_fields(self):
+        """ Узкий список курсов не загружает описание, уроки, подсчет уроков и подписку """
+        response, queries = self.get(reverse("materials:courses-list"), fields="id,name")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.json()["results"][0]), ["id", "name"])
+        catalog_queries = [sql for sql in queries if 'FROM "materials_course"' in sql and "MAX" not in sql]
+        self.assertEqual(len(catalog_queries), 1)
+        self.assertNotIn('"description"', catalog_queries[0])
+        self.assertNotIn("COUNT", catalog_queries[0])
+        self.assertFalse([sql for sql in queries if sql.startswith('SELECT "materials_lesson"."id"')])
+
+        response = self.client.get(reverse("materials:courses-list"))
+        self.assertIn("lessons_in_course", response.json()["results"][0])  # без параметров - полный ответ
+
+        course = Course.objects.get()
+        response, queries = self.get(reverse("materials:courses-detail", args=[course.pk]), fields="id,name")
+        self.assertEqual(response.json(), {"id": course.pk, "name": "Курс"})
+        self.assertEqual(len(queries), 1)  # проверка владельца и ETag - по колонкам того же запроса
+
+    def test_lesson_expand(self):
+        """ Раскрытый курс урока загружается тем же запросом (JOIN) без лишних колонок """
+        response, queries = self.get(reverse("materials:lessons_list"), fields="id,name,course", expand="course")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lesson = response.json()["results"][0]
+        self.assertEqual(lesson["course"], {"id": lesson["course"]["id"], "name": "Курс"})
+        lesson_queries = [sql for sql in queries if 'FROM "materials_lesson"' in sql and "MAX" not in sql]
+        self.assertEqual(len(lesson_queries), 1)
+        self.assertIn("JOIN", lesson_queries[0])
+        self.assertNotIn("description", lesson_queries[0])
+
+    def test_unknown_fields(self):
+        """ Неизвестное поле или связь - ошибка 400 со списком доступных """
+        response = self.client.get(reverse("materials:lessons_list"), {"fields": "id,secret"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("secret", response.json()["fields"][0])
+        response = self.client.get(reverse("materials:courses-list"), {"expand": "lessons"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class LessonBulkTestCase(APITestCase):
+    """ Тесты массового создания и изменения уроков """
+
+    def setUp(self):
+        self.user = User.objects.create(email="owner@example.com")
+        self.client.force_authenticate(user=self.user)
+        self.course = Course.objects.create(name="Курс")
+        self.url = reverse("materials:lesson_bulk")
+
+    def test_bulk_create_sets_owner(self):
+        """ Уроки создаются одним запросом INSERT с владельцем """
+        data = [{"name": f"Урок {number}", "course": self.course.pk} for number in range(5)]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Lesson.objects.filter(owner=self.user).count(), 5)
+        inserts = [
+            query for query in context.captured_queries if query["sql"].startswith('INSERT INTO "materials_lesson"')
+        ]
+        self.assertEqual(len(inserts), 1)
+
+    def test_bulk_create_reports_item_errors(self):
+        """ При ошибке в элементе ничего не создается, ошибка возвращается с номером элемента """
+        data = [
+            {"name": "Урок", "course": self.course.pk},
+            {"name": "Урок", "course": self.course.pk, "video": "https://vimeo.com/1"},
+        ]
+        response = self.client.post(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error["index"] for error in response.data["errors"]], [1])
+        self.assertFalse(Lesson.objects.exists())
+
+    def test_bulk_create_canonicalizes_video(self):
+        """ Ссылки на видео в любой форме сохраняются канонически с ID видео; поиск дублей - по ID """
+        links = ["https://youtu.be/dQw4w9WgXcQ?si=x", "https://youtube.com/shorts/aBcD_eF-123", None]
+        data = [{"name": "Урок", "course": self.course.pk, "video": link} for link in links]
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sorted(Lesson.objects.values_list("video", "video_id"), key=str),
+            sorted([
+                ("https://www.youtube.com/watch?v=dQw4w9WgXcQ", "dQw4w9WgXcQ"),
+                ("https://www.youtube.com/watch?v=aBcD_eF-123", "aBcD_eF-123"),
+                (None, None),
+            ], key=str),
+        )
+
+        url = reverse("materials:lessons_list")
+        response = self.client.get(url, {"video": "https://m.youtube.com/watch?v=dQw4w9WgXcQ"})
+        self.assertEqual(len(response.json()["results"]), 1)
+        response = self.client.get(url, {"video": "https://vimeo.com/1"})
+        self.assertEqual(response.json()["results"], [])
+
+    def test_bulk_update_only_own_lessons(self):
+        """ Изменяются только свои уроки, чужие возвращаются как ошибки элементов """
+        own_lesson = Lesson.objects.create(name="Свой", course=self.course, owner=self.user)
+        foreign_lesson = Lesson.objects.create(name="Чужой", course=self.course)
+
+        response = self.client.patch(self.url, [{"id": own_lesson.pk, "name": "Новый"}], format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        own_lesson.refresh_from_db()
+        self.assertEqual(own_lesson.name, "Новый")
+
+        response = self.client.patch(self.url, [{"id": foreign_lesson.pk, "name": "Новый"}], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_limits(self):
+        """ Слишком длинный список отклоняется без запросов к БД, повтор id - ошибка элемента """
+        lesson = Lesson.objects.create(name="Свой", course=self.course, owner=self.user)
+        with override_settings(BULK_MAX_ITEMS=2):
+            data = [{"id": lesson.pk, "name": "Урок", "course": self.course.pk}] * 3
+            for method in (self.client.post, self.client.patch):
+                with self.assertNumQueries(0):
+                    response = method(self.url, data, format="json")
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        data = [{"id": lesson.pk, "name": "Первый"}, {"id": lesson.pk, "name": "Второй"}]
+        response = self.client.patch(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error["index"] for error in response.data["errors"]], [1])
+        lesson.refresh_from_db()
+        self.assertEqual(lesson.name, "Свой")
+
+
+class SingleWriteCreateTestCase(APITestCase):
+    """ Создание курса и урока выполняется одной записью в таблицу """
+
+    def setUp(self):
+        self.user = User.objects.create(email="owner@example.com")
+        self.client.force_authenticate(user=self.user)
+
+    def count_writes(self, context, table):
+        """ Количество запросов INSERT/UPDATE к таблице """
+        return len([
+            query for query in context.captured_queries
+            if query["sql"].startswith(("INSERT", "UPDATE")) and f'"{table}"' in query["sql"].split("(")[0]
+        ])
+
+    def test_course_create(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse("materials:courses-list"), {"name": "Курс"})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.count_writes(context, "materials_course"), 1)
+        self.assertEqual(Course.objects.get().owner, self.user)
+
+    def test_lesson_create(self):
+        course = Course.objects.create(name="Курс")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse("materials:lesson_create"), {"name": "Урок", "course": course.pk})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.count_writes(context, "materials_lesson"), 1)
+        self.assertEqual(Lesson.objects.get().owner, self.user)
+
+
+class ConditionalGetTestCase(APITestCase):
+    """ Тесты ETag / Last-Modified для списка курсов """
+
+    def setUp(self):
+        self.course = Course.objects.create(name="Курс")
+        self.lesson = Lesson.objects.create(name="Урок", course=self.course)
+        self.url = reverse("materials:courses-list")
+
+    def test_not_modified_until_lesson_changes(self):
+        """ Пока курсы и уроки не менялись - 304, после изменения урока - новый ответ """
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.lesson.name = "Новое название"
+        self.lesson.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_delete_changes_list(self):
+        """ Удаление курса не меняет MAX(updated_at) - у списка нет Last-Modified, ETag меняется """
+        Course.objects.create(name="Второй курс")
+        response = self.client.get(self.url)
+        self.assertNotIn("Last-Modified", response)
+        etag = response["ETag"]
+
+        Course.objects.filter(name="Второй курс").delete()
+        for headers in ({"HTTP_IF_NONE_MATCH": etag}, {"HTTP_IF_MODIFIED_SINCE": http_date()}):
+            response = self.client.get(self.url, **headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.json()["results"]), 1)
+
+        owner = User.objects.create(email="owner@test.ru")
+        Course.objects.update(owner=owner)
+        Lesson.objects.update(owner=owner)
+        self.client.force_authenticate(user=owner)
+        response = self.client.get(reverse("materials:courses-detail", args=[self.course.pk]))
+        self.assertNotIn("Last-Modified", response)  # в ответе уроки: удаление урока не меняет updated_at курса
+        response = self.client.get(reverse("materials:lesson_retrieve", args=[self.lesson.pk]))
+        self.assertIn("Last-Modified", response)
+
+    def test_expanded_course_changes_lessons(self):
+        """ Изменение раскрытого курса меняет ETag уроков; Last-Modified с раскрытыми связями не отправляется """
+        owner = User.objects.create(email="owner@test.ru")
+        Lesson.objects.update(owner=owner)
+        self.client.force_authenticate(user=owner)
+        for url in (reverse("materials:lessons_list"), reverse("materials:lesson_retrieve", args=[self.lesson.pk])):
+            response = self.client.get(url, {"expand": "course"})
+            self.assertNotIn("Last-Modified", response)
+            etag = response["ETag"]
+            self.assertEqual(
+                self.client.get(url, {"expand": "course"}, HTTP_IF_NONE_MATCH=etag).status_code,
+                status.HTTP_304_NOT_MODIFIED,
+            )
+
+            self.course.name = f"{self.course.name} (обновлен)"
+            self.course.save()
+            response = self.client.get(url, {"expand": "course"}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(reverse("materials:lessons_list"), {"expand": "owner"})
+        self.assertNotIn("ETag", response)  # изменения пользователя не отследить - ответ без валидаторов
+
+
+class CourseListCacheTestCase(APITestCase):
+    """ Тесты кэша списка курсов для анонимных пользователей """
+
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(name="Курс")
+        self.url = reverse("materials:courses-list")
+
+    def test_cache_hit_without_queries(self):
+        """ Повторный запрос отдается из кэша без обращения к БД """
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "MISS")
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(response.data["results"][0]["name"], "Курс")
+
+    def test_cache_reset_on_lesson_change(self):
+        """ Добавление урока сбрасывает кэш каталога """
+        self.client.get(self.url)
+        Lesson.objects.create(name="Урок", course=self.course)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["results"][0]["lessons_count"], 1)
+
+    def test_cache_stats_for_admin(self):
+        """ Статистика кэша доступна только администраторам """
+        self.client.get(self.url)
+        self.client.get(self.url)
+        stats_url = reverse("materials:courses-cache-stats")
+        user = User.objects.create(email="user@example.com")
+        self.client.force_authenticate(user=user)
+        self.assertEqual(self.client.get(stats_url).status_code, status.HTTP_403_FORBIDDEN)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get(stats_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["hits"], response.data["misses"]), (1, 1))
+
+
+class SubscriptionTestCase(APITestCase):
+    """ Тесты подписки на курсы """
+
+    def setUp(self):
+        self.user = User.objects.create(email="student@example.com")
+        self.client.force_authenticate(user=self.user)
+        self.courses = [Course.objects.create(name=f"Курс {number}", owner=self.user) for number in range(3)]
+
+    def test_subscription_toggle(self):
+        """ Первый запрос подписывает на курс, повторный - отписывает """
+        url = reverse("materials:subscription")
+        response = self.client.post(url, {"course_id": self.courses[0].pk})
+        self.assertEqual(response.data["message"], "подписка добавлена")
+        self.assertTrue(Subscription.objects.filter(user=self.user, course=self.courses[0]).exists())
+
+        response = self.client.post(url, {"course_id": self.courses[0].pk})
+        self.assertEqual(response.data["message"], "подписка удалена")
+        self.assertFalse(Subscription.objects.exists())
+
+    def test_is_subscribed_in_course_list(self):
+        """ Признак подписки вычисляется в запросе списка, без запроса на каждый курс """
+        Subscription.objects.create(user=self.user, course=self.courses[1])
+        response = self.client.get(reverse("materials:courses-list"))
+
+        subscribed = {course["id"]: course["is_subscribed"] for course in response.data["results"]}
+        self.assertEqual(subscribed, {course.pk: course == self.courses[1] for course in self.courses})
+
+    def test_subscribers_stream(self):
+        """ Подписчики курса выдаются порциями по chunk_size """
+        users = [User.objects.create(email=f"user{number}@example.com") for number in range(5)]
+        for user in users:
+            Subscription.objects.create(user=user, course=self.courses[0])
+
+        response = self.client.get(
+            reverse("materials:courses-subscribers", args=[self.courses[0].pk]), {"chunk_size": 2}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        chunks = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(sum(chunks, []), [user.pk for user in users])
+
+
+class CourseNotificationTestCase(APITestCase):
+    """ Тесты очереди уведомлений подписчикам """
+
+    def setUp(self):
+        self.course = Course.objects.create(name="Курс")
+        for number in range(3):
+            user = User.objects.create(email=f"student{number}@example.com")
+            Subscription.objects.create(user=user, course=self.course)
+
+    @override_settings(NOTIFICATION_DEBOUNCE_SECONDS=0, NOTIFICATION_EMAIL_BATCH_SIZE=2)
+    def test_repeated_changes_send_one_notification(self):
+        """ Несколько изменений курса до отправки объединяются в одно письмо каждому подписчику """
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.create(name="Урок", course=self.course)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.name = "Новое название"
+            self.course.save()
+
+        self.assertEqual(CourseNotification.objects.count(), 1)
+        self.assertEqual(process_due_notifications(), 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(CourseNotification.objects.get().status, CourseNotification.STATUS_DONE)
+
+
+@override_settings(DATABASE_REPLICA_ALIASES=["replica"])
+class ReplicaRoutingTestCase(APITransactionTestCase):
+    """ Тесты чтения с реплик БД (реплика в тестах подменяется основной БД; без транзакции теста - см. atomic) """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="reader@example.com")
+        self.course = Course.objects.create(name="Курс", owner=self.user)
+        patcher = mock.patch.object(ReplicaRouter, "get_replica", return_value="default")
+        self.get_replica = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_read_actions_use_replica(self):
+        """ Списки уроков и курсов читаются с реплики """
+        self.client.get(reverse("materials:lessons_list"))
+        self.assertTrue(self.get_replica.called)
+
+        self.get_replica.reset_mock()
+        self.client.force_authenticate(user=self.user)
+        self.client.get(reverse("materials:courses-list"))
+        self.assertTrue(self.get_replica.called)
+
+    def test_user_pinned_to_primary_after_write(self):
+        """ После записи пользователь читает из основной БД (реплика может отставать) """
+        self.client.force_authenticate(user=self.user)
+        self.client.post(reverse("materials:subscription"), {"course_id": self.course.pk})
+        self.client.get(reverse("materials:courses-list"))
+        self.assertFalse(self.get_replica.called)
+
+    async def test_async_middleware(self):
+        """ Асинхронный запрос не переводится в поток; состояние видно в потоке ORM, запись закрепляет пользователя """
+        async def get_response(request):
+            state = await sync_to_async(routing_state.get)()
+            state.wrote = True
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get("/")
+        request.user = self.user
+        await middleware(request)
+        self.assertIsNone(routing_state.get())
+        self.assertTrue(await cache.aget(f"db:pin-primary:{self.user.pk}"))
+
+    def test_read_after_write_in_request(self):
+        """ После записи в запросе чтения идут в основную БД """
+        router = ReplicaRouter()
+        state = RoutingState()
+        token = routing_state.set(state)
+        try:
+            self.assertIsNone(router.db_for_read(Course))
+            state.use_replica = True
+            self.assertEqual(router.db_for_read(Course), "default")
+            self.assertEqual(router.db_for_write(Course), "default")
+            self.get_replica.reset_mock()
+            self.assertIsNone(router.db_for_read(Course))
+            self.assertFalse(self.get_replica.called)
+        finally:
+            routing_state.reset(token)
+
+
+@skipUnless(settings.DATABASE_REPLICA_ALIASES, "нужна реплика БД (DATABASE_REPLICAS, для SQLite - с DATABASE_SQLITE)")
+class ReplicaDatabaseTestCase(APITransactionTestCase):
+    """ Тесты маршрутизации запросов между основной БД и репликой (в тестах - MIRROR основной БД) """
+    databases = {"default", *settings.DATABASE_REPLICA_ALIASES}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="reader@example.com")
+        self.course = Course.objects.create(name="Курс", owner=self.user)
+        self.replica = connections[settings.DATABASE_REPLICA_ALIASES[0]]
+        patcher = mock.patch.object(ReplicaRouter, "get_replica", return_value=self.replica.alias)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def capture(self, request):
+        """ SQL-запросы, выполненные при обработке запроса, по БД: (основная, реплика) """
+        with CaptureQueriesContext(connection) as primary, CaptureQueriesContext(self.replica) as replica:
+            response = request()
+        self.assertLess(response.status_code, 400)
+        return [query["sql"] for query in primary], [query["sql"] for query in replica]
+
+    def test_reads_replica_writes_primary(self):
+        """ Список уроков читается с реплики, подписка записывается в основную БД и закрепляет за ней пользователя """
+        primary, replica = self.capture(lambda: self.client.get(reverse("materials:lessons_list")))
+        self.assertTrue([sql for sql in replica if 'FROM "materials_lesson"' in sql])
+        self.assertFalse([sql for sql in primary if "materials_lesson" in sql])
+
+        self.client.force_authenticate(user=self.user)
+        primary, replica = self.capture(
+            lambda: self.client.post(reverse("materials:subscription"), {"course_id": self.course.pk})
+        )
+        self.assertTrue([sql for sql in primary if sql.startswith('INSERT INTO "materials_subscription"')])
+        self.assertFalse(replica)
+
+        primary, replica = self.capture(lambda: self.client.get(reverse("materials:courses-list")))
+        self.assertFalse(replica)  # после записи - чтение своих изменений из основной БД
+
+    def test_reads_in_atomic_use_primary(self):
+        """ Чтения внутри транзакции основной БД не уходят на реплику """
+        router = ReplicaRouter()
+        state = RoutingState()
+        state.use_replica = True
+        token = routing_state.set(state)
+        try:
+            self.assertEqual(router.db_for_read(Course), self.replica.alias)
+            with transaction.atomic():
+                self.assertIsNone(router.db_for_read(Course))
+                with CaptureQueriesContext(connection) as primary, CaptureQueriesContext(self.replica) as replica:
+                    self.assertTrue(Course.objects.filter(pk=self.course.pk).exists())
+            self.assertEqual(len(primary), 1)
+            self.assertFalse(replica)
+        finally:
+            routing_state.reset(token)
+
+
+class AsyncCatalogTestCase(APITestCase):
+    """ Тесты асинхронных списков курсов и уроков """
+
+    def setUp(self):
+        self.user = User.objects.create(email="reader@example.com")
+        self.courses = [Course.objects.create(name=f"Курс {number}") for number in range(3)]
+        Lesson.objects.create(name="Урок", course=self.courses[0])
+        Subscription.objects.create(user=self.user, course=self.courses[1])
+
+    def test_course_list_pages(self):
+        """ Страницы по ключу after покрывают все курсы; количество уроков и подписка - как в CourseViewSet """
+        token = RoleTokenObtainPairSerializer.get_token(self.user).access_token
+        url = reverse("materials:async_course_list") + "?page_size=2"
+        courses = []
+        while url:
+            response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {token}")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.json())  # без COUNT на каждой странице
+            courses += response.json()["results"]
+            url = response.json()["next"]
+
+        self.assertEqual([course["id"] for course in courses], [course.pk for course in self.courses])
+        self.assertEqual([course["lessons_count"] for course in courses], [1, 0, 0])
+        self.assertEqual([course["is_subscribed"] for course in courses], [False, True, False])
+
+    def test_lesson_list(self):
+        """ Список уроков доступен без аутентификации """
+        response = self.client.get(reverse("materials:async_lessons_list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([lesson["name"] for lesson in response.json()["results"]], ["Урок"])
+
+
+class VideoUrlValidatorTestCase(APITestCase):
+    """ Тесты разбора ссылок на видео YouTube """
+
+    def test_parse_video_id(self):
+        """ Поддерживаемые формы ссылок и отклоняемые ссылки """
+        valid = [
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+            "http://youtube.com/watch?feature=share&v=dQw4w9WgXcQ&t=1",
+            "youtu.be/dQw4w9WgXcQ",
+            "https://www.youtube.com/embed/dQw4w9WgXcQ",
+            "https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ",
+            "https://music.youtube.com/watch?v=dQw4w9WgXcQ",
+        ]
+        invalid = [
+            "https://vimeo.com/dQw4w9WgXcQ",
+            "https://www.youtube.com/watch?v=short",
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQtoolong",
+            "https://www.youtube.com/channel/UC123",
+            "https://youtube.com.evil.ru/watch?v=dQw4w9WgXcQ",
+        ]
+        for url in valid:
+            self.assertEqual(parse_youtube_video_id(url), "dQw4w9WgXcQ", url)
+        for url in invalid:
+            self.assertIsNone(parse_youtube_video_id(url), url)
+
+    def test_benchmark_command(self):
+        """ Микробенчмарк выводит время для каждого способа разбора """
+        out = StringIO()
+        call_command("benchmark_video_urls", "--count", "200", "--repeat", "1", stdout=out)
+        for name in ("legacy", "compiled", "cached", "validated_twice"):
+            self.assertIn(f"{name}: ", out.getvalue())
@@ -2,9 +2,11 @@ from django.urls import path
 from rest_framework.routers import SimpleRouter
 
 from materials.apps import MaterialsConfig
-from materials.views import (CourseViewSet, LessonCreateApiView,
-                             LessonDestroyApiView, LessonListApiView,
-                             LessonRetrieveApiView, LessonUpdateApiView)
+from materials.views import (CourseViewSet, LessonBulkApiView,
+                             LessonCreateApiView, LessonDestroyApiView,
+                             LessonListApiView, LessonRetrieveApiView,
+                             LessonUpdateApiView, SubscriptionApiView,
+                             async_course_list, async_lesson_list)
 
 app_name = (
     MaterialsConfig.name
@@ -17,6 +19,10 @@ urlpatterns = [
     path("lesson/", LessonListApiView.as_view(), name="lessons_list"),
     path("lesson/<int:pk>/", LessonRetrieveApiView.as_view(), name="lesson_retrieve"),
     path("lesson/create/", LessonCreateApiView.as_view(), name="lesson_create"),
+    path("lesson/bulk/", LessonBulkApiView.as_view(), name="lesson_bulk"),
     path("lesson/<int:pk>/update/", LessonUpdateApiView.as_view(), name="lesson_update"),
     path("lesson/<int:pk>/delete/", LessonDestroyApiView.as_view(), name="lesson_delete"),
+    path("subscription/", SubscriptionApiView.as_view(), name="subscription"),
+    path("async/course/", async_course_list, name="async_course_list"),
+    path("async/lesson/", async_lesson_list, name="async_lessons_list"),
 ] + router.urls  # Добавление URL для ViewSet
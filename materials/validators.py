@@ -1,5 +1,33 @@
-from rest_framework import serializers
 import re
+from functools import lru_cache
+
+from rest_framework import serializers
+
+# Ссылки на видео YouTube: youtube.com/watch?v=ID (v - в любом месте строки параметров), youtu.be/ID,
+# youtube.com/embed|shorts|live|v/ID, youtube-nocookie.com/embed/ID; схема и www/m/music - необязательны.
+# Шаблон компилируется один раз при импорте модуля
+YOUTUBE_URL_RE = re.compile(
+    r'^(?:https?://)?(?:(?:www|m|music)\.)?'
+    r'(?:youtube\.com/(?:watch\?(?:[^#]*&)?v=|embed/|shorts/|live/|v/)|youtube-nocookie\.com/embed/|youtu\.be/)'
+    r'(?P<video_id>[A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])',
+    re.IGNORECASE,
+)
+YOUTUBE_VIDEO_URL = 'https://www.youtube.com/watch?v={video_id}'  # каноническая ссылка
+
+
+@lru_cache(maxsize=4096)
+def parse_youtube_video_id(url):
+    """
+    ID видео YouTube (11 символов) из ссылки или None, если ссылка не на видео YouTube.
+    Результат кэшируется: валидатор и сериализатор разбирают одну ссылку один раз, повторы в импорте - бесплатно
+    """
+    match = YOUTUBE_URL_RE.match(url.strip())
+    return match['video_id'] if match else None
+
+
+def canonical_youtube_url(video_id):
+    """ Каноническая ссылка на видео по его ID """
+    return YOUTUBE_VIDEO_URL.format(video_id=video_id)
 
 
 class LessonVideoUrlValidator:
@@ -11,7 +39,5 @@ class LessonVideoUrlValidator:
         if not video_url:  # Если поле пустое - пропускаем
             return
 
-        youtube_regex = r'^(https?\:\/\/)?(www\.)?(youtube\.com|youtu\.be)\/.+'
-
-        if not re.match(youtube_regex, video_url):
-            raise serializers.ValidationError("Урок должен быть ссылкой на YouTube")
+        if parse_youtube_video_id(video_url) is None:
+            raise serializers.ValidationError("Урок должен быть ссылкой на видео YouTube")
@@ -1,24 +1,132 @@
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_http_date_safe
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.generics import (CreateAPIView, DestroyAPIView,
-                                     ListAPIView, RetrieveAPIView,
-                                     UpdateAPIView)
+                                     GenericAPIView, ListAPIView,
+                                     RetrieveAPIView, UpdateAPIView,
+                                     get_object_or_404)
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from materials.models import Course, Lesson
+from common.mixins import BulkCreateUpdateMixin, ConditionalGetMixin, ReplicaReadMixin, SparseFieldsMixin
+from common.pagination import keyset_page
+from materials.caching import (bump_catalog_version, course_list_cache_key,
+                               get_catalog_cache_stats, record_catalog_cache)
+from materials.models import Course, Lesson, Subscription
+from materials.paginators import CourseLessonPaginator
 from materials.serializers import CourseSerializer, LessonSerializer
+from materials.services import annotate_course_catalog, enqueue_course_notification, iter_subscriber_id_chunks
+from materials.validators import parse_youtube_video_id
+from users.authentication import aauthenticate
 from users.permissions import IsModerator, IsOwner
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from users.roles import is_moderator
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 
 
 # Будет использоваться ViewSet
-class CourseViewSet(ModelViewSet):
+class CourseViewSet(SparseFieldsMixin, ReplicaReadMixin, ConditionalGetMixin, ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
+    pagination_class = CourseLessonPaginator
+    sparse_always_load = ('owner', 'updated_at')  # проверка IsOwner и ETag/Last-Modified
+
+    def get_queryset(self):
+        """ План запроса для курсов в зависимости от действия и выбранных полей (?fields=) """
+        queryset = super().get_queryset()
+        if self.action in ['list', 'retrieve']:
+            queryset = annotate_course_catalog(queryset, self.request.user, self.get_output_fields())
+        return queryset
+
+    def get_version_queryset(self):
+        return self.filter_queryset(Course.objects.all())
+
+    def get_list_version(self, queryset):
+        """ Версия списка курсов учитывает и вложенные уроки """
+        last_modified, version = super().get_list_version(queryset)
+        lessons = Lesson.objects.filter(course__in=queryset.values('pk')).aggregate(
+            last_modified=Max('updated_at'), total=Count('pk')
+        )
+        version = (*version, lessons['total'])
+        if self.request.user.is_authenticated:  # признак is_subscribed зависит от подписок пользователя
+            subscriptions = Subscription.objects.filter(user_id=self.request.user.pk).aggregate(
+                last_subscribed=Max('subscribed_at'), total=Count('pk')
+            )
+            version = (*version, self.request.user.pk, subscriptions['last_subscribed'], subscriptions['total'])
+        return max(filter(None, [last_modified, lessons['last_modified']]), default=None), version
+
+    def get_object_version(self, instance):
+        """ Версия курса учитывает уроки (загружены prefetch-запросом) и подписку пользователя, если они в ответе """
+        lessons = instance.lessons.all() if 'lessons_in_course' in self.get_output_fields() else []
+        last_modified = max([instance.updated_at, *(lesson.updated_at for lesson in lessons)])
+        is_subscribed = getattr(instance, 'is_subscribed', None)  # нет аннотации - поля нет в ответе
+        return last_modified, (instance.pk, len(lessons), self.request.user.pk, is_subscribed)
+
+    def object_has_last_modified(self):
+        """ Удаление урока и подписка не меняют updated_at курса - с уроками или подпиской в ответе только ETag """
+        return not {'lessons_in_course', 'is_subscribed'} & set(self.get_output_fields())
+
+    def set_validators(self, response, validators):
+        patch_vary_headers(response, ['Authorization'])  # ответ зависит от пользователя (is_subscribed)
+        return super().set_validators(response, validators)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Список курсов. Ответы анонимным пользователям кэшируются (вместе с ETag) по версии каталога,
+        которая меняется при любом изменении курсов и уроков (materials.signals)
+        """
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+
+        cache_key = course_list_cache_key(request)
+        cached = cache.get(cache_key)
+        record_catalog_cache(hit=cached is not None)
+        if cached is None:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code == 200:
+                validators = (response['ETag'], parse_http_date_safe(response.get('Last-Modified', '')))
+                cache.set(cache_key, (response.data, validators), settings.COURSE_LIST_CACHE_TIMEOUT)
+            response['X-Cache'] = 'MISS'
+            return response
+
+        data, validators = cached
+        response = self.get_not_modified_response(request, validators)
+        if response is None:
+            response = self.set_validators(Response(data), validators)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    @action(detail=False, methods=['get'], url_path='cache-stats', authentication_classes=[JWTAuthentication])
+    def cache_stats(self, request):
+        """ Статистика кэша списка курсов (попадания и промахи) для администраторов """
+        return Response(get_catalog_cache_stats())
+
+    @action(detail=True, methods=['get'])
+    def subscribers(self, request, pk=None):
+        """
+        Потоковая выдача id подписчиков курса для рассылки уведомлений.
+        Каждая строка ответа (NDJSON) - JSON-массив из не более чем chunk_size id
+        """
+        course = self.get_object()
+        try:
+            chunk_size = min(int(request.query_params.get('chunk_size', settings.SUBSCRIBERS_CHUNK_SIZE)), 10000)
+        except ValueError:
+            chunk_size = settings.SUBSCRIBERS_CHUNK_SIZE
+        lines = (f'{json.dumps(chunk)}\n' for chunk in iter_subscriber_id_chunks(course.pk, max(chunk_size, 1)))
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
 
     def perform_create(self, serializer):
         """ Создание курса и сохранение владельца в поле owner """
-        course = serializer.save()
-        course.owner = self.request.user # сохранение владельца курса в поле owner
-        course.save()
+        serializer.save(owner=self.request.user) # сохранение владельца курса в поле owner (одна вставка в БД)
 
 
     def get_permissions(self):
@@ -28,9 +136,12 @@ class CourseViewSet(ModelViewSet):
         elif self.action == 'list':
             # если просмотр списка объектов, то разрешаем всем
             self.permission_classes = [AllowAny]
-        elif self.action in ['update', 'partial_update', 'retrieve']:
-            # если изменение, просмотр деталей объекта, то разрешаем модераторам или владельцу
+        elif self.action in ['update', 'partial_update', 'retrieve', 'subscribers']:
+            # если изменение, просмотр деталей объекта (или его подписчиков), то разрешаем модераторам или владельцу
             self.permission_classes = [IsAuthenticated & (IsModerator | IsOwner)]
+        elif self.action == 'cache_stats':
+            # статистика кэша - только администраторам (пользователь загружается из БД, см. authentication_classes)
+            self.permission_classes = [IsAdminUser]
         elif self.action == 'destroy':
             # если удаление объекта, то разрешаем только владельцу объекта
             self.permission_classes = [IsAuthenticated & IsOwner]
@@ -50,21 +161,62 @@ class LessonCreateApiView(CreateAPIView):
 
     def perform_create(self, serializer):
         """ Создание урока и сохранение владельца в поле owner """
-        lesson = serializer.save()
-        lesson.owner = self.request.user # сохранение владельца урока в поле owner
-        lesson.save()
+        serializer.save(owner=self.request.user) # сохранение владельца урока в поле owner (одна вставка в БД)
+
+
+class LessonBulkApiView(BulkCreateUpdateMixin, GenericAPIView):
+    """ Массовое создание (POST) и изменение (PATCH) уроков списком объектов """
+    queryset = Lesson.objects.all()
+    serializer_class = LessonSerializer
+
+    def get_permissions(self):
+        if self.request.method == 'POST':
+            # создание - всем аутентифицированным пользователям, кроме модераторов (как LessonCreateApiView)
+            self.permission_classes = [IsAuthenticated & ~IsModerator]
+        else:
+            self.permission_classes = [IsAuthenticated]
+        return super().get_permissions()
+
+    def get_bulk_update_queryset(self):
+        """ Модераторы изменяют любые уроки, остальные пользователи - только свои """
+        if is_moderator(self.request.user):
+            return self.get_queryset()
+        return self.get_queryset().filter(owner_id=self.request.user.pk)
 
+    def after_bulk_write(self, objects):
+        # сигналы post_save при массовой записи не отправляются
+        bump_catalog_version()
+        for course_id in {lesson.course_id for lesson in objects}:
+            enqueue_course_notification(course_id)
 
-class LessonListApiView(ListAPIView):
+    def post(self, request, *args, **kwargs):
+        return self.bulk_create(request)
+
+    def patch(self, request, *args, **kwargs):
+        return self.bulk_update(request)
+
+
+class LessonListApiView(SparseFieldsMixin, ReplicaReadMixin, ConditionalGetMixin, ListAPIView):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
+    pagination_class = CourseLessonPaginator
     permission_classes = [AllowAny]
 
+    def get_queryset(self):
+        """ ?video=<ссылка на YouTube> - уроки с тем же видео в любой форме ссылки (поиск по индексу video_id) """
+        queryset = super().get_queryset()
+        video = self.request.query_params.get('video')
+        if video:
+            video_id = parse_youtube_video_id(video)
+            queryset = queryset.filter(video_id=video_id) if video_id else queryset.none()
+        return queryset
+
 
-class LessonRetrieveApiView(RetrieveAPIView):
+class LessonRetrieveApiView(SparseFieldsMixin, ConditionalGetMixin, RetrieveAPIView):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticated & (IsModerator | IsOwner)]
+    sparse_always_load = ('owner', 'updated_at')  # проверка IsOwner и ETag/Last-Modified
 
 
 class LessonUpdateApiView(UpdateAPIView):
@@ -77,3 +229,35 @@ class LessonDestroyApiView(DestroyAPIView):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticated & IsOwner]
+
+
+class SubscriptionApiView(APIView):
+    """ Подписка на курс и отписка от него (повторный запрос с тем же курсом отменяет подписку) """
+
+    def post(self, request, *args, **kwargs):
+        course = get_object_or_404(Course, pk=request.data.get('course_id'))
+        deleted, _ = Subscription.objects.filter(user_id=request.user.pk, course=course).delete()
+        if deleted:
+            message = 'подписка удалена'
+        else:
+            Subscription.objects.get_or_create(user=request.user, course=course)
+            message = 'подписка добавлена'
+        return Response({'message': message})
+
+
+# Асинхронные view для ASGI (config/asgi.py): чтение каталога без занятого на время запроса потока
+@require_GET
+async def async_course_list(request):
+    """ Список курсов (как CourseViewSet.list) на асинхронном ORM """
+    try:
+        user = await aauthenticate(request)  # пользователь нужен только для признака is_subscribed
+    except AuthenticationFailed as error:
+        return JsonResponse({'detail': error.detail}, status=error.status_code)
+    queryset = annotate_course_catalog(Course.objects.all(), user)
+    return JsonResponse(await keyset_page(request, queryset, CourseSerializer))
+
+
+@require_GET
+async def async_lesson_list(request):
+    """ Список уроков (как LessonListApiView) на асинхронном ORM """
+    return JsonResponse(await keyset_page(request, Lesson.objects.all(), LessonSerializer))
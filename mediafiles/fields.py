@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.urls import reverse
+from rest_framework.fields import Field
+
+from mediafiles.images import VARIANT_FORMATS
+
+
+class ImageVariantsField(Field):
+    """
+    Ссылки на уменьшенные копии изображения для списков: {"thumb": {"webp": url, "jpeg": url}, ...}.
+    Копии создаются воркером после загрузки, а при первом запросе до обработки - сразу (mediafiles.views)
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+        urls = {}
+        for variant in settings.IMAGE_VARIANTS:
+            urls[variant] = {}
+            for file_format in VARIANT_FORMATS:
+                url = reverse('mediafiles:image_variant', kwargs={
+                    'variant': variant, 'path': f'{value.name}.{file_format}'
+                })
+                urls[variant][file_format] = request.build_absolute_uri(url) if request else url
+        return urls
@@ -0,0 +1,102 @@
+import os
+import posixpath
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Форматы уменьшенных копий: расширение файла -> (формат Pillow, тип содержимого)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+# Папки загрузки изображений (upload_to полей Course.image, Lesson.image, User.avatar)
+SOURCE_DIRS = ('materials/photo/', 'users/avatars/')
+
+
+def is_source_image(path):
+    """ Путь к загруженному изображению внутри MEDIA_ROOT (без выхода за пределы папок загрузки) """
+    return posixpath.normpath(path) == path and path.startswith(SOURCE_DIRS)
+
+
+def variant_path(path, variant, file_format):
+    """ Путь уменьшенной копии в MEDIA_ROOT: variants/<вариант>/<путь исходного файла>.<формат> """
+    return posixpath.join(settings.IMAGE_VARIANTS_DIR, variant, f'{path}.{file_format}')
+
+
+def variants_exist(path):
+    """ Созданы ли уменьшенные копии изображения (проверяется последняя создаваемая копия) """
+    variant = list(settings.IMAGE_VARIANTS)[-1]
+    return default_storage.exists(variant_path(path, variant, list(VARIANT_FORMATS)[-1]))
+
+
+def render_variant(image, size, file_format):
+    """ Уменьшенная копия изображения с сохранением пропорций (в байтах) """
+    pillow_format = VARIANT_FORMATS[file_format][0]
+    variant = image.copy()
+    variant.thumbnail(size, Image.Resampling.LANCZOS)
+    has_alpha = variant.mode in ('RGBA', 'LA') or (variant.mode == 'P' and 'transparency' in variant.info)
+    if has_alpha and pillow_format == 'WEBP':
+        variant = variant.convert('RGBA')
+    elif has_alpha:  # в JPEG нет прозрачности - фон белый
+        background = Image.new('RGB', variant.size, 'white')
+        background.paste(variant, mask=variant.convert('RGBA').getchannel('A'))
+        variant = background
+    else:
+        variant = variant.convert('RGB')
+
+    buffer = BytesIO()
+    variant.save(buffer, pillow_format, quality=settings.IMAGE_VARIANT_QUALITY, optimize=pillow_format == 'JPEG')
+    return buffer.getvalue()
+
+
+def _write_file(name, content):
+    """ Атомарная запись файла в MEDIA_ROOT: параллельные обработчики не видят недописанный файл """
+    full_path = default_storage.path(name)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(full_path))
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(content)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, full_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def generate_variants(path, variants=None):
+    """
+    Создание уменьшенных копий изображения, которых еще нет на диске (исходный файл декодируется один раз).
+    variants - список пар (вариант, формат), по умолчанию все варианты IMAGE_VARIANTS во всех форматах.
+    Возвращает количество созданных копий
+    """
+    if variants is None:
+        variants = [(variant, file_format) for variant in settings.IMAGE_VARIANTS for file_format in VARIANT_FORMATS]
+    missing = [item for item in variants if not default_storage.exists(variant_path(path, *item))]
+    if not missing:
+        return 0
+
+    with default_storage.open(path, 'rb') as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)  # поворот по EXIF (фото с телефонов)
+        for variant, file_format in missing:
+            _write_file(
+                variant_path(path, variant, file_format),
+                render_variant(image, settings.IMAGE_VARIANTS[variant], file_format),
+            )
+    return len(missing)
+
+
+def delete_image(path):
+    """ Удаление изображения и его уменьшенных копий из MEDIA_ROOT """
+    for name in (path, *(variant_path(path, variant, file_format)
+                         for variant in settings.IMAGE_VARIANTS for file_format in VARIANT_FORMATS)):
+        default_storage.delete(name)  # отсутствующий файл пропускается
+
+
+def get_variant(path, variant, file_format):
+    """ Путь уменьшенной копии; если копии нет (воркер еще не обработал изображение) - она создается сразу """
+    generate_variants(path, [(variant, file_format)])
+    return variant_path(path, variant, file_format)
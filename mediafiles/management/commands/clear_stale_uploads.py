@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from mediafiles.services import clear_stale_uploads
+
+
+class Command(BaseCommand):
+    """ Очистка брошенных загрузок частями (запускается по расписанию, например раз в час) """
+    help = 'Удаление загрузок частями старше UPLOAD_EXPIRE_HOURS часов'
+
+    def handle(self, *args, **options):
+        deleted = clear_stale_uploads()
+        self.stdout.write(self.style.SUCCESS(f'Удалено загрузок: {deleted}'))
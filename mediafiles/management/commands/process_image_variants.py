@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mediafiles.services import process_image_tasks
+
+
+class Command(BaseCommand):
+    """ Воркер очереди обработки загруженных изображений """
+    help = 'Создание уменьшенных копий загруженных изображений (воркер очереди в БД)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Обработать очередь один раз и завершиться')
+        parser.add_argument('--interval', type=float, default=5, help='Пауза между проверками очереди, сек')
+        parser.add_argument('--limit', type=int, default=50, help='Количество заданий за одну проверку')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_image_tasks(limit=options['limit'])
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f'Обработано изображений: {processed}'))
+            if options['once']:
+                break
+            if processed < options['limit']:  # очередь разобрана - ждем новые задания
+                time.sleep(options['interval'])
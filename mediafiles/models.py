@@ -0,0 +1,84 @@
+import uuid
+
+from django.conf import settings
+from django.db import models
+
+
+class ImageVariantTask(models.Model):
+    """Задание на создание уменьшенных копий загруженного изображения (очередь в БД)"""
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSING = "processing"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Ожидает обработки"),
+        (STATUS_PROCESSING, "Обрабатывается"),
+        (STATUS_DONE, "Готово"),
+        (STATUS_FAILED, "Ошибка"),
+    ]
+
+    path = models.CharField(max_length=255, verbose_name="Путь к изображению в MEDIA_ROOT")
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name="Статус",
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Взято в обработку")
+    last_error = models.TextField(blank=True, default="", verbose_name="Ошибка")
+
+    class Meta:
+        verbose_name = "Задание на обработку изображения"
+        verbose_name_plural = "Задания на обработку изображений"
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='image_task_status_idx'),
+        ]
+        constraints = [
+            # одно ожидающее задание на изображение - повторные сохранения записи не дублируют обработку
+            models.UniqueConstraint(
+                fields=['path'],
+                condition=models.Q(status="pending"),
+                name='unique_pending_image_task',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Обработка изображения {self.path} ({self.get_status_display()})"
+
+
+class ChunkedUpload(models.Model):
+    """
+    Загрузка изображения частями с возможностью продолжения после обрыва (протокол по образцу tus).
+    Части дописываются в файл на диске, после загрузки файл переносится в поле изображения записи
+    """
+    TARGET_COURSE = "course"
+    TARGET_LESSON = "lesson"
+    TARGET_AVATAR = "avatar"
+    TARGET_CHOICES = [
+        (TARGET_COURSE, "Изображение курса"),
+        (TARGET_LESSON, "Изображение урока"),
+        (TARGET_AVATAR, "Аватар пользователя"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="uploads",
+        verbose_name="Пользователь",
+    )
+    target = models.CharField(max_length=20, choices=TARGET_CHOICES, verbose_name="Назначение")
+    object_id = models.PositiveBigIntegerField(verbose_name="ID курса, урока или пользователя")
+    filename = models.CharField(max_length=255, verbose_name="Имя файла")
+    size = models.PositiveBigIntegerField(verbose_name="Размер файла, байт")
+    offset = models.PositiveBigIntegerField(default=0, verbose_name="Загружено, байт")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата завершения")
+
+    class Meta:
+        verbose_name = "Загрузка файла"
+        verbose_name_plural = "Загрузки файлов"
+
+    def __str__(self):
+        return f"Загрузка {self.filename} ({self.offset} из {self.size} байт)"
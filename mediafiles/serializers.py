@@ -0,0 +1,21 @@
+from django.conf import settings
+from rest_framework.serializers import ModelSerializer, ValidationError
+
+from mediafiles.models import ChunkedUpload
+
+
+class ChunkedUploadSerializer(ModelSerializer):
+    """ Сериализатор загрузки изображения частями """
+
+    def validate_size(self, size):
+        """ Размер файла заявляется при создании загрузки и ограничен UPLOAD_MAX_SIZE """
+        if size == 0:
+            raise ValidationError('Файл пустой')
+        if size > settings.UPLOAD_MAX_SIZE:
+            raise ValidationError(f'Размер файла не должен превышать {settings.UPLOAD_MAX_SIZE} байт')
+        return size
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ("id", "target", "object_id", "filename", "size", "offset", "created_at", "completed_at",)
+        read_only_fields = ("offset", "created_at", "completed_at",)
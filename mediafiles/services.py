@@ -0,0 +1,225 @@
+import os
+import posixpath
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import UnreadablePostError
+from django.utils import timezone
+from PIL import Image
+from rest_framework.exceptions import PermissionDenied, ValidationError
+
+from materials.models import Course, Lesson
+from mediafiles.images import delete_image, generate_variants
+from mediafiles.models import ChunkedUpload, ImageVariantTask
+from users.models import User
+from users.roles import is_moderator
+
+# Назначения загрузок частями: модель и поле изображения
+UPLOAD_TARGETS = {
+    ChunkedUpload.TARGET_COURSE: (Course, 'image'),
+    ChunkedUpload.TARGET_LESSON: (Lesson, 'image'),
+    ChunkedUpload.TARGET_AVATAR: (User, 'avatar'),
+}
+# Сигнатуры PNG, JPEG и GIF в начале файла (WebP проверяется отдельно: RIFF....WEBP)
+IMAGE_SIGNATURES = (b'\x89PNG\r\n\x1a\n', b'\xff\xd8\xff', b'GIF87a', b'GIF89a')
+IMAGE_HEADER_SIZE = 12
+# Расширения файлов по формату, определенному Pillow
+IMAGE_EXTENSIONS = {'PNG': 'png', 'JPEG': 'jpg', 'GIF': 'gif', 'WEBP': 'webp'}
+UPLOAD_READ_SIZE = 64 * 1024  # тело запроса читается и пишется на диск блоками, а не целиком в память
+
+
+class InvalidImageError(ValidationError):
+    """ Загружаемый файл не является изображением - загрузка отменяется """
+
+
+def enqueue_image_variants(path):
+    """ Постановка изображения в очередь на создание уменьшенных копий (воркер process_image_variants) """
+    if ImageVariantTask.objects.filter(path=path, status=ImageVariantTask.STATUS_PENDING).exists():
+        return
+    try:
+        with transaction.atomic():
+            ImageVariantTask.objects.create(path=path)
+    except IntegrityError:  # задание создано параллельным запросом
+        pass
+
+
+def claim_image_tasks(limit):
+    """
+    Выбор ожидающих заданий и пометка их как обрабатываемых.
+    Задания, зависшие в обработке (воркер остановлен), берутся повторно через IMAGE_TASK_LOCK_TIMEOUT секунд
+    """
+    now = timezone.now()
+    stale_lock = now - timedelta(seconds=settings.IMAGE_TASK_LOCK_TIMEOUT)
+    stale = Q(status=ImageVariantTask.STATUS_PROCESSING, locked_at__lt=stale_lock)
+    with transaction.atomic():
+        tasks = list(
+            ImageVariantTask.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=ImageVariantTask.STATUS_PENDING) | stale)
+            .order_by('created_at')[:limit]
+        )
+        ImageVariantTask.objects.filter(pk__in=[task.pk for task in tasks]).update(
+            status=ImageVariantTask.STATUS_PROCESSING, locked_at=now
+        )
+    return tasks
+
+
+def process_image_tasks(limit=100):
+    """
+    Создание уменьшенных копий для заданий из очереди (вызывается воркером process_image_variants).
+    Ошибка обработки (файл удален, не изображение) не повторяется - задание помечается ошибочным.
+    Возвращает количество обработанных заданий
+    """
+    tasks = claim_image_tasks(limit)
+    for task in tasks:
+        try:
+            generate_variants(task.path)
+        except Exception as error:
+            status, last_error = ImageVariantTask.STATUS_FAILED, str(error)
+        else:
+            status, last_error = ImageVariantTask.STATUS_DONE, ''
+        ImageVariantTask.objects.filter(pk=task.pk).update(status=status, locked_at=None, last_error=last_error)
+    return len(tasks)
+
+
+def get_upload_target(user, target, object_id):
+    """ Запись, к которой прикрепляется изображение: свой курс или урок (модератору - любой) или свой аватар """
+    model, _ = UPLOAD_TARGETS[target]
+    instance = model.objects.filter(pk=object_id).first()
+    if instance is None:
+        raise ValidationError({'object_id': ['Объект не найден']})
+    if target == ChunkedUpload.TARGET_AVATAR:
+        allowed = instance.pk == user.pk
+    else:
+        allowed = instance.owner_id == user.pk or is_moderator(user)
+    if not allowed:
+        raise PermissionDenied('Недостаточно прав для изменения изображения этого объекта')
+    return instance
+
+
+def partial_path(upload):
+    """ Путь к недозагруженному файлу на диске """
+    return default_storage.path(posixpath.join(settings.UPLOAD_PARTIAL_DIR, f'{upload.pk}.part'))
+
+
+def create_upload(user, **data):
+    """ Начало загрузки частями: запись о загрузке и пустой файл, в который дописываются части """
+    get_upload_target(user, data['target'], data['object_id'])
+    upload = ChunkedUpload.objects.create(user=user, **data)
+    path = partial_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'xb').close()
+    return upload
+
+
+def is_image_header(header):
+    """ Начало файла - заголовок PNG, JPEG, GIF или WebP (без декодирования изображения) """
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return True
+    return header.startswith(IMAGE_SIGNATURES)
+
+
+def write_chunk(upload, stream, length):
+    """
+    Запись очередной части файла из тела запроса с текущего смещения загрузки.
+    Первая часть должна начинаться с заголовка изображения. При обрыве соединения сохраняется полученная
+    часть - клиент узнает смещение (HEAD) и продолжает с него. Последняя часть завершает загрузку
+    """
+    if upload.offset + length > upload.size:
+        raise ValidationError('Часть выходит за пределы заявленного размера файла')
+
+    written = 0
+    with open(partial_path(upload), 'r+b') as file:
+        file.seek(upload.offset)
+        try:
+            if upload.offset == 0 and length:
+                header = stream.read(min(IMAGE_HEADER_SIZE, length))
+                if not is_image_header(header):
+                    raise InvalidImageError('Файл не является изображением PNG, JPEG, GIF или WebP')
+                file.write(header)
+                written += len(header)
+            while written < length:
+                data = stream.read(min(UPLOAD_READ_SIZE, length - written))
+                if not data:
+                    break
+                file.write(data)
+                written += len(data)
+        except UnreadablePostError:  # обрыв соединения
+            pass
+
+    upload.offset += written
+    if upload.offset == upload.size:
+        complete_upload(upload)
+    else:
+        upload.save(update_fields=['offset'])
+
+
+def complete_upload(upload):
+    """
+    Прикрепление загруженного файла к записи: файл переносится в папку поля изображения жесткой ссылкой
+    (без копирования данных), проверяется только заголовок изображения.
+    Недозагруженный файл и прежнее изображение записи удаляются после фиксации транзакции;
+    если запись в БД не удалась, удаляется созданная ссылка, а загрузку можно завершить повторно
+    """
+    source = partial_path(upload)
+    try:
+        with Image.open(source) as image:  # слишком большое изображение - DecompressionBombError
+            extension = IMAGE_EXTENSIONS.get(image.format)
+    except (OSError, Image.DecompressionBombError):
+        extension = None
+    if extension is None:
+        raise InvalidImageError('Файл поврежден или не является изображением PNG, JPEG, GIF или WebP')
+
+    instance = get_upload_target(upload.user, upload.target, upload.object_id)
+    field_name = UPLOAD_TARGETS[upload.target][1]
+    previous = getattr(instance, field_name).name
+    filename = f'{posixpath.splitext(upload.filename)[0] or "image"}.{extension}'
+    name = instance._meta.get_field(field_name).generate_filename(instance, filename)
+    while True:
+        name = default_storage.get_available_name(name)
+        destination = default_storage.path(name)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        try:
+            os.link(source, destination)  # не перезаписывает файл, созданный параллельно под тем же именем
+            break
+        except FileExistsError:
+            continue
+
+    try:
+        with transaction.atomic():
+            setattr(instance, field_name, name)
+            auto_now_fields = [
+                field.name for field in instance._meta.concrete_fields if getattr(field, 'auto_now', False)
+            ]
+            instance.save(update_fields=[field_name, *auto_now_fields])  # уменьшенные копии - сигналом mediafiles
+            upload.completed_at = timezone.now()
+            upload.save(update_fields=['offset', 'completed_at'])
+    except BaseException:
+        os.unlink(destination)
+        raise
+
+    def remove_replaced_files():
+        if os.path.exists(source):
+            os.unlink(source)
+        if previous and previous != name:
+            delete_image(previous)
+
+    transaction.on_commit(remove_replaced_files)
+
+
+def delete_upload(upload):
+    """ Отмена загрузки: удаление записи и недозагруженного файла """
+    if os.path.exists(partial_path(upload)):
+        os.unlink(partial_path(upload))
+    upload.delete()
+
+
+def clear_stale_uploads():
+    """ Удаление загрузок старше UPLOAD_EXPIRE_HOURS часов (недозагруженные файлы удаляются с диска) """
+    expired = timezone.now() - timedelta(hours=settings.UPLOAD_EXPIRE_HOURS)
+    uploads = list(ChunkedUpload.objects.filter(created_at__lt=expired))
+    for upload in uploads:
+        delete_upload(upload)
+    return len(uploads)
@@ -0,0 +1,140 @@
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from materials.models import Lesson, Subscription
+from mediafiles.images import VARIANT_FORMATS
+from users.roles import is_moderator
+
+# Режимы отдачи файлов: Django читает файл сам или передает отдачу веб-серверу после проверки доступа
+SERVE_MODE_DJANGO = 'django'
+SERVE_MODE_ACCEL_REDIRECT = 'x-accel-redirect'  # nginx, internal location MEDIA_ACCEL_REDIRECT_PREFIX
+SERVE_MODE_SENDFILE = 'x-sendfile'  # Apache mod_xsendfile, lighttpd
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+READ_SIZE = 64 * 1024
+
+
+def is_media_path(path):
+    """ Путь внутри MEDIA_ROOT без выхода за его пределы (недозагруженные файлы не отдаются) """
+    if not path or posixpath.normpath(path) != path:
+        return False
+    return not path.startswith(('/', '..', f'{settings.UPLOAD_PARTIAL_DIR}/'))
+
+
+def source_image(path):
+    """ Путь исходного изображения для уменьшенной копии (variants/<вариант>/<путь>.<формат>) или сам путь """
+    parts = path.split('/', 2)
+    if len(parts) == 3 and parts[0] == settings.IMAGE_VARIANTS_DIR:
+        source, _, file_format = parts[2].rpartition('.')
+        if file_format in VARIANT_FORMATS:
+            return source
+    return path
+
+
+def find_media_lesson(path):
+    """ Урок, которому принадлежит изображение (или его уменьшенная копия); None - файл не принадлежит уроку """
+    return Lesson.objects.filter(image=source_image(path)).values('owner_id', 'course_id', 'course__owner_id').first()
+
+
+def can_access_lesson_media(user, lesson):
+    """ Изображения урока доступны владельцу урока или курса, подписчикам курса и модераторам """
+    if not user.is_authenticated:
+        return False
+    if user.pk in (lesson['owner_id'], lesson['course__owner_id']) or is_moderator(user):
+        return True
+    return Subscription.objects.filter(user_id=user.pk, course_id=lesson['course_id']).exists()
+
+
+def parse_range(header, size):
+    """
+    Диапазон байтов из заголовка Range (поддерживается один диапазон): (начало, конец включительно),
+    None - заголовка нет или он не поддерживается (отдается весь файл), ValueError - диапазон вне файла
+    """
+    match = RANGE_RE.match(header or '')
+    if match is None or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start == '':  # последние N байт
+        if int(end) == 0:
+            raise ValueError
+        return max(size - int(end), 0), size - 1
+    start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError
+    return start, end
+
+
+def _read_range(path, start, length):
+    """ Чтение диапазона файла блоками (файл закрывается по окончании или закрытии ответа) """
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            data = file.read(min(READ_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def serve_media(request, name, public=True, max_age=None, content_type=None):
+    """
+    Ответ с файлом из MEDIA_ROOT с заголовками кэширования (ETag, Last-Modified, Cache-Control) и поддержкой Range.
+    В режимах x-accel-redirect и x-sendfile (MEDIA_SERVE_MODE) Django только проверяет доступ и заголовки,
+    файл (в том числе диапазоны) отдает веб-сервер без чтения через Python
+    """
+    path = default_storage.path(name)
+    stat = os.stat(path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    content_type = content_type or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        if settings.MEDIA_SERVE_MODE == SERVE_MODE_ACCEL_REDIRECT:
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(name)
+        elif settings.MEDIA_SERVE_MODE == SERVE_MODE_SENDFILE:
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = path
+        else:
+            response = _file_response(request, path, stat.st_size, content_type)
+        response['Accept-Ranges'] = 'bytes'
+        response['Last-Modified'] = http_date(stat.st_mtime)
+
+    response['ETag'] = etag
+    if max_age is None:
+        max_age = settings.MEDIA_CACHE_SECONDS
+    if public:
+        patch_cache_control(response, public=True, max_age=max_age)
+    else:  # файл доступен не всем - не сохраняется в общих кэшах (CDN, прокси)
+        patch_cache_control(response, private=True, max_age=max_age)
+    return response
+
+
+def _file_response(request, path, size, content_type):
+    """ Отдача файла блоками через Django (режим по умолчанию и разработка): весь файл или диапазон Range """
+    try:
+        byte_range = parse_range(request.headers.get('Range'), size) if request.method == 'GET' else None
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    response = StreamingHttpResponse(
+        _read_range(path, start, end - start + 1) if request.method == 'GET' else [],
+        status=206 if byte_range else 200,
+        content_type=content_type,
+    )
+    response['Content-Length'] = str(max(end - start + 1, 0))
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
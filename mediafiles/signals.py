@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save
+
+from materials.models import Course, Lesson
+from mediafiles.images import is_source_image, variants_exist
+from mediafiles.services import enqueue_image_variants
+from users.models import User
+
+# Модели с изображениями: модель -> поле изображения
+IMAGE_FIELDS = {
+    Course: 'image',
+    Lesson: 'image',
+    User: 'avatar',
+}
+
+
+def _image_name(instance, field_name):
+    """ Имя файла изображения без загрузки отложенного поля (only/defer): None - поле не загружено или пустое """
+    value = instance.__dict__.get(field_name)
+    return getattr(value, 'name', value) or None
+
+
+def remember_loaded_image(sender, instance, **kwargs):
+    """ Имя изображения при загрузке записи из БД - для сравнения при сохранении """
+    instance._loaded_image_name = _image_name(instance, IMAGE_FIELDS[sender])
+
+
+def enqueue_uploaded_image(sender, instance, created, update_fields, **kwargs):
+    """
+    Уменьшенные копии нового изображения создаются воркером, ответ на загрузку их не ждет.
+    Сохранения без изменения изображения (например, last_login при входе) пропускаются без обращения к диску
+    """
+    field_name = IMAGE_FIELDS[sender]
+    if update_fields is not None and field_name not in update_fields:
+        return
+    name = _image_name(instance, field_name)
+    changed = created or name != getattr(instance, '_loaded_image_name', None)
+    instance._loaded_image_name = name
+    if changed and name and is_source_image(name) and not variants_exist(name):
+        transaction.on_commit(lambda: enqueue_image_variants(name))
+
+
+for model in IMAGE_FIELDS:
+    post_init.connect(remember_loaded_image, sender=model, dispatch_uid=f'remember_loaded_image_{model.__name__}')
+    post_save.connect(enqueue_uploaded_image, sender=model, dispatch_uid=f'enqueue_uploaded_image_{model.__name__}')
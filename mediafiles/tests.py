@@ -0,0 +1,266 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from materials.models import Course, Lesson, Subscription
+from mediafiles.images import variant_path
+from mediafiles.models import ChunkedUpload, ImageVariantTask
+from users.models import User
+
+
+def make_image(size=(1200, 800), mode='RGB', file_format='PNG'):
+    """ Изображение для загрузки в тестах """
+    buffer = BytesIO()
+    Image.new(mode, size, 'red').save(buffer, file_format)
+    return ContentFile(buffer.getvalue(), name=f'photo.{file_format.lower()}')
+
+
+class ImageVariantsTestCase(APITestCase):
+    """ Тесты создания уменьшенных копий изображений """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def create_course(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Course.objects.create(name="Курс", image=make_image(**kwargs))
+
+    def test_upload_enqueues_task(self):
+        """ Сохранение записи с изображением ставит одно задание в очередь; без изображения - не ставит """
+        course = self.create_course()
+        with self.captureOnCommitCallbacks(execute=True):
+            course.save()
+            Course.objects.create(name="Без изображения")
+        self.assertEqual(ImageVariantTask.objects.get().path, course.image.name)
+
+    def test_unchanged_image_not_checked(self):
+        """ Сохранение без изменения изображения (вход пользователя, правка названия) не проверяет копии на диске """
+        course = self.create_course()
+        user = User.objects.create(email="user@test.ru", avatar=make_image())
+        with mock.patch("mediafiles.signals.variants_exist") as variants_exist:
+            user.save(update_fields=["last_login"])
+            course.name = "Новое название"
+            course.save()
+            Course.objects.get(pk=course.pk).save()
+            Course.objects.only("name").get(pk=course.pk).save(update_fields=["name"])
+        self.assertFalse(variants_exist.called)
+
+    def test_worker_generates_variants(self):
+        """ Воркер создает копии всех размеров в WebP и JPEG с сохранением пропорций """
+        course = self.create_course(mode='RGBA')
+        call_command('process_image_variants', '--once', stdout=StringIO())
+
+        task = ImageVariantTask.objects.get()
+        self.assertEqual(task.status, ImageVariantTask.STATUS_DONE)
+        with Image.open(f'{self.media_root}/{variant_path(course.image.name, "thumb", "webp")}') as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (160, 107)))
+        with Image.open(f'{self.media_root}/{variant_path(course.image.name, "medium", "jpeg")}') as image:
+            self.assertEqual((image.format, image.mode, image.size), ('JPEG', 'RGB', (640, 427)))
+
+    def test_broken_image_marks_task_failed(self):
+        """ Файл, не являющийся изображением, не прерывает обработку очереди """
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.create(name="Курс", image=ContentFile(b'not an image', name='photo.png'))
+        call_command('process_image_variants', '--once', stdout=StringIO())
+        self.assertEqual(ImageVariantTask.objects.get().status, ImageVariantTask.STATUS_FAILED)
+
+    def test_serializer_links(self):
+        """ В списке курсов - ссылки на копии; копия создается при первом запросе, если воркер ее не создал """
+        course = self.create_course()
+        response = self.client.get(reverse("materials:courses-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        url = response.json()["results"][0]["image_variants"]["thumb"]["webp"]
+        self.assertTrue(url.endswith(f'/mediafiles/variants/thumb/{course.image.name}.webp'))
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('max-age=', response['Cache-Control'])
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (160, 107))
+
+    def test_variant_view_rejects_unknown_paths(self):
+        """ Неизвестный размер, формат или путь вне папок загрузки - 404 """
+        course = self.create_course()
+        for variant, path in (
+            ('huge', f'{course.image.name}.webp'),
+            ('thumb', f'{course.image.name}.gif'),
+            ('thumb', '../config/settings.py.webp'),
+            ('thumb', 'materials/photo/missing.png.webp'),
+        ):
+            response = self.client.get(reverse("mediafiles:image_variant", kwargs={'variant': variant, 'path': path}))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, path)
+
+    def test_user_avatar_variants(self):
+        """ Аватар пользователя тоже получает уменьшенные копии """
+        user = User.objects.create(email="user@test.ru")
+        with self.captureOnCommitCallbacks(execute=True):
+            user.avatar = make_image(file_format='JPEG')
+            user.save()
+        self.assertEqual(ImageVariantTask.objects.get().path, user.avatar.name)
+
+
+class ChunkedUploadTestCase(APITestCase):
+    """ Тесты загрузки изображений частями """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.user = User.objects.create(email="owner@test.ru")
+        self.course = Course.objects.create(name="Курс", owner=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.content = make_image().read()
+
+    def start_upload(self, **data):
+        data = {"target": "course", "object_id": self.course.pk, "filename": "cover.png",
+                "size": len(self.content), **data}
+        return self.client.post(reverse("mediafiles:upload_create"), data, format="json")
+
+    def send_chunk(self, url, offset, chunk):
+        return self.client.patch(url, chunk, content_type="application/offset+octet-stream",
+                                 headers={"Upload-Offset": str(offset)})
+
+    def test_resumable_upload(self):
+        """ Части дописываются в файл, после обрыва загрузка продолжается с сохраненного смещения """
+        response = self.start_upload()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        url = response["Location"]
+
+        response = self.send_chunk(url, 0, self.content[:100])
+        self.assertEqual(response["Upload-Offset"], "100")
+        response = self.send_chunk(url, 50, self.content[50:])  # клиент не знает, что часть уже загружена
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        offset = int(self.client.head(url)["Upload-Offset"])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.send_chunk(url, offset, self.content[offset:])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(response.json()["completed_at"])
+
+        self.course.refresh_from_db()
+        self.assertTrue(self.course.image.name.startswith("materials/photo/cover"))
+        with self.course.image.open("rb") as file:
+            self.assertEqual(file.read(), self.content)
+        self.assertEqual(ImageVariantTask.objects.get().path, self.course.image.name)
+        self.assertFalse(Path(self.media_root, "uploads", f"{response.json()['id']}.part").exists())
+
+    def test_replace_image_and_failed_save(self):
+        """ Прежнее изображение удаляется после фиксации; при ошибке записи в БД загрузку можно завершить снова """
+        self.course.image = make_image()
+        self.course.save()
+        previous = Path(self.media_root, self.course.image.name)
+        url = self.start_upload()["Location"]
+
+        with mock.patch.object(Course, "save", side_effect=DatabaseError), self.assertRaises(DatabaseError):
+            self.send_chunk(url, 0, self.content)
+        self.assertEqual(len(list(Path(self.media_root, "materials/photo").iterdir())), 1)  # ссылка удалена
+        self.assertTrue(previous.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.send_chunk(url, 0, self.content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(previous.exists())
+        self.course.refresh_from_db()
+        self.assertTrue(Path(self.media_root, self.course.image.name).exists())
+
+    def test_rejects_non_image(self):
+        """ Файл без заголовка изображения отклоняется по первой части, загрузка удаляется """
+        url = self.start_upload()["Location"]
+        response = self.send_chunk(url, 0, b"<?php echo 'not an image'; ?>")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_upload_permissions_and_size(self):
+        """ Чужой курс - 403, размер больше UPLOAD_MAX_SIZE - 400, свой аватар - можно """
+        other = User.objects.create(email="other@test.ru")
+        response = self.start_upload(target="avatar", object_id=other.pk)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        with override_settings(UPLOAD_MAX_SIZE=10):
+            self.assertEqual(self.start_upload().status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.start_upload(target="avatar", object_id=self.user.pk).status_code,
+                         status.HTTP_201_CREATED)
+
+
+class MediaServingTestCase(APITestCase):
+    """ Тесты отдачи загруженных файлов """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=self.media_root, MEDIA_SERVE_MODE="django")
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.owner = User.objects.create(email="owner@test.ru")
+        self.course = Course.objects.create(name="Курс", owner=self.owner, image=make_image())
+        self.lesson = Lesson.objects.create(name="Урок", course=self.course, owner=self.owner, image=make_image())
+        self.student = User.objects.create(email="student@test.ru")
+
+    def test_ranges_and_conditional_requests(self):
+        """ Файл отдается целиком или диапазоном Range, повторный запрос с ETag - 304 """
+        url = self.course.image.url
+        content = b''.join(self.client.get(url).streaming_content)
+        with self.course.image.open("rb") as file:
+            self.assertEqual(content, file.read())
+
+        response = self.client.get(url, headers={"Range": "bytes=10-19"})
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), content[10:20])
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{len(content)}")
+        response = self.client.get(url, headers={"Range": "bytes=-5"})
+        self.assertEqual(b''.join(response.streaming_content), content[-5:])
+        response = self.client.get(url, headers={"Range": f"bytes={len(content)}-"})
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+        response = self.client.get(url, headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertIn("public", response["Cache-Control"])
+
+    def test_lesson_image_access(self):
+        """ Изображение урока - только подписчикам курса и владельцу; отдачу выполняет nginx """
+        url = self.lesson.image.url
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_authenticate(user=self.student)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        Subscription.objects.create(user=self.student, course=self.course)
+        with override_settings(MEDIA_SERVE_MODE="x-accel-redirect"):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{self.lesson.image.name}")
+        self.assertEqual(response.content, b"")
+        self.assertIn("private", response["Cache-Control"])
+
+        variant_url = reverse("mediafiles:image_variant", kwargs={
+            "variant": "thumb", "path": f"{self.lesson.image.name}.jpeg"
+        })
+        self.assertEqual(self.client.get(variant_url).status_code, status.HTTP_200_OK)
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(variant_url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_partial_uploads_not_served(self):
+        """ Недозагруженные файлы и пути вне MEDIA_ROOT не отдаются """
+        Path(self.media_root, "uploads").mkdir()
+        Path(self.media_root, "uploads", "file.part").write_bytes(b"partial")
+        for path in ("uploads/file.part", "../etc/passwd", "materials/photo/../../secret"):
+            response = self.client.get(f"/media/{path}")
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, path)
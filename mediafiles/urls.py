@@ -0,0 +1,12 @@
+from django.urls import path
+
+from mediafiles.apps import MediafilesConfig
+from mediafiles.views import ImageVariantApiView, UploadApiView, UploadCreateApiView
+
+app_name = MediafilesConfig.name  # Извлечение имени приложения из модуля mediafiles/apps.py
+
+urlpatterns = [
+    path("variants/<str:variant>/<path:path>", ImageVariantApiView.as_view(), name="image_variant"),
+    path("uploads/", UploadCreateApiView.as_view(), name="upload_create"),
+    path("uploads/<uuid:pk>/", UploadApiView.as_view(), name="upload"),
+]
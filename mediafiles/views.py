@@ -0,0 +1,142 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import OperationalError, transaction
+from django.http import Http404
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.generics import CreateAPIView
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from mediafiles.images import VARIANT_FORMATS, get_variant, is_source_image
+from mediafiles.models import ChunkedUpload
+from mediafiles.serializers import ChunkedUploadSerializer
+from mediafiles.serving import can_access_lesson_media, find_media_lesson, is_media_path, serve_media
+from mediafiles.services import InvalidImageError, create_upload, delete_upload, write_chunk
+
+
+class ImageVariantApiView(APIView):
+    """
+    Уменьшенная копия изображения (/mediafiles/variants/<вариант>/<путь изображения>.<формат>).
+    Копия читается с диска, а если воркер ее еще не создал - создается и сохраняется при первом запросе.
+    Копии изображений уроков доступны тем же пользователям, что и сами изображения (mediafiles.serving)
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, variant, path):
+        source, _, file_format = path.rpartition('.')
+        if variant not in settings.IMAGE_VARIANTS or file_format not in VARIANT_FORMATS or not is_source_image(source):
+            raise Http404
+        if not default_storage.exists(source):
+            raise Http404
+        lesson = find_media_lesson(source)
+        if lesson is not None and not can_access_lesson_media(request.user, lesson):
+            self.permission_denied(request, 'Изображение урока доступно только подписчикам курса')
+        try:
+            name = get_variant(source, variant, file_format)
+        except (OSError, Image.DecompressionBombError):  # файл не является изображением
+            raise Http404
+
+        return serve_media(
+            request, name, public=lesson is None,
+            max_age=settings.IMAGE_VARIANT_CACHE_SECONDS, content_type=VARIANT_FORMATS[file_format][1],
+        )
+
+
+class MediaFileApiView(APIView):
+    """
+    Загруженный файл (MEDIA_URL/<путь>) с проверкой доступа: изображения уроков - владельцам и подписчикам курса,
+    остальные файлы - всем. Файл отдает веб-сервер (MEDIA_SERVE_MODE) или Django с поддержкой Range
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, path):
+        if not is_media_path(path) or not default_storage.exists(path):
+            raise Http404
+        lesson = find_media_lesson(path)
+        if lesson is not None and not can_access_lesson_media(request.user, lesson):
+            self.permission_denied(request, 'Изображение урока доступно только подписчикам курса')
+        return serve_media(request, path, public=lesson is None)
+
+
+class UploadCreateApiView(CreateAPIView):
+    """
+    Начало загрузки изображения частями: POST {"target": "course"|"lesson"|"avatar", "object_id", "filename", "size"}.
+    Адрес загрузки возвращается в заголовке Location, части отправляются на него запросами PATCH
+    """
+    serializer_class = ChunkedUploadSerializer
+    permission_classes = [IsAuthenticated]
+
+    def perform_create(self, serializer):
+        serializer.instance = create_upload(self.request.user, **serializer.validated_data)
+
+    def get_success_headers(self, data):
+        return {'Location': reverse('mediafiles:upload', args=[data['id']]), 'Upload-Offset': '0'}
+
+
+class UploadApiView(APIView):
+    """
+    Загрузка частями (по образцу протокола tus):
+    GET/HEAD - смещение, с которого продолжать (заголовок Upload-Offset);
+    PATCH - очередная часть в теле запроса (Content-Type: application/offset+octet-stream, заголовок Upload-Offset),
+    тело пишется на диск блоками без буферизации в памяти;
+    DELETE - отмена загрузки
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_upload(self, pk):
+        return ChunkedUpload.objects.filter(pk=pk, user_id=self.request.user.pk).first()
+
+    def upload_response(self, upload, status_code=status.HTTP_200_OK):
+        headers = {'Upload-Offset': str(upload.offset), 'Upload-Length': str(upload.size), 'Cache-Control': 'no-store'}
+        return Response(ChunkedUploadSerializer(upload).data, status=status_code, headers=headers)
+
+    def get(self, request, pk):
+        upload = self.get_upload(pk)
+        if upload is None:
+            raise Http404
+        return self.upload_response(upload)
+
+    def patch(self, request, pk):
+        if request.content_type != 'application/offset+octet-stream':
+            return Response(
+                {'detail': 'Часть файла отправляется с Content-Type: application/offset+octet-stream'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.META['CONTENT_LENGTH'])
+        except (KeyError, ValueError):
+            return Response(
+                {'detail': 'Нужны заголовки Upload-Offset и Content-Length'}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():  # точка сохранения: ошибка блокировки не прерывает транзакцию
+                        upload = ChunkedUpload.objects.select_for_update(nowait=True).filter(
+                            pk=pk, user_id=request.user.pk
+                        ).first()
+                except OperationalError:
+                    return Response({'detail': 'Часть файла уже загружается другим запросом'},
+                                    status=status.HTTP_409_CONFLICT)
+                if upload is None:
+                    raise Http404
+                if upload.offset != offset:
+                    return self.upload_response(upload, status.HTTP_409_CONFLICT)
+                if upload.completed_at is None:
+                    write_chunk(upload, request.stream, length)
+        except InvalidImageError:
+            delete_upload(upload)
+            raise
+        return self.upload_response(upload)
+
+    def delete(self, request, pk):
+        upload = self.get_upload(pk)
+        if upload is None:
+            raise Http404
+        delete_upload(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
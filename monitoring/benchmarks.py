@@ -0,0 +1,31 @@
+import time
+
+
+def percentile(timings, percent):
+    """ Процентиль времени ответа (timings отсортированы) """
+    index = min(len(timings) - 1, max(0, round(percent / 100 * len(timings)) - 1))
+    return round(timings[index], 3)
+
+
+def summarize_load(timings, errors, elapsed, percents=(50, 95)):
+    """ Итоги нагрузочного замера: количество запросов и ошибок, запросы в секунду и процентили времени ответа """
+    timings.sort()
+    summary = {
+        'requests': len(timings),
+        'errors': errors,
+        'requests_per_second': round(len(timings) / elapsed, 1),
+    }
+    summary.update({f'p{percent}_ms': percentile(timings, percent) for percent in percents})
+    return summary
+
+
+def time_wsgi_request(handler, environ):
+    """
+    Запрос к WSGI-обработчику Django в текущем потоке: время ответа (мс) и код ответа.
+    Ответ закрывается (сигнал request_finished - соединения с БД закрываются по CONN_MAX_AGE, как в сервере)
+    """
+    started = time.perf_counter()
+    response = handler(environ, lambda status, headers, exc_info=None: None)
+    b''.join(response)
+    response.close()
+    return (time.perf_counter() - started) * 1000, response.status_code
@@ -0,0 +1,254 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from materials.caching import bump_catalog_version
+from materials.models import Course, Lesson
+from monitoring.benchmarks import percentile
+from users.models import User
+from users.serializers import RoleTokenObtainPairSerializer
+
+# Размеры наборов данных (параметры команды fill_payments)
+DATASET_SIZES = {
+    'small': {'users': 100, 'courses': 10, 'lessons': 5, 'subscriptions': 2, 'payments': 1000},
+    'medium': {'users': 2000, 'courses': 100, 'lessons': 10, 'subscriptions': 3, 'payments': 20000},
+    'large': {'users': 20000, 'courses': 500, 'lessons': 10, 'subscriptions': 5, 'payments': 200000},
+}
+# Пароль пользователей, создаваемых fill_payments по умолчанию
+SEED_PASSWORD = 'testpassword123'
+# Эндпоинты с кэшем ответов (materials.caching): замер без кэша - версия каталога сбрасывается
+# перед каждым запросом, и отдельно замер попаданий в кэш (<имя>_cached)
+CACHED_ENDPOINTS = ('course_list_anonymous',)
+
+
+def _git_commit():
+    """ Текущий коммит (для сравнения отчетов между коммитами) """
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочные замеры горячих эндпоинтов API (курсы, уроки, платежи, вход по JWT) через тестовый клиент.
+    По умолчанию для каждого размера данных создается тестовая БД, заполняется командой fill_payments
+    и удаляется после замеров. Для каждого эндпоинта в отчете - процентили времени ответа,
+    количество запросов к БД и пиковая память на запрос:
+        python manage.py benchmark_api --sizes small,medium --output before.json
+        python manage.py benchmark_api --sizes small,medium --compare before.json
+    """
+    help = 'Замеры времени ответа, запросов к БД и памяти горячих эндпоинтов API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='small,medium',
+                            help=f'Размеры наборов данных через запятую: {", ".join(DATASET_SIZES)}')
+        parser.add_argument('--repeat', type=int, default=30, help='Количество замеров каждого эндпоинта')
+        parser.add_argument('--warmup', type=int, default=3, help='Количество запросов прогрева (не учитываются)')
+        parser.add_argument('--seed', type=int, default=42, help='seed для fill_payments')
+        parser.add_argument('--current-db', action='store_true',
+                            help='Замеры на данных текущей БД, без создания тестовой БД и заполнения')
+        parser.add_argument('--email', help='Пользователь, от имени которого выполняются запросы')
+        parser.add_argument('--password', help='Пароль пользователя (для замера входа с --current-db)')
+        parser.add_argument('--output', help='Сохранить отчет в JSON-файл')
+        parser.add_argument('--compare', help='JSON-отчет предыдущего запуска для поиска регрессий')
+        parser.add_argument('--threshold', type=float, default=20,
+                            help='Допустимый рост медианного времени ответа, %% (по умолчанию 20)')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 2:
+            raise CommandError('Нужно не менее двух замеров (--repeat)')
+
+        results = {}
+        if options['current_db']:
+            results['current'] = self.run_benchmarks(options, options['email'], options['password'])
+        else:
+            sizes = [size.strip() for size in options['sizes'].split(',') if size.strip()]
+            unknown = set(sizes) - set(DATASET_SIZES)
+            if unknown:
+                raise CommandError(f'Неизвестные размеры данных: {", ".join(sorted(unknown))}')
+            results = self.run_on_test_db(sizes, options)
+
+        report = {
+            'meta': {
+                'commit': _git_commit(),
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'repeat': options['repeat'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Отчет сохранен в {options['output']}"))
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                previous = json.load(file)
+            regressions = self.compare(previous['results'], results, options['threshold'])
+            if regressions:
+                raise CommandError(f'Обнаружены регрессии: {", ".join(regressions)}')
+
+    def run_on_test_db(self, sizes, options):
+        """ Замеры на отдельной тестовой БД, заполняемой для каждого размера данных """
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = {}
+            for size in sizes:
+                self.stdout.write(self.style.MIGRATE_HEADING(f'Заполнение БД: {size}'))
+                call_command('fill_payments', clear=True, seed=options['seed'], stdout=self.stdout,
+                             **DATASET_SIZES[size])
+                results[size] = self.run_benchmarks(options, options['email'], options['password'] or SEED_PASSWORD)
+            return results
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def get_endpoints(self, user):
+        """ Эндпоинты для замеров: имя -> (метод, url, данные, нужна ли аутентификация) """
+        course = Course.objects.filter(owner=user).order_by('pk').first()
+        lesson = Lesson.objects.filter(owner=user).order_by('pk').first()
+        endpoints = {
+            'course_list_anonymous': ('get', reverse('materials:courses-list'), None, False),
+            'course_list': ('get', reverse('materials:courses-list'), None, True),
+            'lesson_list': ('get', reverse('materials:lessons_list'), None, False),
+            'payment_list': ('get', reverse('payments:payments-list'), None, True),
+            'payment_list_by_method': ('get', reverse('payments:payments-list'), {'payment_method': 'cash'}, True),
+            'payment_report_by_month': ('get', reverse('payments:payments-report'), {'group_by': 'month'}, True),
+        }
+        if course is not None:
+            endpoints['course_retrieve'] = ('get', reverse('materials:courses-detail', args=[course.pk]), None, True)
+        if lesson is not None:
+            endpoints['lesson_retrieve'] = ('get', reverse('materials:lesson_retrieve', args=[lesson.pk]), None, True)
+        return endpoints
+
+    def get_user(self, email):
+        """ Пользователь для запросов: заданный email или владелец первого курса """
+        if email:
+            user = User.objects.filter(email=email).first()
+        else:
+            course = Course.objects.exclude(owner=None).order_by('pk').select_related('owner').first()
+            user = course.owner if course else None
+        if user is None:
+            raise CommandError('Не найден пользователь для запросов, заполните БД командой fill_payments')
+        return user
+
+    def run_benchmarks(self, options, email, password):
+        """ Замеры всех эндпоинтов на текущих данных """
+        user = self.get_user(email)
+        access = str(RoleTokenObtainPairSerializer.get_token(user).access_token)
+        anonymous, authenticated = APIClient(), APIClient()
+        authenticated.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        requests = {
+            name: (authenticated if auth else anonymous, method, url, data)
+            for name, (method, url, data, auth) in self.get_endpoints(user).items()
+        }
+        if password:
+            credentials = {'email': user.email, 'password': password}
+            requests['jwt_login'] = (anonymous, 'post', reverse('users:login'), credentials)
+
+        measurements = {}
+        for name, (client, method, url, data) in requests.items():
+            if name in CACHED_ENDPOINTS:
+                measurements[name] = (client, method, url, data, bump_catalog_version)
+                measurements[f'{name}_cached'] = (client, method, url, data, None)
+            else:
+                measurements[name] = (client, method, url, data, None)
+
+        results = {}
+        for name, (client, method, url, data, prepare) in measurements.items():
+            results[name] = self.measure(client, method, url, data, options['repeat'], options['warmup'], prepare)
+            self.stdout.write(
+                f"{name}: p50 {results[name]['p50_ms']} мс, p95 {results[name]['p95_ms']} мс, "
+                f"запросов к БД {results[name]['queries']}, память {results[name]['peak_memory_kb']} КБ"
+            )
+        return results
+
+    def measure(self, client, method, url, data, repeat, warmup, prepare=None):
+        """
+        Время ответа, количество запросов к БД и пиковая память запроса к эндпоинту.
+        prepare вызывается перед каждым запросом и в замеры не входит (например, сброс кэша)
+        """
+        prepare = prepare or (lambda: None)
+
+        def request():
+            response = getattr(client, method)(url, data)
+            if response.status_code >= 400:
+                raise CommandError(f'{method.upper()} {url}: ответ {response.status_code}')
+            return response
+
+        for _ in range(warmup):
+            prepare()
+            request()
+
+        timings = []
+        for _ in range(repeat):
+            prepare()
+            started = time.perf_counter()
+            request()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        prepare()
+        with CaptureQueriesContext(connection) as context:
+            response = request()
+        queries = len(context.captured_queries)  # журнал запросов очищается в начале следующего запроса
+
+        prepare()
+        tracemalloc.start()  # отдельный запрос: трассировка памяти замедляет выполнение
+        try:
+            request()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        timings.sort()
+        return {
+            'status': response.status_code,
+            'p50_ms': percentile(timings, 50),
+            'p90_ms': percentile(timings, 90),
+            'p95_ms': percentile(timings, 95),
+            'p99_ms': percentile(timings, 99),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'queries': queries,
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def compare(self, previous, results, threshold):
+        """ Сравнение с предыдущим отчетом; возвращает список регрессий (рост времени или числа запросов) """
+        self.stdout.write(self.style.MIGRATE_HEADING('Сравнение с предыдущим отчетом'))
+        regressions = []
+        for size, endpoints in results.items():
+            for name, result in endpoints.items():
+                before = previous.get(size, {}).get(name)
+                if before is None:
+                    continue
+                ratio = result['p50_ms'] / before['p50_ms'] if before['p50_ms'] else 1
+                line = (
+                    f"{size}/{name}: p50 {before['p50_ms']} -> {result['p50_ms']} мс ({(ratio - 1) * 100:+.0f}%), "
+                    f"запросов {before['queries']} -> {result['queries']}"
+                )
+                if ratio > 1 + threshold / 100 or result['queries'] > before['queries']:
+                    regressions.append(f'{size}/{name}')
+                    self.stdout.write(self.style.ERROR(line))
+                else:
+                    self.stdout.write(line)
+        return regressions
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import threading
+import time
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import RequestFactory
+
+from monitoring.benchmarks import summarize_load, time_wsgi_request
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочное сравнение WSGI (config/wsgi.py, синхронные DRF view в потоках) и ASGI (config/asgi.py,
+    асинхронные view) при разном количестве одновременных запросов. Запросы выполняются в процессе
+    через обработчики Django, без сетевого сервера:
+        python manage.py benchmark_asgi --concurrency 1,10,50 --requests 500
+        python manage.py benchmark_asgi --sync-path /materials/course/ --async-path /materials/async/course/
+    """
+    help = 'Сравнение масштабируемости WSGI и ASGI под параллельной нагрузкой'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync-path', default='/materials/lesson/', help='Синхронный view (WSGI)')
+        parser.add_argument('--async-path', default='/materials/async/lesson/', help='Асинхронный view (ASGI)')
+        parser.add_argument('--concurrency', default='1,10,50', help='Количество одновременных запросов через запятую')
+        parser.add_argument('--requests', type=int, default=200, help='Количество запросов на каждый уровень')
+        parser.add_argument('--output', help='Сохранить результаты в JSON-файл')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency: целые числа через запятую')
+        if options['requests'] < 1 or min(levels) < 1:
+            raise CommandError('Количество запросов и одновременных запросов должно быть положительным')
+
+        results = {}
+        for level in levels:
+            results[str(level)] = {
+                'wsgi': self.run_wsgi(options['sync_path'], level, options['requests']),
+                'asgi': asyncio.run(self.run_asgi(options['async_path'], level, options['requests'])),
+            }
+            for mode, result in results[str(level)].items():
+                self.stdout.write(
+                    f"{level} одновременных, {mode}: {result['requests_per_second']} запросов/с, "
+                    f"p50 {result['p50_ms']} мс, p95 {result['p95_ms']} мс, ошибок {result['errors']}"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Результаты сохранены в {options['output']}"))
+
+    def run_wsgi(self, path, concurrency, total):
+        """ Запросы к WSGI-обработчику из concurrency потоков (как у многопоточного WSGI-сервера) """
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        measurements = []
+
+        def client(count):
+            try:
+                for _ in range(count):
+                    timing, status_code = time_wsgi_request(handler, factory.get(path).environ)
+                    measurements.append((timing, status_code >= 400))
+            finally:
+                connections.close_all()  # соединения с БД принадлежат потоку
+
+        shares = [total // concurrency + (number < total % concurrency) for number in range(concurrency)]
+        threads = [threading.Thread(target=client, args=(share,)) for share in shares if share]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return summarize_load([timing for timing, _ in measurements], sum(error for _, error in measurements), elapsed)
+
+    async def run_asgi(self, path, concurrency, total):
+        """ Одновременные запросы к ASGI-обработчику в одном цикле событий (как у uvicorn) """
+        handler = ASGIHandler()
+        semaphore = asyncio.Semaphore(concurrency)
+        timings, errors = [], 0
+
+        async def request():
+            nonlocal errors
+            request_sent = False
+            status = None
+
+            async def receive():
+                nonlocal request_sent
+                if not request_sent:
+                    request_sent = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await asyncio.Future()  # клиент не отключается; ожидание отменяется обработчиком после ответа
+
+            async def send(message):
+                nonlocal status
+                if message['type'] == 'http.response.start':
+                    status = message['status']
+
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+                'headers': [(b'host', b'testserver')], 'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+            }
+            async with semaphore:
+                started = time.perf_counter()
+                await handler(scope, receive, send)
+                timings.append((time.perf_counter() - started) * 1000)
+            errors += status is None or status >= 400
+
+        started = time.perf_counter()
+        await asyncio.gather(*(request() for _ in range(total)))
+        return summarize_load(timings, errors, time.perf_counter() - started)
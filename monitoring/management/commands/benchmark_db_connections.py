@@ -0,0 +1,100 @@
+import json
+import threading
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+
+from monitoring.benchmarks import summarize_load, time_wsgi_request
+
+
+class Command(BaseCommand):
+    """
+    Пропускная способность API под параллельной нагрузкой при разных настройках соединений с БД.
+    Запросы выполняются в потоках через WSGI-обработчик Django (как в сервере приложений: соединения
+    закрываются или переиспользуются по CONN_MAX_AGE), для каждого значения --conn-max-age
+    выводятся запросы в секунду, время ответа и количество открытых соединений:
+        python manage.py benchmark_db_connections --threads 8 --requests 200 --conn-max-age 0,60
+    С пулом соединений (DATABASE_POOL=True) замеряется текущая настройка: --conn-max-age 0
+    """
+    help = 'Пропускная способность API при разных настройках соединений с БД'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/materials/lesson/', help='Адрес запроса (доступный без входа)')
+        parser.add_argument('--threads', type=int, default=8, help='Количество параллельных клиентов')
+        parser.add_argument('--requests', type=int, default=100, help='Количество запросов каждого клиента')
+        parser.add_argument('--conn-max-age', default='0,60',
+                            help='Значения CONN_MAX_AGE через запятую (по умолчанию 0,60)')
+        parser.add_argument('--database', default='default', help='Псевдоним БД')
+        parser.add_argument('--output', help='Сохранить результаты в JSON-файл')
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['requests'] < 1:
+            raise CommandError('Нужен хотя бы один клиент и один запрос')
+        settings_dict = connections.settings[options['database']]
+        configured = settings_dict.get('CONN_MAX_AGE', 0)
+
+        results = {}
+        try:
+            for value in options['conn_max_age'].split(','):
+                conn_max_age = int(value) if value.strip().lower() != 'none' else None
+                if conn_max_age != 0 and 'pool' in settings_dict.get('OPTIONS', {}):
+                    raise CommandError('С пулом соединений (DATABASE_POOL=True) CONN_MAX_AGE должен быть 0')
+                settings_dict['CONN_MAX_AGE'] = conn_max_age  # применяется к соединениям, открываемым в потоках
+                results[f'conn_max_age={value.strip()}'] = result = self.run_load(options)
+                self.stdout.write(
+                    f"CONN_MAX_AGE={value.strip()}: {result['requests_per_second']} запросов/с, "
+                    f"p50 {result['p50_ms']} мс, p95 {result['p95_ms']} мс, "
+                    f"открыто соединений {result['connections_opened']}, ошибок {result['errors']}"
+                )
+        finally:
+            settings_dict['CONN_MAX_AGE'] = configured
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Результаты сохранены в {options['output']}"))
+
+    def run_load(self, options):
+        """ Параллельные запросы в потоках; у каждого потока свои соединения с БД, как у потоков сервера """
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        lock = threading.Lock()
+        timings, errors, opened = [], [0], [0]
+
+        def count_connection(sender, connection, **kwargs):
+            with lock:
+                opened[0] += 1
+
+        def client():
+            local_timings, local_errors = [], 0
+            try:
+                for _ in range(options['requests']):
+                    timing, status_code = time_wsgi_request(handler, factory.get(options['path']).environ)
+                    local_timings.append(timing)
+                    local_errors += status_code >= 400
+            finally:
+                connections.close_all()
+            with lock:
+                timings.extend(local_timings)
+                errors[0] += local_errors
+
+        connection_created.connect(count_connection)
+        try:
+            threads = [threading.Thread(target=client) for _ in range(options['threads'])]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            connection_created.disconnect(count_connection)
+
+        return {
+            **summarize_load(timings, errors[0], elapsed, percents=(50, 95, 99)),
+            'connections_opened': opened[0],
+        }
@@ -0,0 +1,78 @@
+import json
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """
+    Сводный отчет по журналу N+1 и медленных запросов (QueryInspectorMiddleware):
+    для каждого view - запросы-нарушители с количеством повторов, временем и источником
+    """
+    help = 'Отчет по N+1 и медленным запросам из журнала QUERY_INSPECTOR_LOG'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', help='Журнал запросов (по умолчанию QUERY_INSPECTOR_LOG)')
+        parser.add_argument('--view', help='Только указанный view (например, materials:courses-list)')
+        parser.add_argument('--output', help='Сохранить отчет в JSON-файл')
+
+    def handle(self, *args, **options):
+        path = Path(options['log'] or settings.QUERY_INSPECTOR_LOG)
+        if not path.exists():
+            raise CommandError(f'Журнал {path} не найден (включите QUERY_INSPECTOR_ENABLED)')
+
+        report = self.build_report(path, options['view'])
+        for view, data in sorted(report.items(), key=lambda item: -item[1]['requests']):
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{view}: запросов с проблемами {data['requests']}"))
+            for issue in data['n_plus_one']:
+                self.stdout.write(
+                    f"  N+1 x{issue['max_count']} (в {issue['requests']} запросах, {issue['total_ms']} мс): "
+                    f"{issue['sql']}\n    источник: {issue['field'] or '-'}; {issue['origin'] or '-'}"
+                )
+            for issue in data['slow']:
+                self.stdout.write(
+                    f"  медленный {issue['max_ms']} мс (в {issue['requests']} запросах): "
+                    f"{issue['sql']}\n    источник: {issue['field'] or '-'}; {issue['origin'] or '-'}"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Отчет сохранен в {options['output']}"))
+
+    def build_report(self, path, view_filter=None):
+        """ Группировка записей журнала по view и отпечатку запроса """
+        views = defaultdict(lambda: {'requests': 0, 'n_plus_one': {}, 'slow': {}})
+        with path.open(encoding='utf-8') as file:
+            for line in file:
+                record = json.loads(line)
+                if view_filter and record['view'] != view_filter:
+                    continue
+                data = views[record['view']]
+                data['requests'] += 1
+                for issue in record['n_plus_one']:
+                    summary = data['n_plus_one'].setdefault(issue['fingerprint'], {
+                        'sql': issue['sql'], 'origin': issue['origin'], 'field': issue['field'],
+                        'requests': 0, 'max_count': 0, 'total_ms': 0,
+                    })
+                    summary['requests'] += 1
+                    summary['max_count'] = max(summary['max_count'], issue['count'])
+                    summary['total_ms'] = round(summary['total_ms'] + issue['total_ms'], 3)
+                for issue in record['slow']:
+                    summary = data['slow'].setdefault(issue['fingerprint'], {
+                        'sql': issue['sql'], 'origin': issue['origin'], 'field': issue['field'],
+                        'requests': 0, 'max_ms': 0,
+                    })
+                    summary['requests'] += 1
+                    summary['max_ms'] = max(summary['max_ms'], issue['duration_ms'])
+
+        return {
+            view: {
+                'requests': data['requests'],
+                'n_plus_one': sorted(data['n_plus_one'].values(), key=lambda issue: -issue['total_ms']),
+                'slow': sorted(data['slow'].values(), key=lambda issue: -issue['max_ms']),
+            }
+            for view, data in views.items()
+        }
@@ -0,0 +1,130 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from rest_framework.serializers import BaseSerializer
+
+# Границы корзин гистограмм (в секундах для времени, в штуках для количества запросов к БД)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# Гистограммы по каждому view: имя метрики -> (описание, границы корзин)
+HISTOGRAMS = {
+    'api_request_duration_seconds': ('Полное время обработки запроса', DURATION_BUCKETS),
+    'api_db_duration_seconds': ('Время выполнения SQL-запросов', DURATION_BUCKETS),
+    'api_db_queries': ('Количество SQL-запросов', QUERY_COUNT_BUCKETS),
+    'api_serializer_duration_seconds': ('Время сериализации ответа (serializer.data)', DURATION_BUCKETS),
+}
+
+# Замеры текущего запроса (заполняются обертками SQL-запросов и сериализаторов)
+current_request_metrics = ContextVar('current_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """ Замеры одного запроса: SQL-запросы и сериализация """
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_duration = 0.0
+        self.serializer_duration = 0.0
+        self.in_serializer = False
+
+    def __call__(self, execute, sql, params, many, context):
+        """ Обертка SQL-запросов (connection.execute_wrapper) """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_duration += time.perf_counter() - started
+            self.db_queries += 1
+
+
+class Histogram:
+    """ Гистограмма значений с фиксированными границами корзин """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последняя корзина - значения больше всех границ (+Inf)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Накопленные гистограммы по view и HTTP-методу (в памяти процесса:
+    при нескольких процессах-воркерах каждый отдает свои метрики)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def observe(self, view, method, values):
+        """ Учет замеров запроса: values - словарь имя метрики -> значение """
+        with self.lock:
+            for name, value in values.items():
+                key = (name, view, method)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(HISTOGRAMS[name][1])
+                self.histograms[key].observe(value)
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+    def render(self):
+        """ Метрики в текстовом формате Prometheus """
+        with self.lock:
+            snapshot = sorted(self.histograms.items())
+        lines = []
+        for name, (description, _) in HISTOGRAMS.items():
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+            for (metric, view, method), histogram in snapshot:
+                if metric != name:
+                    continue
+                labels = f'view="{_escape_label(view)}",method="{method}"'
+                cumulative = 0
+                for bound, count in zip((*histogram.buckets, '+Inf'), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+                lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+def instrument_serializers():
+    """
+    Замер времени serializer.data (сериализация ответа, включая ленивые запросы к БД при обходе связей).
+    Устанавливается один раз при включенных метриках, вложенные сериализаторы отдельно не учитываются
+    """
+    data = BaseSerializer.data
+    if getattr(data.fget, 'instrumented', False):
+        return
+
+    def instrumented_data(serializer):
+        metrics = current_request_metrics.get()
+        if metrics is None or metrics.in_serializer:
+            return data.fget(serializer)
+        metrics.in_serializer = True
+        started = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            metrics.serializer_duration += time.perf_counter() - started
+            metrics.in_serializer = False
+
+    instrumented_data.instrumented = True
+    BaseSerializer.data = property(instrumented_data)
@@ -0,0 +1,144 @@
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from monitoring.metrics import RequestMetrics, current_request_metrics, instrument_serializers, registry
+from monitoring.queries import QueryInspector, write_query_issues
+
+
+def wrap_connections(stack, wrapper):
+    """ Обертка SQL-запросов всех соединений с БД текущего потока до закрытия stack """
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(wrapper))
+
+
+async def await_with_wrapped_connections(wrapper, get_response, request):
+    """
+    Асинхронная обработка запроса с оберткой SQL-запросов. Соединения с БД принадлежат потоку, в котором
+    sync_to_async выполняет ORM этого запроса (один поток на запрос), поэтому обертка ставится в нем же
+    """
+    stack = ExitStack()
+    await sync_to_async(wrap_connections)(stack, wrapper)
+    try:
+        return await get_response(request)
+    finally:
+        await sync_to_async(stack.close)()
+
+
+class RequestMetricsMiddleware:
+    """
+    Количество и время SQL-запросов, время сериализации и полное время обработки запроса по каждому view.
+    Замеры отдаются в заголовке Server-Timing и накапливаются в гистограммах (/monitoring/metrics/).
+    При REQUEST_METRICS_ENABLED=False middleware отключается при запуске и не влияет на обработку запросов.
+    Поддерживает синхронную и асинхронную обработку: асинхронные view под ASGI не переводятся в поток
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        instrument_serializers()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_request_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                wrap_connections(stack, metrics)
+                response = self.get_response(request)
+        finally:
+            current_request_metrics.reset(token)
+        return self.process_metrics(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_request_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await await_with_wrapped_connections(metrics, self.get_response, request)
+        finally:
+            current_request_metrics.reset(token)
+        return self.process_metrics(request, response, metrics, time.perf_counter() - started)
+
+    def process_metrics(self, request, response, metrics, duration):
+        """ Учет замеров в гистограммах и заголовок Server-Timing """
+        match = request.resolver_match
+        registry.observe(match.view_name if match else '<unresolved>', request.method, {
+            'api_request_duration_seconds': duration,
+            'api_db_duration_seconds': metrics.db_duration,
+            'api_db_queries': metrics.db_queries,
+            'api_serializer_duration_seconds': metrics.serializer_duration,
+        })
+        if settings.REQUEST_METRICS_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={metrics.db_duration * 1000:.1f};desc="{metrics.db_queries} queries", '
+                f'serializer;dur={metrics.serializer_duration * 1000:.1f}, '
+                f'total;dur={duration * 1000:.1f}'
+            )
+        return response
+
+
+class QueryInspectorMiddleware:
+    """
+    Поиск проблемных SQL-запросов (режим отладки и тестовых стендов): повторяющиеся в одном запросе запросы
+    одной формы (N+1) и медленные запросы с источником (строка кода, поле сериализатора).
+    Найденные проблемы пишутся в журнал QUERY_INSPECTOR_LOG, отчет по view: python manage.py query_report.
+    Поддерживает синхронную и асинхронную обработку
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSPECTOR_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        inspector = QueryInspector()
+        with ExitStack() as stack:
+            wrap_connections(stack, inspector)
+            response = self.get_response(request)
+        issues = self.get_issues(request, inspector)
+        if issues:
+            write_query_issues(issues)
+        return response
+
+    async def __acall__(self, request):
+        inspector = QueryInspector()
+        response = await await_with_wrapped_connections(inspector, self.get_response, request)
+        issues = self.get_issues(request, inspector)
+        if issues:
+            await sync_to_async(write_query_issues)(issues)  # запись в файл журнала
+        return response
+
+    def get_issues(self, request, inspector):
+        """ Запись журнала о найденных N+1 и медленных запросах или None """
+        n_plus_one, slow = inspector.get_issues(
+            settings.QUERY_INSPECTOR_N_PLUS_ONE_THRESHOLD, settings.QUERY_INSPECTOR_SLOW_MS
+        )
+        if not n_plus_one and not slow:
+            return None
+        match = request.resolver_match
+        return {
+            'view': match.view_name if match else '<unresolved>',
+            'method': request.method,
+            'path': request.path,
+            'queries': len(inspector.queries),
+            'n_plus_one': n_plus_one,
+            'slow': slow,
+        }
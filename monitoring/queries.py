@@ -0,0 +1,118 @@
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from hashlib import md5
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.fields import Field
+
+logger = logging.getLogger(__name__)
+
+# Нормализация SQL: строковые и числовые литералы и списки параметров IN (...) разной длины
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAMS_LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_SPACES_RE = re.compile(r'\s+')
+
+_write_lock = threading.Lock()
+
+
+def normalize_sql(sql):
+    """ SQL-запрос без значений: запросы одной формы с разными параметрами совпадают """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PARAMS_LIST_RE.sub('(...)', sql)
+    return _SPACES_RE.sub(' ', sql).strip()
+
+
+def fingerprint_sql(sql):
+    return md5(normalize_sql(sql).encode()).hexdigest()[:12]
+
+
+def _is_project_file(filename):
+    """ Файл кода проекта (не библиотек и не самого monitoring) """
+    if 'site-packages' in filename or filename.startswith(str(Path(__file__).parent)):
+        return False
+    return filename.startswith(str(settings.BASE_DIR))
+
+
+def find_query_origin():
+    """
+    Источник запроса по стеку вызовов: первая строка кода проекта (файл:строка в функции)
+    и поле сериализатора, при обработке которого выполнен запрос (Сериализатор.поле)
+    """
+    origin = field = None
+    frame = sys._getframe(1)
+    while frame is not None and (origin is None or field is None):
+        filename = frame.f_code.co_filename
+        if origin is None and _is_project_file(filename):
+            origin = f'{Path(filename).relative_to(settings.BASE_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        instance = frame.f_locals.get('self')
+        if field is None and isinstance(instance, Field) and instance.field_name and instance.parent is not None:
+            field = f'{instance.parent.__class__.__name__}.{instance.field_name}'
+        frame = frame.f_back
+    return origin, field
+
+
+class QueryInspector:
+    """ Сбор SQL-запросов одного HTTP-запроса (обертка connection.execute_wrapper) """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries.append((sql, duration, *find_query_origin()))
+
+    def get_issues(self, n_plus_one_threshold, slow_ms):
+        """ Повторяющиеся запросы одной формы (N+1) и медленные запросы """
+        groups = defaultdict(list)
+        for query in self.queries:
+            groups[fingerprint_sql(query[0])].append(query)
+
+        n_plus_one = [
+            {
+                'fingerprint': fingerprint,
+                'count': len(queries),
+                'total_ms': round(sum(query[1] for query in queries) * 1000, 3),
+                'sql': normalize_sql(queries[0][0]),
+                'origin': queries[0][2],
+                'field': queries[0][3],
+            }
+            for fingerprint, queries in groups.items() if len(queries) >= n_plus_one_threshold
+        ]
+        slow = [
+            {
+                'fingerprint': fingerprint_sql(sql),
+                'duration_ms': round(duration * 1000, 3),
+                'sql': normalize_sql(sql),
+                'origin': origin,
+                'field': field,
+            }
+            for sql, duration, origin, field in self.queries if duration * 1000 >= slow_ms
+        ]
+        return n_plus_one, slow
+
+
+def write_query_issues(record):
+    """ Запись найденных проблем запроса в журнал (JSON Lines) для отчета query_report """
+    path = Path(settings.QUERY_INSPECTOR_LOG)
+    line = json.dumps({'time': timezone.now().isoformat(), **record}, ensure_ascii=False)
+    with _write_lock, path.open('a', encoding='utf-8') as file:
+        file.write(line + '\n')
+    for issue in record['n_plus_one']:
+        logger.warning('N+1 в %s: %s запросов %s (%s)', record['view'], issue['count'], issue['sql'],
+                       issue['field'] or issue['origin'])
+    for issue in record['slow']:
+        logger.warning('Медленный запрос в %s: %s мс %s (%s)', record['view'], issue['duration_ms'], issue['sql'],
+                       issue['field'] or issue['origin'])
@@ -0,0 +1,178 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from materials.models import Course
+from monitoring.metrics import registry
+from monitoring.middleware import RequestMetricsMiddleware
+from users.models import User
+from users.views import UserViewSet
+
+
+@override_settings(REQUEST_METRICS_ENABLED=True, REQUEST_METRICS_TOKEN=None)
+class RequestMetricsTestCase(APITestCase):
+    """ Тесты метрик запросов """
+
+    def setUp(self):
+        registry.clear()
+        Course.objects.create(name="Курс")
+
+    def test_server_timing_header(self):
+        """ В заголовке Server-Timing - время и количество SQL-запросов, сериализация и полное время """
+        response = self.client.get(reverse("materials:lessons_list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", serializer;dur=[\d.]+, total')
+
+    def test_metrics_endpoint(self):
+        """ Гистограммы накапливаются по имени view и отдаются в формате Prometheus """
+        self.client.get(reverse("materials:lessons_list"))
+        self.client.get(reverse("materials:lessons_list"))
+        self.client.force_login(User.objects.create(email="admin@test.ru", is_staff=True))
+        response = self.client.get(reverse("monitoring:metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = response.content.decode()
+        self.assertIn('api_request_duration_seconds_count{view="materials:lessons_list",method="GET"} 2', content)
+        self.assertIn('api_db_queries_bucket{view="materials:lessons_list",method="GET",le="+Inf"} 2', content)
+
+    @override_settings(REQUEST_METRICS_TOKEN="secret")
+    def test_metrics_endpoint_token(self):
+        """ При заданном токене метрики отдаются только с ним """
+        self.assertEqual(self.client.get(reverse("monitoring:metrics")).status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(reverse("monitoring:metrics"), HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_metrics_endpoint_not_public(self):
+        """ Без токена метрики доступны только сотрудникам """
+        self.assertEqual(self.client.get(reverse("monitoring:metrics")).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_login(User.objects.create(email="user@test.ru"))
+        self.assertEqual(self.client.get(reverse("monitoring:metrics")).status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_async_view(self):
+        """ Middleware асинхронный (view под ASGI не переводится в поток), SQL-запросы асинхронного ORM учтены """
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(RequestMetricsMiddleware(get_response)))
+        response = await self.async_client.get(reverse("materials:async_lessons_list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+    @override_settings(REQUEST_METRICS_ENABLED=False)
+    def test_disabled(self):
+        """ При выключенных метриках middleware не подключается """
+        response = self.client.get(reverse("materials:lessons_list"))
+        self.assertNotIn("Server-Timing", response)
+
+
+class QueryInspectorTestCase(APITestCase):
+    """ Тесты поиска N+1 и медленных запросов """
+
+    def setUp(self):
+        self.log = Path(tempfile.mkdtemp()) / "queries.jsonl"
+        for number in range(6):
+            User.objects.create(email=f"user{number}@example.com")
+        self.client.force_authenticate(user=User.objects.first())
+
+    def test_n_plus_one_detected_with_serializer_field(self):
+        """ Запросы групп для каждого пользователя списка (без prefetch) - N+1 с источником в поле сериализатора """
+        with override_settings(QUERY_INSPECTOR_ENABLED=True, QUERY_INSPECTOR_LOG=self.log):
+            with self.assertLogs("monitoring.queries", "WARNING"), \
+                    mock.patch.object(UserViewSet, "trim_queryset", lambda view, queryset: queryset):
+                self.client.get(reverse("users:users-list"))
+
+        record = json.loads(self.log.read_text(encoding="utf-8"))
+        self.assertEqual(record["view"], "users:users-list")
+        fields = {issue["field"]: issue["count"] for issue in record["n_plus_one"]}
+        self.assertGreaterEqual(fields["UserSerializer.groups"], 6)
+
+        output = StringIO()
+        call_command("query_report", log=self.log, stdout=output)
+        self.assertIn("UserSerializer.groups", output.getvalue())
+
+    def test_slow_queries(self):
+        """ Запросы дольше порога попадают в журнал как медленные """
+        with override_settings(QUERY_INSPECTOR_ENABLED=True, QUERY_INSPECTOR_LOG=self.log,
+                               QUERY_INSPECTOR_SLOW_MS=0, QUERY_INSPECTOR_N_PLUS_ONE_THRESHOLD=1000):
+            with self.assertLogs("monitoring.queries", "WARNING"):
+                self.client.get(reverse("materials:lessons_list"))
+
+        record = json.loads(self.log.read_text(encoding="utf-8"))
+        self.assertFalse(record["n_plus_one"])
+        self.assertEqual(len(record["slow"]), record["queries"])
+
+    async def test_async_view(self):
+        """ Запросы асинхронного view (ASGI) тоже проверяются """
+        with override_settings(QUERY_INSPECTOR_ENABLED=True, QUERY_INSPECTOR_LOG=self.log,
+                               QUERY_INSPECTOR_SLOW_MS=0, QUERY_INSPECTOR_N_PLUS_ONE_THRESHOLD=1000):
+            with self.assertLogs("monitoring.queries", "WARNING"):
+                await self.async_client.get(reverse("materials:async_lessons_list"))
+
+        record = json.loads(self.log.read_text(encoding="utf-8"))
+        self.assertEqual(record["view"], "materials:async_lessons_list")
+        self.assertGreaterEqual(len(record["slow"]), 1)
+
+
+class BenchmarkDbConnectionsCommandTestCase(TestCase):
+    """ Тесты команды замера соединений с БД под нагрузкой """
+
+    def test_report(self):
+        """ Для каждого значения CONN_MAX_AGE - пропускная способность, время ответа и открытые соединения """
+        with tempfile.NamedTemporaryFile(suffix=".json") as output:
+            call_command("benchmark_db_connections", threads=2, requests=3, conn_max_age="0,60",
+                         output=output.name, stdout=StringIO())
+            results = json.load(output)
+        for result in results.values():
+            self.assertEqual(result["requests"], 6)
+            self.assertEqual(result["errors"], 0)
+            self.assertGreater(result["requests_per_second"], 0)
+            self.assertGreaterEqual(result["connections_opened"], 2)  # хотя бы одно соединение на поток
+
+
+class BenchmarkApiCommandTestCase(TestCase):
+    """ Тесты команды замеров API """
+
+    def setUp(self):
+        call_command("fill_payments", users=10, courses=3, lessons=2, payments=20, clear=True, stdout=StringIO())
+
+    def benchmark(self, **options):
+        with tempfile.NamedTemporaryFile(suffix=".json") as output:
+            call_command("benchmark_api", current_db=True, repeat=2, warmup=0, output=output.name,
+                         stdout=StringIO(), **options)
+            return json.load(output)
+
+    def test_report(self):
+        """ В отчете для каждого эндпоинта есть процентили, количество запросов и память """
+        report = self.benchmark(password="testpassword123")
+        results = report["results"]["current"]
+        self.assertIn("jwt_login", results)
+        self.assertIn("payment_list", results)
+        for result in results.values():
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+            self.assertGreater(result["peak_memory_kb"], 0)
+        self.assertGreater(results["course_list"]["queries"], 0)
+
+    def test_cached_endpoint_measured_with_and_without_cache(self):
+        """ Список курсов для анонимного пользователя замеряется без кэша и отдельно с попаданием в кэш """
+        results = self.benchmark()["results"]["current"]
+        self.assertGreater(results["course_list_anonymous"]["queries"], 0)
+        self.assertEqual(results["course_list_anonymous_cached"]["queries"], 0)
+
+    def test_compare_detects_query_regression(self):
+        """ Рост количества запросов к БД относительно прошлого отчета - регрессия """
+        report = self.benchmark()
+        report["results"]["current"]["course_list"]["queries"] -= 1
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as previous:
+            json.dump(report, previous)
+            previous.flush()
+            with self.assertRaisesMessage(CommandError, "current/course_list"):
+                self.benchmark(compare=previous.name, threshold=10000)
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+from monitoring.metrics import registry
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Метрики запросов в текстовом формате Prometheus: по токену REQUEST_METRICS_TOKEN (сборщик метрик)
+    или сотрудникам, вошедшим в админку. Без токена метрики с именами view и временами не публичны
+    """
+    token = settings.REQUEST_METRICS_TOKEN
+    has_token = bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not has_token and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
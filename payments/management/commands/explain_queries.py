@@ -0,0 +1,95 @@
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from materials.models import Subscription
+from payments.models import Payment
+
+
+class Command(BaseCommand):
+    """
+    Планы выполнения (EXPLAIN) и время горячих запросов к платежам и подпискам.
+    Сравнение до/после индексов на заполненной БД (python manage.py fill_payments):
+        python manage.py migrate payments 0002 && python manage.py migrate materials 0004
+        python manage.py explain_queries --output before.json
+        python manage.py migrate
+        python manage.py explain_queries --compare before.json
+    """
+    help = 'Планы выполнения и время горячих запросов к платежам и подпискам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Количество замеров каждого запроса')
+        parser.add_argument('--page-size', type=int, default=20, help='Размер страницы в запросах списков')
+        parser.add_argument('--output', help='Сохранить результаты в JSON-файл')
+        parser.add_argument('--compare', help='JSON-файл с предыдущими результатами для сравнения')
+        parser.add_argument('--no-plans', action='store_true', help='Не выводить планы выполнения')
+
+    def get_queries(self, page_size):
+        """ Горячие запросы с параметрами, взятыми из данных в БД """
+        payment = Payment.objects.exclude(owner=None).exclude(paid_course=None).order_by('?').first()
+        subscription = Subscription.objects.order_by('?').first()
+        if payment is None:
+            raise CommandError('В БД нет платежей с плательщиком и курсом, заполните ее командой fill_payments')
+
+        date_to = timezone.now()
+        date_from = date_to - timedelta(days=30)
+        queries = {
+            'payments_list_page': Payment.objects.order_by('-payment_date', 'id')[:page_size],
+            'payments_by_owner': (
+                Payment.objects.filter(owner_id=payment.owner_id).order_by('-payment_date')[:page_size]
+            ),
+            'payments_by_course': (
+                Payment.objects.filter(paid_course_id=payment.paid_course_id).order_by('-payment_date')[:page_size]
+            ),
+            'payments_by_method_period': Payment.objects.filter(
+                payment_method=payment.payment_method, payment_date__range=(date_from, date_to)
+            ).order_by('payment_date')[:page_size],
+        }
+        if subscription is not None:
+            queries['subscription_lookup'] = Subscription.objects.filter(
+                user_id=subscription.user_id, course_id=subscription.course_id
+            )
+        return queries
+
+    def measure(self, queryset, repeat):
+        """ Время выполнения запроса в миллисекундах (каждый раз - новый запрос к БД) """
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - started) * 1000)
+        return {
+            'median_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0], 3),
+        }
+
+    def handle(self, *args, **options):
+        explain_options = {'analyze': True} if connection.vendor == 'postgresql' else {}
+        results = {}
+        for name, queryset in self.get_queries(options['page_size']).items():
+            results[name] = self.measure(queryset, options['repeat'])
+            results[name]['plan'] = queryset.explain(**explain_options)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            if not options['no_plans']:
+                self.stdout.write(results[name]['plan'])
+            self.stdout.write(f"median: {results[name]['median_ms']} мс, p95: {results[name]['p95_ms']} мс\n")
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                previous = json.load(file)
+            self.stdout.write(self.style.MIGRATE_HEADING('Сравнение медианного времени'))
+            for name, result in results.items():
+                if name in previous:
+                    before, after = previous[name]['median_ms'], result['median_ms']
+                    self.stdout.write(f'{name}: {before} мс -> {after} мс (x{before / after if after else 0:.1f})')
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Результаты сохранены в {options['output']}"))
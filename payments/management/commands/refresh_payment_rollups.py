@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from payments.services import refresh_payment_rollups
+
+
+class Command(BaseCommand):
+    """
+    Команда для пересчета сводок платежей за день (запускается по расписанию, например cron).
+    Без параметров пересчитываются дни с последнего рассчитанного; после изменения или удаления
+    более старых платежей - запуск с --since (первый измененный день) или --full
+    """
+    help = 'Пересчет сводок платежей за день для отчетов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Пересчитать сводки за все дни')
+        parser.add_argument(
+            '--since', type=date.fromisoformat, help='Пересчитать сводки начиная с дня (ГГГГ-ММ-ДД)'
+        )
+
+    def handle(self, *args, **options):
+        created = refresh_payment_rollups(full=options['full'], since=options['since'])
+        self.stdout.write(self.style.SUCCESS(f'Сводки платежей обновлены, записей за дни: {created}'))
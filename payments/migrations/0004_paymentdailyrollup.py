@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0005_subscription_unique_user_course"),
+        ("payments", "0003_payment_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentDailyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="День")),
+                (
+                    "payment_method",
+                    models.CharField(
+                        choices=[
+                            ("cash", "Наличные"),
+                            ("transfer", "Перевод на счет"),
+                            ("gift", "Подарочный сертификат"),
+                        ],
+                        max_length=30,
+                        verbose_name="Способ оплаты",
+                    ),
+                ),
+                (
+                    "total_amount",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="Сумма платежей"
+                    ),
+                ),
+                (
+                    "payments_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Количество платежей"
+                    ),
+                ),
+                (
+                    "paid_course",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="payment_rollups",
+                        to="materials.course",
+                        verbose_name="Оплаченный курс",
+                    ),
+                ),
+                (
+                    "paid_lesson",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="payment_rollups",
+                        to="materials.lesson",
+                        verbose_name="Оплаченный урок",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Сводка платежей за день",
+                "verbose_name_plural": "Сводки платежей за день",
+                "indexes": [
+                    models.Index(fields=["day"], name="payment_rollup_day_idx")
+                ],
+            },
+        ),
+    ]
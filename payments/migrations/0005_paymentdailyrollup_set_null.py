@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0009_lesson_video_id"),
+        ("payments", "0004_paymentdailyrollup"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="paymentdailyrollup",
+            name="paid_course",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="payment_rollups",
+                to="materials.course",
+                verbose_name="Оплаченный курс",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="paymentdailyrollup",
+            name="paid_lesson",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="payment_rollups",
+                to="materials.lesson",
+                verbose_name="Оплаченный урок",
+            ),
+        ),
+    ]
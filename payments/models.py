@@ -63,7 +63,55 @@ class Payment(models.Model):
         verbose_name = "Платеж"
         verbose_name_plural = "Платежи"
         ordering = ['-payment_date']
+        indexes = [
+            # история платежей пользователя и списки по курсу - фильтр по полю + сортировка по дате
+            models.Index(fields=['owner', '-payment_date'], name='payment_owner_date_idx'),
+            models.Index(fields=['paid_course', '-payment_date'], name='payment_course_date_idx'),
+            # отчеты по способу оплаты за период
+            models.Index(fields=['payment_method', 'payment_date'], name='payment_method_date_idx'),
+            # общий список платежей (сортировка курсорной пагинации)
+            models.Index(fields=['-payment_date', 'id'], name='payment_date_id_idx'),
+        ]
 
     def __str__(self):
         what_is_paid_for = self.paid_course or self.paid_lesson or "не указано"
         return f"Платеж {self.owner} - {self.amount} руб. ({what_is_paid_for})"
+
+
+class PaymentDailyRollup(models.Model):
+    """Предрассчитанные суммы платежей за день (для отчетов по большому количеству платежей)"""
+
+    day = models.DateField(verbose_name="День")
+    paid_course = models.ForeignKey(
+        Course,
+        on_delete=models.SET_NULL,  # как в Payment: после удаления суммы остаются в отчете
+        null=True,
+        blank=True,
+        related_name='payment_rollups',
+        verbose_name='Оплаченный курс',
+    )
+    paid_lesson = models.ForeignKey(
+        Lesson,
+        on_delete=models.SET_NULL,  # как в Payment: после удаления суммы остаются в отчете
+        null=True,
+        blank=True,
+        related_name='payment_rollups',
+        verbose_name='Оплаченный урок',
+    )
+    payment_method = models.CharField(
+        max_length=30,
+        choices=Payment.PAYMENT_METHOD_CHOICES,
+        verbose_name="Способ оплаты",
+    )
+    total_amount = models.PositiveBigIntegerField(default=0, verbose_name='Сумма платежей')
+    payments_count = models.PositiveIntegerField(default=0, verbose_name='Количество платежей')
+
+    class Meta:
+        verbose_name = "Сводка платежей за день"
+        verbose_name_plural = "Сводки платежей за день"
+        indexes = [
+            models.Index(fields=['day'], name='payment_rollup_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: {self.total_amount} руб. ({self.payments_count} платежей)"
@@ -0,0 +1,9 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class PaymentPaginator(CursorPagination):
+    """ Курсорная (keyset) пагинация для платежей (сначала новые) """
+    ordering = ('-payment_date', 'id')  # id - для стабильного порядка платежей с одинаковой датой
+    page_size_query_param = 'page_size'  # размер страницы можно передать в запросе (?page_size=50)
+    max_page_size = settings.API_MAX_PAGE_SIZE
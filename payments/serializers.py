@@ -1,10 +1,36 @@
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import ChoiceField, DateField, ModelSerializer, Serializer, ValidationError
+from common.serializers import BulkListSerializer, PreloadedPrimaryKeyRelatedField, SparseFieldsSerializerMixin
 from payments.models import Payment
 
 
-class PaymentSerializer(ModelSerializer):
+class PaymentSerializer(SparseFieldsSerializerMixin, ModelSerializer):
     """ Сериализатор для платежей """
+    serializer_related_field = PreloadedPrimaryKeyRelatedField  # для массовой валидации (BulkListSerializer)
 
     class Meta:
         model = Payment
         fields = '__all__'
+        list_serializer_class = BulkListSerializer
+        expandable_fields = {
+            'owner': 'users.serializers.UserBriefSerializer',
+            'paid_course': 'materials.serializers.CourseBriefSerializer',
+            'paid_lesson': 'materials.serializers.LessonBriefSerializer',
+        }
+
+
+class PaymentReportParamsSerializer(Serializer):
+    """ Сериализатор параметров отчета по платежам """
+    group_by = ChoiceField(choices=['course', 'lesson', 'method', 'day', 'week', 'month'], default='day')
+    date_from = DateField(required=False)
+    date_to = DateField(required=False)
+    source = ChoiceField(choices=['live', 'rollup'], default='live')  # rollup - из предрассчитанных сводок
+
+    def validate(self, attrs):
+        if attrs.get('date_from') and attrs.get('date_to') and attrs['date_from'] > attrs['date_to']:
+            raise ValidationError('Дата начала периода не может быть позже даты окончания')
+        return attrs
+
+
+class PaymentExportParamsSerializer(Serializer):
+    """ Сериализатор параметров выгрузки платежей """
+    file_format = ChoiceField(choices=['csv', 'ndjson'], default='csv')
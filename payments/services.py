@@ -0,0 +1,158 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DateField, F, Max, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from payments.models import Payment, PaymentDailyRollup
+
+# Поля выгрузки платежей (export)
+EXPORT_FIELDS = ('id', 'owner_id', 'payment_date', 'paid_course_id', 'paid_lesson_id', 'amount', 'payment_method')
+PAYMENT_DATE_INDEX = EXPORT_FIELDS.index('payment_date')
+
+# Поля для группировки отчета (ключ группы и подпись к нему)
+REPORT_GROUP_FIELDS = {
+    'course': ('paid_course', 'paid_course__name'),
+    'lesson': ('paid_lesson', 'paid_lesson__name'),
+    'method': ('payment_method',),
+    'day': ('period',),
+    'week': ('period',),
+    'month': ('period',),
+}
+
+# Фильтры filterset_fields, для которых в сводках есть колонки (остальные в отчете из сводок недоступны)
+ROLLUP_FILTER_FIELDS = ('paid_course', 'paid_lesson', 'payment_method')
+
+
+def _day_start(day):
+    """ Начало дня в текущей временной зоне (как у TruncDate) - граница периода для индекса по payment_date """
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _period(group_by, date_field, is_date):
+    """ Выражение для группировки по периоду (день, неделя, месяц) """
+    if group_by == 'day':
+        return F(date_field) if is_date else TruncDate(date_field)
+    trunc_function = TruncWeek if group_by == 'week' else TruncMonth
+    return trunc_function(date_field, output_field=DateField())
+
+
+def build_payments_report(payments, group_by, date_from=None, date_to=None):
+    """
+    Отчет по платежам: сумма и количество платежей в каждой группе.
+    Агрегация выполняется в БД, в Python возвращаются только строки отчета
+    """
+    payments = payments.order_by()  # сортировка выборки не должна попасть в GROUP BY
+    if date_from:
+        payments = payments.filter(payment_date__gte=_day_start(date_from))
+    if date_to:
+        payments = payments.filter(payment_date__lt=_day_start(date_to + timedelta(days=1)))
+    if group_by in ('day', 'week', 'month'):
+        payments = payments.annotate(period=_period(group_by, 'payment_date', is_date=False))
+
+    return list(
+        payments.values(*REPORT_GROUP_FIELDS[group_by])
+        .annotate(total_amount=Sum('amount'), payments_count=Count('id'))
+        .order_by(REPORT_GROUP_FIELDS[group_by][0])
+    )
+
+
+def build_rollup_report(group_by, date_from=None, date_to=None, filters=None):
+    """
+    Отчет по платежам из предрассчитанных сводок за день (см. refresh_payment_rollups).
+    filters - значения фильтров из ROLLUP_FILTER_FIELDS
+    """
+    rollups = PaymentDailyRollup.objects.filter(**(filters or {}))
+    if date_from:
+        rollups = rollups.filter(day__gte=date_from)
+    if date_to:
+        rollups = rollups.filter(day__lte=date_to)
+    if group_by in ('day', 'week', 'month'):
+        rollups = rollups.annotate(period=_period(group_by, 'day', is_date=True))
+
+    return list(
+        rollups.values(*REPORT_GROUP_FIELDS[group_by])
+        .annotate(total_amount=Sum('total_amount'), payments_count=Sum('payments_count'))
+        .order_by(REPORT_GROUP_FIELDS[group_by][0])
+    )
+
+
+def refresh_payment_rollups(full=False, since=None):
+    """
+    Пересчет сводок платежей за день.
+    По умолчанию пересчитываются только дни, начиная с последнего уже рассчитанного
+    (новые платежи создаются с текущей датой). Изменение и удаление платежей за более ранние дни
+    так не учитываются: после них нужен пересчет с даты since (первый измененный день) или full=True - полный.
+    Возвращает количество созданных строк сводок
+    """
+    if full:
+        last_day = None
+    elif since:
+        last_day = since
+    else:
+        last_day = PaymentDailyRollup.objects.aggregate(last_day=Max('day'))['last_day']
+
+    payments = Payment.objects.order_by().exclude(payment_date=None)
+    rollups = PaymentDailyRollup.objects.all()
+    if last_day:
+        payments = payments.filter(payment_date__gte=_day_start(last_day))
+        rollups = rollups.filter(day__gte=last_day)
+
+    rows = (
+        payments.annotate(day=TruncDate('payment_date'))
+        .values('day', 'paid_course', 'paid_lesson', 'payment_method')
+        .annotate(total=Sum('amount'), count=Count('id'))
+    )
+    with transaction.atomic():
+        rollups.delete()
+        created = PaymentDailyRollup.objects.bulk_create(
+            (
+                PaymentDailyRollup(
+                    day=row['day'],
+                    paid_course_id=row['paid_course'],
+                    paid_lesson_id=row['paid_lesson'],
+                    payment_method=row['payment_method'],
+                    total_amount=row['total'],
+                    payments_count=row['count'],
+                )
+                for row in rows.iterator()
+            ),
+            batch_size=1000,
+        )
+    return len(created)
+
+
+class EchoBuffer:
+    """ Псевдо-файл для csv.writer: вместо записи возвращает строку """
+
+    def write(self, value):
+        return value
+
+
+def _export_row(row):
+    """ Строка выгрузки с датой платежа в формате ISO 8601 """
+    row = list(row)
+    if row[PAYMENT_DATE_INDEX]:
+        row[PAYMENT_DATE_INDEX] = row[PAYMENT_DATE_INDEX].isoformat()
+    return row
+
+
+def iter_payments_export(payments, file_format):
+    """
+    Строки выгрузки платежей в формате csv или ndjson.
+    Платежи читаются курсором БД (iterator) только нужными полями (values_list),
+    поэтому память не зависит от количества платежей
+    """
+    rows = map(_export_row, payments.values_list(*EXPORT_FIELDS).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE))
+    if file_format == 'csv':
+        writer = csv.writer(EchoBuffer())
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + '\n'
@@ -1,3 +1,222 @@
-from django.test import TestCase
+import json
+from datetime import datetime
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import make_aware
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from materials.models import Course
+from payments.models import Payment
+from payments.services import refresh_payment_rollups
+from users.models import User
+from users.serializers import RoleTokenObtainPairSerializer
+
+
+class PaymentPaginationTestCase(APITestCase):
+    """ Тесты курсорной пагинации платежей """
+
+    def setUp(self):
+        self.user = User.objects.create(email="payer@example.com")
+        self.client.force_authenticate(user=self.user)
+        for amount in range(5):
+            Payment.objects.create(owner=self.user, amount=amount, payment_method="cash")
+
+    def test_cursor_pages_cover_all_payments_once(self):
+        """ Обход страниц по ссылке next возвращает каждый платеж ровно один раз, новые - первыми """
+        url = reverse("payments:payments-list") + "?page_size=2"
+        payment_ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            payment_ids += [payment["id"] for payment in response.data["results"]]
+            url = response.data["next"]
+
+        expected_ids = list(Payment.objects.order_by("-payment_date", "id").values_list("id", flat=True))
+        self.assertEqual(payment_ids, expected_ids)
+
+
+class PaymentReportTestCase(APITestCase):
+    """ Тесты отчета по платежам """
+
+    def setUp(self):
+        self.user = User.objects.create(email="payer@example.com")
+        self.client.force_authenticate(user=self.user)
+        self.course = Course.objects.create(name="Курс")
+        Payment.objects.create(owner=self.user, paid_course=self.course, amount=100, payment_method="cash")
+        Payment.objects.create(owner=self.user, paid_course=self.course, amount=250, payment_method="transfer")
+        Payment.objects.create(owner=self.user, amount=50, payment_method="cash")
+
+    def get_report(self, **params):
+        response = self.client.get(reverse("payments:payments-report"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["results"]
+
+    def test_report_by_method(self):
+        """ Суммы по способам оплаты считаются в БД """
+        self.assertEqual(
+            self.get_report(group_by="method"),
+            [
+                {"payment_method": "cash", "total_amount": 150, "payments_count": 2},
+                {"payment_method": "transfer", "total_amount": 250, "payments_count": 1},
+            ],
+        )
+
+    def test_report_period_bounds(self):
+        """ Период отчета - целые дни в текущей временной зоне, условие по payment_date без приведения к дате """
+        Payment.objects.filter(amount=100).update(payment_date=make_aware(datetime(2026, 3, 1, 23, 59)))
+        Payment.objects.filter(amount=250).update(payment_date=make_aware(datetime(2026, 3, 2)))
+        Payment.objects.filter(amount=50).update(payment_date=make_aware(datetime(2026, 2, 28, 23, 59)))
+        with CaptureQueriesContext(connection) as context:
+            report = self.get_report(group_by="method", date_from="2026-03-01", date_to="2026-03-01")
+        self.assertEqual(report, [{"payment_method": "cash", "total_amount": 100, "payments_count": 1}])
+        self.assertNotIn("django_datetime_cast_date", context.captured_queries[-1]["sql"])
+
+    def test_rollup_report_matches_live_report(self):
+        """ Отчет из сводок совпадает с отчетом по платежам """
+        refresh_payment_rollups()
+        for group_by in ("course", "month"):
+            self.assertEqual(
+                self.get_report(group_by=group_by, source="rollup"),
+                self.get_report(group_by=group_by),
+            )
+
+    def test_rollup_report_filters(self):
+        """ Отчет из сводок учитывает фильтры по колонкам сводок, остальные фильтры - ошибка 400 """
+        refresh_payment_rollups()
+        params = {"group_by": "method", "paid_course": self.course.pk}
+        self.assertEqual(self.get_report(source="rollup", **params), self.get_report(**params))
+        self.assertEqual(len(self.get_report(source="rollup", **params)), 2)
+
+        response = self.client.get(reverse("payments:payments-report"), {"source": "rollup", "owner": self.user.pk})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("owner", response.data)
+
+    def test_rollup_refresh_since(self):
+        """ Изменение платежа за прошлый день попадает в сводки только при пересчете с этого дня (--since) """
+        Payment.objects.filter(amount=50).update(payment_date=make_aware(datetime(2026, 3, 1, 12)))
+        refresh_payment_rollups()
+        Payment.objects.filter(amount=50).update(amount=70)
+
+        call_command("refresh_payment_rollups", stdout=StringIO())
+        self.assertNotEqual(self.get_report(group_by="method", source="rollup"), self.get_report(group_by="method"))
+        call_command("refresh_payment_rollups", "--since=2026-03-01", stdout=StringIO())
+        self.assertEqual(self.get_report(group_by="method", source="rollup"), self.get_report(group_by="method"))
+
+    def test_rollup_keeps_deleted_course(self):
+        """ После удаления курса суммы по нему остаются в сводках, как и в отчете по платежам """
+        refresh_payment_rollups()
+        self.course.delete()
+        self.assertEqual(self.get_report(group_by="method", source="rollup"), self.get_report(group_by="method"))
+
+
+class PaymentCreateTestCase(APITestCase):
+    """ Тесты создания платежа """
+
+    def test_payment_create_single_write(self):
+        """ Платеж с владельцем создается одной вставкой, без последующего UPDATE """
+        user = User.objects.create(email="payer@example.com")
+        self.client.force_authenticate(user=user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse("payments:payments-list"), {"amount": 100, "payment_method": "cash"})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        writes = [query for query in context.captured_queries if query["sql"].startswith(("INSERT", "UPDATE"))]
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(Payment.objects.get().owner, user)
+
+
+class PaymentExportTestCase(APITestCase):
+    """ Тесты потоковой выгрузки платежей """
+
+    def setUp(self):
+        self.user = User.objects.create(email="payer@example.com")
+        self.client.force_authenticate(user=self.user)
+        Payment.objects.create(owner=self.user, amount=100, payment_method="cash")
+        Payment.objects.create(owner=self.user, amount=200, payment_method="transfer")
+
+    def export(self, **params):
+        response = self.client.get(reverse("payments:payments-export"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b"".join(response.streaming_content).decode().splitlines()
+
+    def test_csv_export_with_filter(self):
+        """ CSV-выгрузка учитывает фильтры списка платежей """
+        lines = self.export(payment_method="cash")
+        self.assertEqual(lines[0].split(",")[0], "id")
+        self.assertEqual(len(lines), 2)
+        self.assertIn(",100,cash", lines[1])
+
+    def test_ndjson_export(self):
+        """ NDJSON-выгрузка: один JSON-объект платежа на строку """
+        rows = [json.loads(line) for line in self.export(file_format="ndjson")]
+        self.assertEqual(sorted(row["amount"] for row in rows), [100, 200])
+
+
+class AsyncPaymentListTestCase(APITestCase):
+    """ Тесты асинхронной истории платежей """
+
+    def test_payment_list(self):
+        """ Только для аутентифицированных, новые платежи - первыми, с фильтром по способу оплаты """
+        user = User.objects.create(email="payer@example.com")
+        payments = [Payment.objects.create(owner=user, amount=amount, payment_method="cash") for amount in (1, 2)]
+        Payment.objects.create(owner=user, amount=3, payment_method="transfer")
+        url = reverse("payments:async_payments_list")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        token = RoleTokenObtainPairSerializer.get_token(user).access_token
+        response = self.client.get(url, {"payment_method": "cash"}, HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([payment["id"] for payment in response.json()["results"]], [payments[1].pk, payments[0].pk])
+
+    def test_payment_list_pages(self):
+        """ Страницы по ключу after - в порядке PaymentViewSet.list (дата, затем id), включая платежи с одной датой """
+        user = User.objects.create(email="payer@example.com")
+        for amount in range(5):
+            Payment.objects.create(owner=user, amount=amount, payment_method="cash")
+        Payment.objects.filter(amount__in=(1, 2, 3)).update(payment_date=make_aware(datetime(2026, 3, 1)))
+        token = RoleTokenObtainPairSerializer.get_token(user).access_token
+
+        url = reverse("payments:async_payments_list") + "?page_size=2"
+        payment_ids = []
+        while url:
+            response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {token}")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            payment_ids += [payment["id"] for payment in response.json()["results"]]
+            url = response.json()["next"]
+
+        expected_ids = list(Payment.objects.order_by("-payment_date", "id").values_list("id", flat=True))
+        self.assertEqual(payment_ids, expected_ids)
+
+
+class PaymentSparseFieldsTestCase(APITestCase):
+    """ Тесты выбора полей и раскрытия связей в списке платежей """
+
+    def setUp(self):
+        self.user = User.objects.create(email="payer@example.com")
+        self.client.force_authenticate(user=self.user)
+        course = Course.objects.create(name="Курс", description="Длинное описание")
+        for amount in range(3):
+            Payment.objects.create(owner=self.user, paid_course=course, amount=amount, payment_method="cash")
+
+    def test_expand_related_objects(self):
+        """ Раскрытые курс и владелец загружаются одним запросом вместе с платежами """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("payments:payments-list"), {
+                "fields": "id,amount,paid_course,owner", "expand": "paid_course,owner",
+            })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        payment = response.json()["results"][0]
+        self.assertEqual(set(payment), {"id", "amount", "paid_course", "owner"})
+        self.assertEqual(payment["paid_course"]["name"], "Курс")
+        self.assertEqual(payment["owner"]["email"], "payer@example.com")
+        payment_queries = [
+            query["sql"] for query in context.captured_queries if 'FROM "payments_payment"' in query["sql"]
+        ]
+        self.assertEqual(len(payment_queries), 1)
+        self.assertNotIn("description", payment_queries[0])
@@ -1,5 +1,6 @@
+from django.urls import path
 from payments.apps import PaymentsConfig
-from payments.views import PaymentViewSet
+from payments.views import PaymentViewSet, async_payment_list
 from rest_framework.routers import DefaultRouter
 
 
@@ -11,5 +12,5 @@ router = DefaultRouter()  # Создание экземпляра DefaultRouter
 router.register(r"payments", PaymentViewSet, basename="payments")  # Регистрация ViewSet с именем payments
 
 urlpatterns = [
-
+    path("async/payments/", async_payment_list, name="async_payments_list"),
 ] + router.urls  # Добавление URL для ViewSet
@@ -1,21 +1,121 @@
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, ValidationError
 from rest_framework.filters import OrderingFilter
+from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
+from common.mixins import BulkCreateUpdateMixin, ReplicaReadMixin, SparseFieldsMixin
+from common.pagination import keyset_page
 from payments.models import Payment
-from payments.serializers import PaymentSerializer
+from payments.paginators import PaymentPaginator
+from payments.serializers import PaymentExportParamsSerializer, PaymentReportParamsSerializer, PaymentSerializer
+from payments.services import (
+    ROLLUP_FILTER_FIELDS, build_payments_report, build_rollup_report, iter_payments_export,
+)
+from users.authentication import aauthenticate
 
 
-class PaymentViewSet(ModelViewSet):
+class PaymentViewSet(SparseFieldsMixin, ReplicaReadMixin, BulkCreateUpdateMixin, ModelViewSet):
     """ CRUD для платежей """
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_fields = ['owner', 'payment_date', 'paid_course', 'paid_lesson', 'amount', 'payment_method']
     ordering_fields = ['payment_date']  # Поле для сортировки
+    ordering = ['-payment_date', 'id']  # Сортировка по умолчанию (используется и курсорной пагинацией)
+    pagination_class = PaymentPaginator
+    replica_actions = ('list', 'retrieve', 'report', 'export')  # чтение с реплик БД
 
 
     def perform_create(self, serializer):
         """ Создание платежа и сохранение владельца в поле owner """
-        payment = serializer.save()
-        payment.owner = self.request.user # сохранение владельца платежа в поле owner
-        payment.save()
+        serializer.save(owner=self.request.user) # сохранение владельца платежа в поле owner (одна вставка в БД)
+
+    @action(detail=False, methods=['get'])
+    def report(self, request):
+        """
+        Отчет по платежам: сумма и количество платежей по курсам, урокам, способам оплаты или периодам.
+        Параметры: group_by (course, lesson, method, day, week, month), date_from, date_to,
+        source (live - по платежам с учетом фильтров filterset_fields, rollup - из предрассчитанных сводок,
+        с фильтрами только по курсу, уроку и способу оплаты)
+        """
+        params = PaymentReportParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        group_by, source = params.validated_data['group_by'], params.validated_data['source']
+        period = {key: params.validated_data.get(key) for key in ('date_from', 'date_to')}
+
+        if source == 'rollup':
+            results = build_rollup_report(group_by, filters=self.get_rollup_filters(request), **period)
+        else:
+            results = build_payments_report(self.filter_queryset(self.get_queryset()), group_by, **period)
+        return Response({'group_by': group_by, 'source': source, 'results': results})
+
+    def get_rollup_filters(self, request):
+        """ Проверенные значения фильтров filterset_fields для отчета из сводок (400 - фильтра нет в сводках) """
+        filterset = DjangoFilterBackend().get_filterset(request, self.get_queryset(), self)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        filters = {
+            name: value for name, value in filterset.form.cleaned_data.items()
+            if name in request.query_params and value not in (None, '')
+        }
+        unsupported = sorted(set(filters) - set(ROLLUP_FILTER_FIELDS))
+        if unsupported:
+            message = 'Фильтр недоступен для отчета из сводок (source=rollup)'
+            raise ValidationError({name: [message] for name in unsupported})
+        return filters
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Потоковая выгрузка платежей в CSV или NDJSON (параметр file_format) с фильтрами filterset_fields.
+        Ответ формируется построчно, без загрузки всех платежей в память
+        """
+        params = PaymentExportParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        file_format = params.validated_data['file_format']
+
+        payments = self.filter_queryset(self.get_queryset())
+        payments = payments.using(payments.db)  # БД (реплика) выбирается до выхода из middleware, читается позже
+        content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(
+            iter_payments_export(payments, file_format),
+            content_type=f'{content_type}; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename="payments.{file_format}"'
+        return response
+
+    def get_bulk_update_queryset(self):
+        """ Массово изменять можно только свои платежи """
+        return self.get_queryset().filter(owner_id=self.request.user.pk)
+
+    @action(detail=False, methods=['post', 'patch'])
+    def bulk(self, request):
+        """ Массовое создание (POST) и изменение (PATCH) платежей списком объектов """
+        if request.method == 'POST':
+            return self.bulk_create(request)
+        return self.bulk_update(request)
+
+
+# Фильтры асинхронного списка платежей (точное совпадение, как filterset_fields в PaymentViewSet)
+ASYNC_PAYMENT_FILTERS = ('owner', 'paid_course', 'paid_lesson', 'payment_method')
+
+
+@require_GET
+async def async_payment_list(request):
+    """ История платежей (как PaymentViewSet.list, новые - первыми) на асинхронном ORM для ASGI """
+    try:
+        user = await aauthenticate(request)
+        if not user.is_authenticated:
+            raise NotAuthenticated
+    except (AuthenticationFailed, NotAuthenticated) as error:
+        return JsonResponse({'detail': error.detail}, status=error.status_code)
+
+    filters = {name: request.GET[name] for name in ASYNC_PAYMENT_FILTERS if request.GET.get(name)}
+    invalid = [name for name, value in filters.items() if name != 'payment_method' and not value.isdigit()]
+    if invalid:
+        return JsonResponse({name: ['Введите целое число.'] for name in invalid}, status=400)
+    payments = Payment.objects.filter(**filters)
+    return JsonResponse(await keyset_page(request, payments, PaymentSerializer, ordering=PaymentPaginator.ordering))
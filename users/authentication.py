@@ -0,0 +1,64 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.utils.functional import cached_property
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from users.roles import get_role_version
+
+
+class ClaimsUser(TokenUser):
+    """ Легковесный пользователь, построенный из claims JWT-токена (без запроса к БД) """
+
+    def __init__(self, token):
+        super().__init__(token)
+        self._is_moderator = token.get('is_moderator', False)  # роль для users.roles.is_moderator
+
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @cached_property
+    def email(self):
+        return self.token.get('email', '')
+
+
+class RoleClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация с ролями в токене.
+    Для читающих запросов (GET, HEAD, OPTIONS) пользователь строится из claims токена, а актуальность ролей
+    проверяется по версии ролей из кэша. Для изменяющих запросов пользователь загружается из БД
+    """
+    stateless = False
+
+    def authenticate(self, request):
+        self.stateless = settings.JWT_STATELESS_READS and request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if not self.stateless or 'role_version' not in validated_token:
+            return super().get_user(validated_token)  # токен без claims ролей - обычная загрузка из БД
+
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            raise InvalidToken('Токен не содержит идентификатор пользователя')
+        if get_role_version(user_id) != validated_token['role_version']:
+            raise InvalidToken('Роли пользователя изменились, получите новый токен')
+        return ClaimsUser(validated_token)
+
+
+async def aauthenticate(request):
+    """
+    JWT-аутентификация для асинхронных view (вне DRF). Возвращает пользователя или AnonymousUser,
+    при недействительном токене - исключение AuthenticationFailed
+    """
+    result = await sync_to_async(RoleClaimsJWTAuthentication().authenticate)(request)
+    return result[0] if result else AnonymousUser()
@@ -1,80 +1,218 @@
-from django.contrib.auth import get_user_model
-from django.core.management.base import BaseCommand
+import random
+import time
+from datetime import timedelta
+from io import StringIO
+from itertools import accumulate, islice
 
-from materials.models import Lesson, Course
-from users.models import Payment
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
 
-User = get_user_model()
+from materials.caching import bump_catalog_version
+from materials.models import Course, CourseNotification, Lesson, Subscription
+from payments.models import Payment, PaymentDailyRollup
+from users.models import User
+
+# Домен email сгенерированных пользователей (по нему они удаляются при --clear)
+SEED_EMAIL_DOMAIN = 'load.test'
+
+# Доли способов оплаты и платежей за курс (остальные - за отдельный урок)
+PAYMENT_METHOD_WEIGHTS = {'transfer': 70, 'cash': 20, 'gift': 10}
+COURSE_PAYMENT_SHARE = 0.7
+
+
+def _copy_value(value):
+    """ Значение поля в текстовом формате COPY (NULL - \\N, спецсимволы экранируются) """
+    if value is None:
+        return '\\N'
+    return (
+        str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    )
 
 
 class Command(BaseCommand):
-    """Команда для загрузки тестовых данных"""
-    help = 'Загрузка тестовых данных'
-
-    def handle(self, *args, **kwargs):
-        # Удаление существующих записей
-        Payment.objects.all().delete()
-        Lesson.objects.all().delete()
-        Course.objects.all().delete()
-
-        # Создание курса
-        course, created = Course.objects.get_or_create(name='Курс 1', description="Какой-то курс1")
-        if created:
-            self.stdout.write(
-                self.style.SUCCESS(f'Успешно добавлен курс: {course.name}'))
-        else:
-            self.stdout.write(self.style.WARNING(f'Курс "{course.name}" уже есть в БД.'))
-
-        # Создание уроков
-        lessons = [
-            {'name': 'Урок 1', 'description': 'Какой-то урок1', 'course': course},
-            {'name': 'Урок 2', 'description': 'Какой-то урок2', 'course': course},
-            {'name': 'Урок 3', 'description': 'Какой-то урок3', 'course': course},
-        ]
-
-        created_lessons = []
-        for lesson_data in lessons:
-            lesson, created = Lesson.objects.get_or_create(**lesson_data)
-            if created:
-                self.stdout.write(self.style.SUCCESS(f'Успешно добавлен урок: {lesson.name}'))
-                created_lessons.append(lesson)
-            else:
-                self.stdout.write(self.style.WARNING(f'Урок "{lesson.name}" уже есть в БД.'))
-
-        # Создание или получение пользователей
-        users = [
-            {'email': 'user1@mail.com'},
-            {'email': 'user2@mail.com'},
-            {'email': 'user3@mail.com'},
-        ]
-
-        created_users = []
-        for user_data in users:
-            user, created = User.objects.get_or_create(email=user_data['email'])
-            if created:
-                user.set_password('testpassword123')
-                user.save()
-                self.stdout.write(self.style.SUCCESS(f'Успешно создан пользователь: {user.email}'))
-            else:
-                self.stdout.write(self.style.WARNING(f'Пользователь "{user.email}" уже есть в БД.'))
-            created_users.append(user)
-
-        # Создание платежей
-        payments = [
-            {"user": created_users[0], "payment_date": None,
-             "paid_course": course, "paid_lesson": None, "amount": 10000, "payment_method": "cash"},
-
-            {"user": created_users[1], "payment_date": None,
-             "paid_course": None, "paid_lesson": created_lessons[2], "amount": 20000, "payment_method": "transfer"},
-
-            {"user": created_users[2], "payment_date": None,
-             "paid_course": course, "paid_lesson": None, "amount": 15000, "payment_method": "gift"},
-        ]
-
-        for payment_data in payments:
-            payment, created = Payment.objects.get_or_create(**payment_data)
-            if created:
-                self.stdout.write(
-                    self.style.SUCCESS(f'Успешно добавлен платеж: {payment.user.email} - {payment.amount} руб.'))
+    """
+    Заполнение БД тестовыми данными для нагрузочного тестирования: пользователи, курсы, уроки,
+    подписки и платежи. Записи вставляются пачками (bulk_create, INSERT с заданными датами или COPY в PostgreSQL),
+    пароль хешируется один раз, данные определяются параметром --seed:
+        python manage.py fill_payments --users 100000 --courses 1000 --payments 1000000 --clear --copy
+    """
+    help = 'Загрузка тестовых данных для нагрузочного тестирования'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Количество пользователей')
+        parser.add_argument('--courses', type=int, default=50, help='Количество курсов')
+        parser.add_argument('--lessons', type=int, default=10, help='Среднее количество уроков в курсе')
+        parser.add_argument('--subscriptions', type=int, default=3, help='Среднее количество подписок пользователя')
+        parser.add_argument('--payments', type=int, default=10000, help='Количество платежей')
+        parser.add_argument('--days', type=int, default=365, help='Период дат платежей (дней до текущей даты)')
+        parser.add_argument('--seed', type=int, default=42, help='Начальное значение генератора случайных чисел')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Размер пачки вставляемых записей')
+        parser.add_argument('--password', default='testpassword123', help='Пароль всех пользователей')
+        parser.add_argument('--clear', action='store_true', help='Удалить курсы, уроки, платежи и пользователей '
+                                                                 f'@{SEED_EMAIL_DOMAIN} перед загрузкой')
+        parser.add_argument('--copy', action='store_true', help='Вставка командой COPY (только PostgreSQL)')
+
+    def handle(self, *args, **options):
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('Вставка командой COPY доступна только для PostgreSQL')
+        if options['users'] < 1 or options['courses'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь и один курс')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.use_copy = options['copy']
+
+        if options['clear']:
+            self.clear()
+        elif User.objects.filter(email__endswith=f'@{SEED_EMAIL_DOMAIN}').exists():
+            raise CommandError(f'В БД уже есть пользователи @{SEED_EMAIL_DOMAIN}, используйте --clear')
+
+        user_ids = self.create_users(options['users'], options['password'])
+        course_ids = self.create_courses(options['courses'], user_ids)
+        # популярность курсов распределена по закону Ципфа: первые курсы покупают и выбирают чаще
+        course_weights = list(accumulate(1 / rank ** 1.1 for rank in range(1, len(course_ids) + 1)))
+        lesson_ids = self.create_lessons(course_ids, options['lessons'], user_ids)
+        self.create_subscriptions(user_ids, course_ids, course_weights, options['subscriptions'])
+        self.create_payments(options['payments'], options['days'], user_ids, course_ids, course_weights, lesson_ids)
+
+        bump_catalog_version()  # массовая вставка не отправляет сигналы, сбрасывающие кэш каталога
+
+    def clear(self):
+        """ Очистка таблиц материалов и платежей (TRUNCATE в PostgreSQL) и удаление сгенерированных пользователей """
+        tables = [model._meta.db_table for model in (
+            Payment, PaymentDailyRollup, Subscription, CourseNotification, Lesson, Course
+        )]
+        connection.ops.execute_sql_flush(connection.ops.sql_flush(no_style(), tables))
+        User.objects.filter(email__endswith=f'@{SEED_EMAIL_DOMAIN}').delete()
+        self.stdout.write(self.style.WARNING('Тестовые данные удалены'))
+
+    def insert(self, model, objects, explicit_fields=()):
+        """
+        Вставка объектов пачками; возвращает id созданных записей по порядку.
+        explicit_fields - поля с auto_now_add, значения которых заданы у объектов (иначе их заменит текущее время)
+        """
+        last_pk = model.objects.aggregate(last_pk=Max('pk'))['last_pk'] or 0
+        started = time.perf_counter()
+        with transaction.atomic():
+            while batch := list(islice(objects, self.batch_size)):
+                if self.use_copy:
+                    self.copy(model, batch, explicit_fields)
+                elif explicit_fields:  # bulk_create заменил бы значения текущим временем
+                    self.insert_values(model, batch, explicit_fields)
+                else:
+                    model.objects.bulk_create(batch)
+        ids = list(model.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True))
+        self.stdout.write(self.style.SUCCESS(
+            f'{model._meta.verbose_name_plural}: {len(ids)} за {time.perf_counter() - started:.1f} с'
+        ))
+        return ids
+
+    @staticmethod
+    def prepare_rows(model, batch, explicit_fields=()):
+        """ Колонки таблицы (кроме id) и значения объектов для них (готовятся так же, как в bulk_create) """
+        fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+        rows = (
+            [
+                field.get_db_prep_save(
+                    getattr(obj, field.attname) if field.name in explicit_fields else field.pre_save(obj, add=True),
+                    connection,
+                )
+                for field in fields
+            ]
+            for obj in batch
+        )
+        return [connection.ops.quote_name(field.column) for field in fields], rows
+
+    def insert_values(self, model, batch, explicit_fields=()):
+        """ Вставка пачки объектов одним INSERT на объект (executemany) с заданными значениями explicit_fields """
+        columns, rows = self.prepare_rows(model, batch, explicit_fields)
+        placeholders = ', '.join(['%s'] * len(columns))
+        sql = (
+            f'INSERT INTO {connection.ops.quote_name(model._meta.db_table)} ({", ".join(columns)}) '
+            f'VALUES ({placeholders})'
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, list(rows))
+
+    def copy(self, model, batch, explicit_fields=()):
+        """ Вставка пачки объектов командой COPY """
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+        columns, rows = self.prepare_rows(model, batch, explicit_fields)
+        buffer = StringIO()
+        for row in rows:
+            buffer.write('\t'.join(_copy_value(value) for value in row))
+            buffer.write('\n')
+        sql = f'COPY {connection.ops.quote_name(model._meta.db_table)} ({", ".join(columns)}) FROM STDIN'
+        with connection.cursor() as cursor:
+            if is_psycopg3:  # psycopg 3 (в том числе с пулом соединений DATABASE_POOL)
+                with cursor.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
             else:
-                self.stdout.write(self.style.WARNING(f'Платеж для "{payment.user.email}" уже есть в БД.'))
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
+
+    def create_users(self, count, password):
+        password_hash = make_password(password)  # хеширование пароля - одно на всех пользователей
+        return self.insert(User, (
+            User(email=f'user{number}@{SEED_EMAIL_DOMAIN}', password=password_hash, is_active=True)
+            for number in range(1, count + 1)
+        ))
+
+    def create_courses(self, count, user_ids):
+        return self.insert(Course, (
+            Course(name=f'Курс {number}', description=f'Описание курса {number}', owner_id=self.rng.choice(user_ids))
+            for number in range(1, count + 1)
+        ))
+
+    def create_lessons(self, course_ids, lessons_per_course, user_ids):
+        def lessons():
+            for course_id in course_ids:
+                for number in range(1, self.rng.randint(1, max(2 * lessons_per_course - 1, 1)) + 1):
+                    yield Lesson(
+                        name=f'Урок {number}',
+                        description=f'Описание урока {number}',
+                        video=f'https://www.youtube.com/watch?v={course_id:07x}_{number:03x}',
+                        video_id=f'{course_id:07x}_{number:03x}',
+                        course_id=course_id,
+                        owner_id=self.rng.choice(user_ids),
+                    )
+
+        return self.insert(Lesson, lessons())
+
+    def create_subscriptions(self, user_ids, course_ids, course_weights, subscriptions_per_user):
+        def subscriptions():
+            for user_id in user_ids:
+                count = min(self.rng.randint(0, 2 * subscriptions_per_user), len(course_ids))
+                chosen = set()
+                while len(chosen) < count:
+                    chosen.add(self.rng.choices(course_ids, cum_weights=course_weights)[0])
+                for course_id in sorted(chosen):
+                    yield Subscription(user_id=user_id, course_id=course_id)
+
+        return self.insert(Subscription, subscriptions())
+
+    def create_payments(self, count, days, user_ids, course_ids, course_weights, lesson_ids):
+        now = timezone.now()
+        methods, method_weights = list(PAYMENT_METHOD_WEIGHTS), list(PAYMENT_METHOD_WEIGHTS.values())
+
+        def payments():
+            for _ in range(count):
+                payment = Payment(
+                    owner_id=self.rng.choice(user_ids),
+                    payment_date=now - timedelta(seconds=self.rng.randrange(max(days, 1) * 86400)),
+                    payment_method=self.rng.choices(methods, weights=method_weights)[0],
+                )
+                if not lesson_ids or self.rng.random() < COURSE_PAYMENT_SHARE:
+                    payment.paid_course_id = self.rng.choices(course_ids, cum_weights=course_weights)[0]
+                    payment.amount = self.rng.randrange(5000, 100001, 500)
+                else:
+                    payment.paid_lesson_id = self.rng.choice(lesson_ids)
+                    payment.amount = self.rng.randrange(500, 5001, 100)
+                yield payment
+
+        return self.insert(Payment, payments(), explicit_fields=['payment_date'])
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_delete_payment"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="role_version",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Увеличивается при изменении групп пользователя (JWT-токены со старой версией отклоняются)",
+                verbose_name="Версия ролей",
+            ),
+        ),
+    ]
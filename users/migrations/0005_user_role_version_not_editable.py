@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0004_user_role_version"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="user",
+            name="role_version",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Увеличивается при изменении групп пользователя (JWT-токены со старой версией отклоняются)",
+                verbose_name="Версия ролей",
+            ),
+        ),
+    ]
@@ -28,6 +28,12 @@ class User(AbstractUser):
         verbose_name="Аватар",
         help_text="Загрузите ваш аватар",
     )
+    role_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,  # меняется только сигналами users.signals, не из API и админки
+        verbose_name="Версия ролей",
+        help_text="Увеличивается при изменении групп пользователя (JWT-токены со старой версией отклоняются)",
+    )
 
     USERNAME_FIELD = (
         "email"  # означает, что мы хотим использовать email в качестве логина
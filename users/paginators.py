@@ -0,0 +1,9 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class UserPaginator(CursorPagination):
+    """ Курсорная (keyset) пагинация для пользователей """
+    ordering = 'id'
+    page_size_query_param = 'page_size'  # размер страницы можно передать в запросе (?page_size=50)
+    max_page_size = settings.API_MAX_PAGE_SIZE
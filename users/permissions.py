@@ -1,19 +1,21 @@
 from rest_framework.permissions import BasePermission
 
+from users.roles import is_moderator
+
 
 class IsModerator(BasePermission):
     """ Класс для проверки, является ли пользователь модератором """
     message = 'Вы должны быть модератором для выполнения этого действия' # сообщение, которое будет возвращено в случае ошибки
 
     def has_permission(self, request, view):
-        user = request.user
-        return user.groups.filter(name='Moderators').exists()
+        return is_moderator(request.user)  # без запроса к БД, если роль уже в кэше
 
 
 class IsOwner(BasePermission):
     """ Класс для проверки, является ли пользователь владельцем объекта """
 
     def has_object_permission(self, request, view, obj):
-        if obj.owner == request.user:
+        # сравнение по id: не загружает владельца из БД и работает с пользователем из claims токена
+        if obj.owner_id == request.user.pk:
             return True
         return False
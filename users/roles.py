@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from users.models import User
+
+MODERATORS_GROUP = 'Moderators'  # название группы модераторов (создается командой create_moderators_group)
+
+
+def moderator_cache_key(user_id):
+    """ Ключ кэша с признаком модератора для пользователя """
+    return f'users:is_moderator:{user_id}'
+
+
+def role_version_cache_key(user_id):
+    """ Ключ кэша с текущей версией ролей пользователя """
+    return f'users:role_version:{user_id}'
+
+
+def is_moderator(user):
+    """
+    Проверка, является ли пользователь модератором.
+    Результат запоминается на объекте пользователя (на время запроса) и в общем кэше (между запросами),
+    поэтому повторные проверки не обращаются к БД
+    """
+    if not user.is_authenticated:
+        return False
+
+    if not hasattr(user, '_is_moderator'):
+        cache_key = moderator_cache_key(user.pk)
+        user_is_moderator = cache.get(cache_key)
+        if user_is_moderator is None:
+            user_is_moderator = user.groups.filter(name=MODERATORS_GROUP).exists()
+            cache.set(cache_key, user_is_moderator, settings.ROLE_CACHE_TIMEOUT)
+        user._is_moderator = user_is_moderator
+    return user._is_moderator
+
+
+def get_role_version(user_id):
+    """ Текущая версия ролей пользователя (из кэша, при промахе - из БД). None, если пользователя нет """
+    cache_key = role_version_cache_key(user_id)
+    role_version = cache.get(cache_key)
+    if role_version is None:
+        role_version = User.objects.filter(pk=user_id).values_list('role_version', flat=True).first()
+        if role_version is not None:
+            cache.set(cache_key, role_version, settings.ROLE_CACHE_TIMEOUT)
+    return role_version
+
+
+def get_role_claims(user):
+    """ Claims с ролями пользователя для JWT-токена """
+    return {
+        'is_moderator': is_moderator(user),
+        'groups': list(user.groups.values_list('name', flat=True)),
+        'role_version': user.role_version,
+    }
+
+
+def invalidate_roles(user_ids):
+    """
+    Сброс закэшированных ролей пользователей (после изменения их групп).
+    Версия ролей увеличивается, поэтому выданные ранее токены с claims ролей перестают приниматься
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    User.objects.filter(pk__in=user_ids).update(role_version=F('role_version') + 1)
+    reset_role_cache(user_ids)
+
+
+def reset_role_cache(user_ids):
+    """ Удаление из кэша ролей и версий ролей пользователей """
+    keys = [moderator_cache_key(user_id) for user_id in user_ids]
+    keys += [role_version_cache_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
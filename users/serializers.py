@@ -1,16 +1,66 @@
 from rest_framework.serializers import ModelSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
 
+from common.serializers import SparseFieldsSerializerMixin
+from mediafiles.fields import ImageVariantsField
 from users.models import User
+from users.roles import get_role_claims, get_role_version
 
-class UserSerializer(ModelSerializer):
+class UserSerializer(SparseFieldsSerializerMixin, ModelSerializer):
     """ Сериализатор пользователя """
+    avatar_variants = ImageVariantsField(source='avatar')  # Ссылки на уменьшенные копии аватара
+
     class Meta:
         model = User
         fields = '__all__'
 
 
+class UserBriefSerializer(ModelSerializer):
+    """ Краткие данные пользователя для раскрытия связей (?expand=owner) """
+
+    class Meta:
+        model = User
+        fields = ('id', 'email',)
+
+
 class UserRegisterSerializer(ModelSerializer):
     """ Сериализатор регистрации пользователя (с сокращенными полями) """
     class Meta:
         model = User
         fields = ['email', 'password']
+        extra_kwargs = {'password': {'write_only': True}}  # хеш пароля не возвращается в ответе
+
+    def create(self, validated_data):
+        """ Создание пользователя с хешированным паролем одной вставкой в БД """
+        password = validated_data.pop('password')
+        user = User(**validated_data)
+        user.set_password(password)
+        user.save()
+        return user
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """ Сериализатор получения JWT-токенов с ролями пользователя в claims """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['email'] = user.email
+        for claim, value in get_role_claims(user).items():  # is_moderator, groups, role_version
+            token[claim] = value
+        return token
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    """ Сериализатор обновления JWT-токена: при изменении ролей пользователя claims выпускаются заново """
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data['access'])
+        user_id = access[api_settings.USER_ID_CLAIM]
+        if access.get('role_version') != get_role_version(user_id):
+            user = User.objects.get(pk=user_id)
+            data['access'] = str(RoleTokenObtainPairSerializer.get_token(user).access_token)
+        return data
@@ -0,0 +1,56 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from users.models import User
+from users.roles import invalidate_roles, reset_role_cache
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def reset_roles_on_groups_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """ Сброс кэша ролей при добавлении/удалении пользователей в группы """
+    if not reverse:  # user.groups.add(...) - изменились группы одного пользователя
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_roles([instance.pk])
+    elif action == 'pre_clear':  # group.user_set.clear() - запоминаем пользователей до очистки
+        instance._cleared_user_ids = list(instance.user_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        invalidate_roles(getattr(instance, '_cleared_user_ids', []))
+    elif action in ('post_add', 'post_remove'):  # group.user_set.add(...) - pk_set содержит id пользователей
+        invalidate_roles(pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def reset_roles_on_group_change(sender, instance, **kwargs):
+    """ Сброс кэша ролей участников группы при ее переименовании или удалении """
+    invalidate_roles(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(pre_save, sender=User)
+def bump_role_version_on_deactivation(sender, instance, raw, update_fields, **kwargs):
+    """
+    Увеличение версии ролей при блокировке/разблокировке пользователя: читающие запросы по claims
+    не проверяют is_active, поэтому выданные ранее токены должны перестать приниматься.
+    Версия берется из БД - объект мог быть загружен до изменения групп (invalidate_roles)
+    """
+    instance._is_active_changed = False
+    if raw or instance._state.adding or (update_fields is not None and 'is_active' not in update_fields):
+        return  # сохранения без is_active (например, last_login) пропускаются
+    stored = User.objects.filter(pk=instance.pk).values('is_active', 'role_version').first()
+    if stored is None:
+        return
+    instance.role_version = stored['role_version']
+    if stored['is_active'] != instance.is_active:
+        instance.role_version += 1
+        instance._is_active_changed = True
+
+
+@receiver(post_save, sender=User)
+def reset_roles_on_is_active_change(sender, instance, update_fields, **kwargs):
+    """ Сохранение новой версии ролей заблокированного (разблокированного) пользователя и сброс ее кэша """
+    if getattr(instance, '_is_active_changed', False):
+        instance._is_active_changed = False
+        if update_fields is not None and 'role_version' not in update_fields:  # save(update_fields=['is_active'])
+            User.objects.filter(pk=instance.pk).update(role_version=instance.role_version)
+        reset_role_cache([instance.pk])
@@ -1,3 +1,195 @@
-# from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from materials.models import Course, Lesson, Subscription
+from payments.models import Payment
+from users.models import User
+from users.roles import MODERATORS_GROUP, is_moderator
+
+
+class ModeratorRoleTestCase(TestCase):
+    """ Тесты кэширования роли модератора """
+
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(name=MODERATORS_GROUP)
+        self.user = User.objects.create(email="moderator@example.com")
+
+    def test_role_is_cached_between_requests(self):
+        """ Повторная проверка роли (в т.ч. для нового объекта пользователя) не обращается к БД """
+        self.assertFalse(is_moderator(self.user))
+
+        with self.assertNumQueries(0):
+            self.assertFalse(is_moderator(User(pk=self.user.pk)))
+
+    def test_cache_is_reset_on_groups_change(self):
+        """ Изменение групп пользователя с обеих сторон связи сбрасывает кэш """
+        self.assertFalse(is_moderator(User(pk=self.user.pk)))
+
+        self.user.groups.add(self.group)
+        self.assertTrue(is_moderator(User(pk=self.user.pk)))
+
+        self.group.user_set.remove(self.user)
+        self.assertFalse(is_moderator(User(pk=self.user.pk)))
+
+        self.group.user_set.add(self.user)
+        self.assertTrue(is_moderator(User(pk=self.user.pk)))
+        self.group.user_set.clear()
+        self.assertFalse(is_moderator(User(pk=self.user.pk)))
+
+
+class RoleClaimsTokenTestCase(APITestCase):
+    """ Тесты JWT-токенов с ролями в claims """
+
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(name=MODERATORS_GROUP)
+        self.user = User.objects.create(email="user@example.com")
+        self.user.set_password("secret123")
+        self.user.save()
+        self.user.groups.add(self.group)
+
+    def login(self):
+        """ Получение пары токенов и установка токена доступа в заголовок """
+        response = self.client.post(reverse("users:login"), {"email": "user@example.com", "password": "secret123"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return response.data
+
+    def test_read_request_does_not_load_user(self):
+        """ Читающий запрос аутентифицируется по claims без запросов к таблицам пользователей и групп """
+        self.login()
+        self.client.get(reverse("payments:payments-list"))  # прогрев кэша версии ролей
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("payments:payments-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in context.captured_queries if "users_user" in query["sql"]])
+
+    def test_role_change_revokes_claims(self):
+        """ После изменения групп токен со старыми claims отклоняется, а обновленный - принимается """
+        tokens = self.login()
+        self.user.groups.remove(self.group)
+
+        response = self.client.get(reverse("payments:payments-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.post(reverse("users:token_refresh"), {"refresh": tokens["refresh"]})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        response = self.client.get(reverse("payments:payments-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deactivation_revokes_claims(self):
+        """ Токен заблокированного пользователя не принимается и читающими запросами """
+        self.login()
+        self.user.is_active = False
+        self.user.save()
+
+        for url in (reverse("payments:payments-list"), reverse("users:users-list")):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED, url)
+
+        self.user.is_active = True
+        self.user.save(update_fields=["is_active"])
+        self.login()
+        self.user.last_login = None
+        self.user.save(update_fields=["last_login"])  # вход не отзывает токены
+        self.assertEqual(self.client.get(reverse("users:users-list")).status_code, status.HTTP_200_OK)
+
+    def test_role_version_read_only(self):
+        """ Версия ролей не меняется через API """
+        self.client.force_authenticate(user=self.user)
+        response = self.client.patch(reverse("users:users-detail", args=[self.user.pk]), {"role_version": 99})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertNotEqual(self.user.role_version, 99)
+
+
+class UserRegisterTestCase(APITestCase):
+    """ Тесты регистрации пользователя """
+
+    def test_register_single_write(self):
+        """ Пользователь с хешированным паролем создается одной вставкой, пароль не возвращается """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                reverse("users:users-list"), {"email": "new@example.com", "password": "secret123"}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn("password", response.data)
+        writes = [query for query in context.captured_queries if query["sql"].startswith(("INSERT", "UPDATE"))]
+        self.assertEqual(len(writes), 1)
+        user = User.objects.get(email="new@example.com")
+        self.assertTrue(user.is_active)
+        self.assertTrue(user.check_password("secret123"))
+
+
+class UserSparseFieldsTestCase(APITestCase):
+    """ Тесты выбора полей в списке пользователей """
+
+    def setUp(self):
+        for number in range(5):
+            User.objects.create(email=f"user{number}@example.com")
+        self.client.force_authenticate(user=User.objects.first())
+
+    def count_queries(self, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("users:users-list"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(context.captured_queries)
+
+    def test_fields_skip_many_to_many(self):
+        """ Группы и права загружаются одним запросом на список, а без них в ?fields= - не загружаются """
+        response, full_queries = self.count_queries()
+        self.assertIn("groups", response.json()["results"][0])
+        User.objects.create(email="more@example.com")
+        self.assertEqual(self.count_queries()[1], full_queries)  # не зависит от числа пользователей
+
+        response, queries = self.count_queries(fields="id,email")
+        self.assertEqual(list(response.json()["results"][0]), ["id", "email"])
+        self.assertEqual(queries, full_queries - 2)
+
+
+class FillPaymentsCommandTestCase(TestCase):
+    """ Тесты команды заполнения БД тестовыми данными """
+
+    def fill(self, seed):
+        call_command(
+            "fill_payments", users=20, courses=5, lessons=3, subscriptions=2, payments=50,
+            seed=seed, batch_size=7, clear=True, stdout=StringIO(),
+        )
+        return list(Payment.objects.order_by("pk").values_list("amount", "payment_method", "paid_course__name"))
+
+    def test_seed_is_deterministic(self):
+        """ С одинаковым seed генерируются одинаковые данные """
+        payments = self.fill(seed=1)
+        self.assertEqual(self.fill(seed=1), payments)
+        self.assertNotEqual(self.fill(seed=2), payments)
+
+    def test_counts_and_password(self):
+        """ Создается заданное количество записей, у пользователей рабочий пароль """
+        self.fill(seed=1)
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Course.objects.count(), 5)
+        self.assertEqual(Payment.objects.count(), 50)
+        self.assertTrue(Lesson.objects.exists())
+        self.assertGreater(Payment.objects.values("payment_date").distinct().count(), 40)  # даты не заменены текущей
+        self.assertTrue(Payment._meta.get_field("payment_date").auto_now_add)
+        self.assertFalse(Subscription.objects.values("user", "course").annotate(n=Count("pk")).filter(n__gt=1))
+        self.assertTrue(User.objects.first().check_password("testpassword123"))
+
+    def test_payment_dates_in_insert(self):
+        """ Заданные даты платежей записываются той же вставкой, без последующего UPDATE """
+        with CaptureQueriesContext(connection) as context:
+            self.fill(seed=1)
+        self.assertFalse([query for query in context.captured_queries if query["sql"].startswith("UPDATE")])
@@ -1,5 +1,6 @@
 from django.urls import path
 from users.apps import UsersConfig
+from users.serializers import RoleTokenObtainPairSerializer, RoleTokenRefreshSerializer
 from users.views import UserViewSet
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
@@ -14,6 +15,14 @@ router = DefaultRouter()  # Создание экземпляра DefaultRouter
 router.register(r"users", UserViewSet, basename="users")  # Регистрация ViewSet с именем users
 
 urlpatterns = [
-    path('login/', TokenObtainPairView.as_view(permission_classes=(AllowAny,)), name='login'),
-    path('token/refresh/', TokenRefreshView.as_view(permission_classes=(AllowAny,)), name='token_refresh'),
+    path(
+        'login/',
+        TokenObtainPairView.as_view(serializer_class=RoleTokenObtainPairSerializer, permission_classes=(AllowAny,)),
+        name='login',
+    ),
+    path(
+        'token/refresh/',
+        TokenRefreshView.as_view(serializer_class=RoleTokenRefreshSerializer, permission_classes=(AllowAny,)),
+        name='token_refresh',
+    ),
 ] + router.urls  # Добавление URL для ViewSet
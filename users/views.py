@@ -1,18 +1,23 @@
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import AllowAny
+
+from common.mixins import SparseFieldsMixin
 from users.models import User
+from users.paginators import UserPaginator
 from users.serializers import UserSerializer, UserRegisterSerializer
 
 
-class UserViewSet(ModelViewSet):
+class UserViewSet(SparseFieldsMixin, ModelViewSet):
     """ Создание CRUD для пользователя """
     serializer_class = UserSerializer
     queryset = User.objects.all()
+    pagination_class = UserPaginator
 
     def get_permissions(self):
         """ Получение прав для действий с пользователями """
         if self.action == 'create':  # Если действие - создание пользователя, то разрешаем его всем пользователям
             return [AllowAny()]
+        return super().get_permissions()  # для остальных действий - глобальные разрешения
 
     def get_serializer_class(self):
         """ Выбор сериализатора в зависимости от действия """
@@ -22,7 +27,5 @@ class UserViewSet(ModelViewSet):
             return UserSerializer # иначе - обычный сериализатор
 
     def perform_create(self, serializer):
-        """ Изменение данных пользователя (т.к. в модели User переопределили логин с username на email) """
-        user = serializer.save(is_active=True) # создание пользователя и его активация в БД
-        user.set_password(user.password) # хеширование пароля пользователя
-        user.save() # сохранение изменений для пользователя в БД
+        """ Создание активного пользователя (пароль хешируется в UserRegisterSerializer до вставки в БД) """
+        serializer.save(is_active=True)